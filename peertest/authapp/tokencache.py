@@ -0,0 +1,118 @@
+import time  # Standard library module for the cache timestamps.
+import threading  # Standard library module for guarding the in-process tier against concurrent requests.
+from collections import OrderedDict, namedtuple  # Ordered dictionary for LRU eviction, namedtuple for resolved tokens.
+
+from django.conf import settings  # Django settings, used to read the cache limits.
+from django.core.cache import cache  # Shared cache, the cross-process tier.
+
+from gitlabapp.utils.clients import hash_token  # Tokens are only ever used as keys in hashed form.
+from .models import User  # Import the User model
+
+# The part of a User the API views need: its ID, its GitLab URL and the time the token was resolved from the database
+ResolvedToken = namedtuple('ResolvedToken', ['id', 'gitlaburl', 'validated_at'])
+
+
+class TokenCache:
+    """
+    Resolves GitLab access tokens to the users they belong to.
+
+    Results are kept in two tiers keyed by the SHA-256 of the token: an in-process LRU dictionary
+    that is trusted for `memory_ttl` seconds, and the shared Django cache that is trusted for `ttl`
+    seconds, so that only the first request with a token in any worker queries the database.
+    Unknown tokens are not cached, so a newly registered user can be used right away.
+
+    `invalidate` removes a token from both tiers of the calling process; other processes drop
+    their in-process copy after at most `memory_ttl` seconds.
+    """
+
+    def __init__(self, ttl=300, memory_ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.memory_ttl = memory_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token hash -> (ResolvedToken, cached_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(token_hash):
+        return f'peertest:token:{token_hash}'
+
+    def _remember(self, token_hash, resolved, now):
+        with self._lock:
+            self._entries[token_hash] = (resolved, now)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resolve(self, token):
+        """
+        Return the user a GitLab access token belongs to.
+
+        :param token: The GitLab access token sent by the client.
+        :return: A ResolvedToken with the user's `id` and `gitlaburl`, or None if no user has the token.
+        """
+        if not token:
+            return None
+        token_hash = hash_token(token)
+        now = time.monotonic()
+
+        # In-process tier
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None:
+                if now - entry[1] < self.memory_ttl:
+                    self._entries.move_to_end(token_hash)
+                    return entry[0]
+                del self._entries[token_hash]
+
+        # Shared tier
+        cached = cache.get(self._cache_key(token_hash))
+        if cached is not None:
+            resolved = ResolvedToken(*cached)
+            self._remember(token_hash, resolved, now)
+            return resolved
+
+        # Database
+        user = User.objects.filter(gitlabusertoken=token).only('id', 'gitlaburl').first()
+        if user is None:
+            return None
+        resolved = ResolvedToken(str(user.id), user.gitlaburl, time.time())
+        cache.set(self._cache_key(token_hash), tuple(resolved), self.ttl)
+        self._remember(token_hash, resolved, now)
+        return resolved
+
+    def invalidate(self, *tokens):
+        """
+        Forget the users of the given tokens, e.g. after a user changed or was deleted.
+
+        :param tokens: GitLab access tokens; empty values are ignored.
+        """
+        hashes = [hash_token(token) for token in tokens if token]
+        with self._lock:
+            for token_hash in hashes:
+                self._entries.pop(token_hash, None)
+        cache.delete_many([self._cache_key(token_hash) for token_hash in hashes])
+
+    def clear(self):
+        """
+        Forget every token cached by this process.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# Token cache shared by every view running in this process
+token_cache = TokenCache(
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300),
+    memory_ttl=getattr(settings, 'AUTH_TOKEN_MEMORY_TTL', 30),
+    max_entries=getattr(settings, 'AUTH_TOKEN_CACHE_MAX_ENTRIES', 10000),
+)
+
+
+def resolve_token(token):
+    """
+    Return the user a GitLab access token belongs to, see TokenCache.resolve.
+
+    :param token: The GitLab access token sent by the client.
+    :return: A ResolvedToken, or None if no user has the token.
+    """
+    return token_cache.resolve(token)
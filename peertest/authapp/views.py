@@ -10,6 +10,20 @@ from django.shortcuts import get_object_or_404  # Helper function to get objects
 from rest_framework.decorators import action  # Decorator for custom actions in viewsets
 from .utils import Util  # Utility functions for hashing and password verification
 from gitlabapp.utils.utils import gitauth, get_user_details  # GitLab user detail functions
+from gitlabapp.utils.clients import client_registry  # Pooled GitLab clients, keyed by token
+from .tokencache import token_cache  # Cached token-to-user lookups
+
+
+def forget_credentials(gitlaburl, gitlabusertoken):
+    """
+    Drop everything cached for a user's GitLab token after the user was changed or deleted.
+
+    :param gitlaburl: The GitLab URL the user had.
+    :param gitlabusertoken: The GitLab access token the user had.
+    """
+    token_cache.invalidate(gitlabusertoken)
+    if gitlaburl and gitlabusertoken:
+        client_registry.invalidate(gitlaburl, gitlabusertoken)
 
 # ViewSet for handling User-related operations
 class UserViewSet(viewsets.ModelViewSet):
@@ -70,7 +84,9 @@ class UserViewSet(viewsets.ModelViewSet):
         
         # Check if the updated data is valid
         if serializer.is_valid():
+            old_token, old_gitlaburl = user.gitlabusertoken, user.gitlaburl  # Remember the credentials the caches were filled with
             serializer.save()  # Save the updated user data
+            forget_credentials(old_gitlaburl, old_token)  # Cached lookups of the old token may now be stale
             return Response({'success': True, 'message': 'User updated successfully', 'data': serializer.data})  # Return success message
         
         # If invalid, return error response
@@ -80,6 +96,7 @@ class UserViewSet(viewsets.ModelViewSet):
     def destroy(self, request, pk=None):
         user = get_object_or_404(self.queryset, pk=pk)  # Get the user or return 404 if not found
         user.delete()  # Delete the user from the database
+        forget_credentials(user.gitlaburl, user.gitlabusertoken)  # The token no longer belongs to any user
         return Response({'success': True, 'message': 'User deleted successfully'}, status=status.HTTP_204_NO_CONTENT)  # Return success message
     
     # Custom action to handle user login
@@ -8,3 +8,7 @@ class GitlabappConfig(AppConfig):
 
     # Specify the name of the application
     name = 'gitlabapp'  # This is the name of the app, and it should match the name used in the INSTALLED_APPS setting
+
+    def ready(self):
+        # Register the background job handlers
+        from . import tasks  # noqa: F401
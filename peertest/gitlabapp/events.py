@@ -0,0 +1,172 @@
+import json  # Standard library module used to encode event data.
+import asyncio  # Standard library module for the queues of streaming clients.
+import threading  # Standard library module for guarding the subscriber lists.
+from datetime import timedelta  # Standard library class for the event retention period.
+
+from asgiref.sync import sync_to_async  # Runs the database reads of a stream outside the event loop.
+from django.conf import settings  # Django settings, used to read the stream timings.
+from django.db.models import Q  # Used to match a project by either of its GitLab IDs.
+from django.utils import timezone  # Django helper for timezone-aware timestamps.
+
+from .models import Project, ProjectEvent  # Projects and the events published for them.
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe of project events.
+
+    Every published event is first stored as a ProjectEvent, so that a client can resume from the ID of
+    the last event it received and so that streams served by other processes see it when they poll the
+    table. Streams in this process are woken immediately through their asyncio queue and then read the
+    table, so events are always sent in ID order whichever process published them.
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # project ID -> set of (event loop, asyncio queue)
+        self._lock = threading.Lock()
+
+    def subscribe(self, project_id):
+        """
+        Start receiving the events of a project in the running event loop.
+
+        :param project_id: The ID of the forked project.
+        :return: The subscription, to be passed to unsubscribe; its queue receives the ID of every new event.
+        """
+        subscription = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, project_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[project_id]
+
+    def publish(self, project_id, kind, data):
+        """
+        Store an event and deliver it to the streams of this process.
+
+        May be called from any thread.
+
+        :param project_id: The ID of the forked project the event belongs to.
+        :param kind: The event name, e.g. 'pipeline', 'comment' or 'review'.
+        :param data: A JSON serialisable dictionary.
+        :return: The stored ProjectEvent.
+        """
+        event = ProjectEvent.objects.create(project_id=project_id, kind=kind, data=data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(project_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event.id)
+            except RuntimeError:
+                # The loop of a disconnected stream has already been closed
+                pass
+        return event
+
+
+# Broker shared by every view and handler running in this process
+broker = EventBroker()
+
+
+def publish_project_event(gitlab_project_id, kind, data):
+    """
+    Publish an event for the project a GitLab project belongs to.
+
+    :param gitlab_project_id: The ID of a forked project or of its testing project.
+    :param kind: The event name, e.g. 'pipeline', 'comment' or 'review'.
+    :param data: A JSON serialisable dictionary.
+    :return: The stored ProjectEvent, or None if no project matches.
+    """
+    project_id = Project.objects.filter(Q(pk=gitlab_project_id) | Q(testing_project_id=gitlab_project_id)).values_list('pk', flat=True).first()
+    if project_id is None:
+        return None
+    return broker.publish(project_id, kind, data)
+
+
+def format_event(event):
+    """
+    Encode a ProjectEvent as a server-sent event.
+
+    :param event: The ProjectEvent.
+    :return: The text of the event, ending with the blank line that terminates it.
+    """
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data, separators=(',', ':'), default=str)}\n\n"
+
+
+def events_after(project_id, last_event_id, limit=500):
+    """
+    Read the stored events of a project after an event ID, oldest first.
+
+    :param project_id: The ID of the forked project.
+    :param last_event_id: The ID of the last event the client received.
+    :param limit: The maximum number of events returned.
+    :return: A list of ProjectEvent objects.
+    """
+    return list(ProjectEvent.objects.filter(project_id=project_id, id__gt=last_event_id).order_by('id')[:limit])
+
+
+def latest_event_id(project_id):
+    """
+    :param project_id: The ID of the forked project.
+    :return: The ID of the newest stored event of the project, or 0.
+    """
+    return ProjectEvent.objects.filter(project_id=project_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def prune_events():
+    """
+    Delete events older than EVENT_RETENTION seconds; clients that were away longer cannot resume.
+
+    :return: The number of deleted events.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'EVENT_RETENTION', 86400))
+    return ProjectEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+async def stream_events(project_id, last_event_id=None):
+    """
+    Generate the server-sent events of a project until the client disconnects.
+
+    Stored events after `last_event_id` are sent first, so a reconnecting client misses nothing. The
+    stream then waits for events published in this process and polls the table every
+    EVENT_STREAM_POLL_INTERVAL seconds for events published by other processes. A comment line is sent
+    after EVENT_STREAM_HEARTBEAT seconds without events so that proxies keep the connection open.
+
+    :param project_id: The ID of the forked project.
+    :param last_event_id: The ID of the last event the client received, or None to send only new events.
+    :return: An async generator of event strings.
+    """
+    poll_interval = getattr(settings, 'EVENT_STREAM_POLL_INTERVAL', 5)
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+    loop = asyncio.get_running_loop()
+    subscription = broker.subscribe(project_id)
+    queue = subscription[1]
+    try:
+        # Tell the browser how long to wait before reconnecting
+        yield f"retry: {int(poll_interval * 1000)}\n\n"
+        if last_event_id is None:
+            last_event_id = await sync_to_async(latest_event_id)(project_id)
+        last_sent = loop.time()
+        while True:
+            for event in await sync_to_async(events_after)(project_id, last_event_id):
+                last_event_id = event.id
+                last_sent = loop.time()
+                yield format_event(event)
+
+            try:
+                await asyncio.wait_for(queue.get(), timeout=min(poll_interval, heartbeat))
+                # Events published together are read with one query
+                while not queue.empty():
+                    queue.get_nowait()
+            except asyncio.TimeoutError:
+                pass
+
+            if loop.time() - last_sent >= heartbeat:
+                last_sent = loop.time()
+                yield ": heartbeat\n\n"
+    finally:
+        broker.unsubscribe(project_id, subscription)
@@ -0,0 +1,137 @@
+import traceback  # Standard library module for recording the error of a failed attempt.
+from datetime import timedelta  # Standard library class for the retry back-off and lock timeout.
+
+from django.conf import settings  # Django settings, used to read the queue limits.
+from django.utils import timezone  # Django helper for timezone-aware timestamps.
+
+from .models import Job  # Database table that holds the queued jobs.
+
+# Registered job handlers, keyed by job kind
+HANDLERS = {}
+
+
+class JobFailed(Exception):
+    """
+    Raised by a handler when a job cannot succeed, so that it is failed without further retries.
+    """
+
+
+def handler(kind):
+    """
+    Register a function as the handler of a job kind.
+
+    The handler is called with the Job and may use `start_stage` to report progress and `job.state`
+    to remember work that must not be repeated by a retry.
+
+    :param kind: The job kind handled by the function.
+    :return: A decorator that registers the function.
+    """
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload, max_attempts=None):
+    """
+    Add a job to the queue.
+
+    :param kind: The job kind, which selects the handler.
+    :param payload: A JSON serialisable dictionary of handler arguments.
+    :param max_attempts: Optional number of attempts before the job is failed.
+    :return: The created Job.
+    """
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def start_stage(job, stage):
+    """
+    Mark the previous stage of a job as done and record the start of a new one.
+
+    :param job: The running Job.
+    :param stage: The name of the stage that starts.
+    """
+    now = timezone.now().isoformat()
+    for entry in job.progress:
+        if entry['status'] == Job.RUNNING:
+            entry['status'] = Job.SUCCEEDED
+            entry['finished_at'] = now
+    job.progress.append({'stage': stage, 'status': Job.RUNNING, 'started_at': now})
+    job.stage = stage
+    job.save(update_fields=['stage', 'progress', 'state', 'updated_at'])
+
+
+def _finish_stages(job, status):
+    now = timezone.now().isoformat()
+    for entry in job.progress:
+        if entry['status'] == Job.RUNNING:
+            entry['status'] = status
+            entry['finished_at'] = now
+
+
+def release_stale_jobs():
+    """
+    Put jobs back in the queue whose worker stopped while running them, e.g. because of a restart.
+
+    :return: The number of released jobs.
+    """
+    timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', 3600)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout)).update(status=Job.QUEUED, locked_at=None)
+
+
+def claim_next_job():
+    """
+    Claim the oldest runnable job.
+
+    Claiming is a conditional update on the job status, so two workers never run the same job even on
+    databases without row locking.
+
+    :return: The claimed Job, or None if the queue is empty.
+    """
+    while True:
+        job = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now()).order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_at=timezone.now(), attempts=job.attempts + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """
+    Run a claimed job with its handler and record the outcome.
+
+    Failed attempts are retried with an exponential back-off until `max_attempts` is reached.
+
+    :param job: A Job returned by claim_next_job.
+    :return: The updated Job.
+    """
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise JobFailed(f"No handler registered for job kind '{job.kind}'")
+        job.result = func(job)
+        _finish_stages(job, Job.SUCCEEDED)
+        job.status = Job.SUCCEEDED
+        job.error = None
+    except Exception as e:
+        _finish_stages(job, Job.FAILED)
+        job.error = str(e) or traceback.format_exc()
+        if isinstance(e, JobFailed) or job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            # Retry later, waiting twice as long after every failed attempt
+            delay = getattr(settings, 'JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        print(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e}")
+    job.locked_at = None
+    job.save()
+    return job
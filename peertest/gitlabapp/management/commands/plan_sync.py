@@ -0,0 +1,58 @@
+import json  # Standard library module for the --json output.
+
+from django.core.management.base import BaseCommand  # Base class for Django management commands
+from django.forms.models import model_to_dict  # Projects are planned as dictionaries, like the sync does
+
+from gitlabapp.models import Project  # Forked projects whose peer branches are planned
+from gitlabapp.utils.utils import gitauth, run_sync_tasks  # Authenticated GitLab clients and the sync executor
+from gitlabapp.utils.syncplan import dry_run, plan_peer_sync, plan_tasks, get_cohort_usernames  # The sync planner
+
+
+class Command(BaseCommand):
+    help = 'Show the branch creations and file actions a peer sync would make, and optionally run exactly those.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='Only plan this forked project ID; may be repeated.')
+        parser.add_argument('--execute', action='store_true', help='Run the plan instead of only showing it.')
+        parser.add_argument('--json', action='store_true', help='Print the plans as JSON.')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.exclude(testing_project_id=None)
+        if options['project']:
+            projects = projects.filter(pk__in=options['project'])
+
+        total = {'branches_created': 0, 'commits': 0, 'blob_reads': 0, 'requests': 0}
+        output = []
+        for project in projects.iterator():
+            data = model_to_dict(project)
+            usernames = get_cohort_usernames(gitauth(project.gitlaburl, project.gitlabaccesstoken), data)
+            plans = (plan_peer_sync if options['execute'] else dry_run)(project.gitlaburl, [data], usernames)
+            for plan in plans:
+                summary = plan.as_dict()
+                output.append(summary)
+                for key in total:
+                    total[key] += summary['cost'][key]
+                if not options['json']:
+                    self.write_plan(summary)
+            if options['execute'] and plans:
+                commits = run_sync_tasks(project.gitlaburl, plan_tasks(project.gitlaburl, plans))
+                self.stdout.write(f"Made {len(commits.get(project.id, []))} commit(s) in testing project {project.testing_project_id}")
+
+        if options['json']:
+            self.stdout.write(json.dumps({'projects': output, 'cost': total}, indent=2))
+        else:
+            self.stdout.write(f"Total: {total['branches_created']} branch(es) to create, {total['commits']} commit(s), {total['blob_reads']} blob read(s), {total['requests']} request(s)")
+
+    def write_plan(self, summary):
+        self.stdout.write(f"Project {summary['project_id']} -> testing project {summary['testing_project_id']} at {summary['source_sha']}")
+        for branch in summary['branches']:
+            if branch['up_to_date']:
+                self.stdout.write(f"  {branch['branch']}: up to date")
+                continue
+            if not branch['create_branch'] and not branch['actions']:
+                self.stdout.write(f"  {branch['branch']}: no changes")
+                continue
+            state = 'create' if branch['create_branch'] else 'update'
+            self.stdout.write(f"  {branch['branch']}: {state}, {len(branch['actions'])} action(s) in {branch['commits']} commit(s)")
+            for action in branch['actions']:
+                self.stdout.write(f"    {action['action']:<6} {action['file_path']}")
@@ -0,0 +1,29 @@
+import gitlab  # GitLab API client for Python, used for its exceptions.
+
+from django.core.management.base import BaseCommand  # Base class for Django management commands
+
+from gitlabapp.models import Project  # Projects whose testing projects are reconciled
+from gitlabapp.utils.utils import gitauth  # Authenticated GitLab clients
+from gitlabapp.utils.pipelines import reconcile_pipelines  # Backfills the PipelineRun table from GitLab
+
+
+class Command(BaseCommand):
+    help = 'Copy the pipelines of testing projects that were missed by the GitLab webhooks into the PipelineRun table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='Only reconcile this testing project ID; may be repeated.')
+        parser.add_argument('--per-page', type=int, default=100, help='Number of pipelines read per GitLab request.')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.exclude(testing_project_id=None)
+        if options['project']:
+            projects = projects.filter(testing_project_id__in=options['project'])
+
+        for project in projects.iterator():
+            try:
+                gl = gitauth(project.gitlaburl, project.testingproject['gitlabaccesstoken'])
+                count = reconcile_pipelines(gl.projects.get(project.testing_project_id), per_page=options['per_page'])
+            except gitlab.exceptions.GitlabError as e:
+                self.stderr.write(f'Failed to reconcile testing project {project.testing_project_id}: {e}')
+                continue
+            self.stdout.write(f'Recorded {count} pipeline(s) of testing project {project.testing_project_id}')
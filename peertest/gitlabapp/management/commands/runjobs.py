@@ -0,0 +1,38 @@
+import time  # Standard library module used to wait between polls of an empty queue.
+
+from django.core.management.base import BaseCommand  # Base class for Django management commands
+
+from gitlabapp.jobs import claim_next_job, run_job, release_stale_jobs  # Job queue helpers
+from gitlabapp.events import prune_events  # Removes streamed events that are too old to resume from
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs such as project provisioning.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the jobs that are ready and exit instead of polling.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait before polling an empty queue again.')
+
+    def handle(self, *args, **options):
+        # Jobs left running by a worker that stopped are queued again
+        released = release_stale_jobs()
+        if released:
+            self.stdout.write(f'Released {released} stale job(s)')
+
+        pruned_at = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                release_stale_jobs()
+                if time.monotonic() - pruned_at > 3600:
+                    # Old stream events are removed about once an hour
+                    prune_events()
+                    pruned_at = time.monotonic()
+                continue
+
+            self.stdout.write(f'Running job {job.id} ({job.kind}), attempt {job.attempts}')
+            job = run_job(job)
+            self.stdout.write(f'Job {job.id} is {job.status}')
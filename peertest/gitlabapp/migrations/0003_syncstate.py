@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0002_project_gitlaburl'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_project_id', models.IntegerField()),
+                ('testing_project_id', models.IntegerField()),
+                ('branch', models.CharField(max_length=255)),
+                ('last_synced_sha', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('source_project_id', 'branch')},
+            },
+        ),
+    ]
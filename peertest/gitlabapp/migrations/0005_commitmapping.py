@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_commits_json(apps, schema_editor):
+    """
+    Create a CommitMapping for every {fork_sha: testing_sha} pair stored in Project.commits.
+    """
+    Project = apps.get_model('gitlabapp', 'Project')
+    CommitMapping = apps.get_model('gitlabapp', 'CommitMapping')
+    mappings = []
+    for project in Project.objects.exclude(commits=None).iterator():
+        # The create flow stores a list of dictionaries, the update flow a single dictionary
+        entries = project.commits if isinstance(project.commits, list) else [project.commits]
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            for source_sha, testing_shas in entry.items():
+                if not source_sha or source_sha in ('None', 'null'):
+                    continue
+                for testing_sha in (testing_shas if isinstance(testing_shas, list) else [testing_shas]):
+                    mappings.append(CommitMapping(project=project, source_sha=source_sha, testing_sha=testing_sha))
+    CommitMapping.objects.bulk_create(mappings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommitMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_sha', models.CharField(max_length=64)),
+                ('testing_sha', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+                ('branch', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commit_mappings', to='gitlabapp.project')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='commitmapping',
+            index=models.Index(fields=['project', 'source_sha'], name='gitlabapp_c_project_6d9866_idx'),
+        ),
+        migrations.RunPython(copy_commits_json, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:06
+
+from django.db import migrations, models
+
+
+def copy_testingproject_json(apps, schema_editor):
+    """
+    Fill the testing project columns of existing projects from their testingproject JSON.
+    """
+    Project = apps.get_model('gitlabapp', 'Project')
+    projects = []
+    for project in Project.objects.exclude(testingproject=None).iterator():
+        testing_project_id = project.testingproject.get('id') if isinstance(project.testingproject, dict) else None
+        if testing_project_id is None:
+            continue
+        project.testing_project_id = int(testing_project_id)
+        project.testing_branch = f"{project.namespace}p0"
+        projects.append(project)
+    Project.objects.bulk_update(projects, ['testing_project_id', 'testing_branch'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0005_commitmapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='testing_branch',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='testing_project_id',
+            field=models.IntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(copy_testingproject_json, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0006_project_testing_project_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pipeline_id', models.IntegerField(blank=True, null=True, unique=True)),
+                ('testing_project_id', models.IntegerField()),
+                ('branch', models.CharField(max_length=255)),
+                ('sha', models.CharField(max_length=64)),
+                ('status', models.CharField(max_length=32)),
+                ('source', models.CharField(choices=[('gitlab', 'GitLab')], default='gitlab', max_length=32)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('queued_duration', models.FloatField(blank=True, null=True)),
+                ('jobs', models.JSONField(default=list)),
+                ('recorded_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pipelinerun',
+            index=models.Index(fields=['testing_project_id', 'branch', 'status'], name='gitlabapp_p_testing_21050a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pipelinerun',
+            index=models.Index(fields=['testing_project_id', 'updated_at'], name='gitlabapp_p_testing_26daaa_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0007_pipelinerun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='gitlabapp.project')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='projectevent',
+            index=models.Index(fields=['project', 'id'], name='gitlabapp_p_project_bfd415_idx'),
+        ),
+    ]
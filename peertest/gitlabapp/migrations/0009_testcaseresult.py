@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0008_projectevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_name', models.CharField(max_length=255)),
+                ('line_rate', models.FloatField(blank=True, null=True)),
+                ('branch_rate', models.FloatField(blank=True, null=True)),
+                ('lines_covered', models.IntegerField(blank=True, null=True)),
+                ('lines_valid', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TestCaseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_name', models.CharField(max_length=255)),
+                ('suite', models.CharField(blank=True, default='', max_length=255)),
+                ('classname', models.CharField(blank=True, default='', max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('passed', 'Passed'), ('failed', 'Failed'), ('error', 'Error'), ('skipped', 'Skipped')], max_length=16)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('failure_message', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pipelinerun',
+            name='results_ingested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coverageresult',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coverage', to='gitlabapp.pipelinerun'),
+        ),
+        migrations.AddField(
+            model_name='testcaseresult',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_cases', to='gitlabapp.pipelinerun'),
+        ),
+        migrations.AddIndex(
+            model_name='testcaseresult',
+            index=models.Index(fields=['run', 'status'], name='gitlabapp_t_run_id_11ee4f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testcaseresult',
+            index=models.Index(fields=['run', 'duration'], name='gitlabapp_t_run_id_bfd5ba_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0009_testcaseresult'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pipelinerun',
+            name='source',
+            field=models.CharField(choices=[('gitlab', 'GitLab'), ('local', 'Local runner')], default='gitlab', max_length=32),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0010_pipelinerun_local'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeerAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_project_id', models.IntegerField()),
+                ('author', models.CharField(max_length=255)),
+                ('reviewer', models.CharField(max_length=255)),
+                ('branch', models.CharField(max_length=255)),
+                ('strategy', models.CharField(max_length=32)),
+                ('group', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('original_project_id', 'author', 'branch')},
+            },
+        ),
+    ]
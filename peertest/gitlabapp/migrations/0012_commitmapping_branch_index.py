@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlabapp', '0011_peerassignment'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='commitmapping',
+            name='gitlabapp_c_project_6d9866_idx',
+        ),
+        migrations.AddIndex(
+            model_name='commitmapping',
+            index=models.Index(fields=['project', 'source_sha', 'branch'], name='gitlabapp_c_project_a870a5_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 # Import the models module from Django
+import uuid  # uuid module is used to generate job IDs
 from django.db import models  # models module contains the base classes for defining database models in Django
+from django.utils import timezone  # timezone module provides the current time for default values
 
 # Create your models here.
 # Define a model for representing projects in the database
@@ -29,3 +31,245 @@ class Project(models.Model):
     
     # Field for storing the commits of the project in JSON format
     commits = models.JSONField(null=True)  # A JSON field for storing commits, can be null
+
+    # Fields copied from `testingproject` so that a project can be found from its testing project with an indexed query
+    testing_project_id = models.IntegerField(null=True, db_index=True, editable=False)  # The GitLab ID of the testing project, can be null
+    testing_branch = models.CharField(max_length=255, null=True, blank=True, editable=False)  # The branch of the testing project that holds the owner's code
+
+    def save(self, *args, **kwargs):
+        # Keep the denormalized testing project columns in sync with the JSON field
+        testing_project_id = (self.testingproject or {}).get('id')
+        self.testing_project_id = int(testing_project_id) if testing_project_id is not None else None
+        self.testing_branch = f"{self.namespace}p0" if self.testing_project_id is not None else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'testingproject' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'testing_project_id', 'testing_branch'}
+        super().save(*args, **kwargs)
+
+# Define a model for remembering how far each peer branch has been synced
+class SyncState(models.Model):
+    # Field for the ID of the forked (source) project whose files are copied to the peer branch
+    source_project_id = models.IntegerField()  # An integer field for the GitLab ID of the forked project
+
+    # Field for the ID of the testing project that holds the peer branch
+    testing_project_id = models.IntegerField()  # An integer field for the GitLab ID of the testing project
+
+    # Field for the name of the peer branch in the testing project
+    branch = models.CharField(max_length=255)  # A character field for the branch name, with a maximum length of 255 characters
+
+    # Field for the last source commit that was copied to the peer branch
+    last_synced_sha = models.CharField(max_length=64)  # A character field for the commit SHA
+
+    # Field for the time of the last sync
+    updated_at = models.DateTimeField(auto_now=True)  # A date-time field that updates on every save
+
+    class Meta:
+        # A peer branch is synced from exactly one source project
+        unique_together = ('source_project_id', 'branch')
+
+# Define a model for the peers assigned to test each forked project
+class PeerAssignment(models.Model):
+    # Field for the original project shared by the cohort of forks
+    original_project_id = models.IntegerField()  # An integer field for the GitLab ID of the original project
+
+    # Fields for the owner of the fork under test and the peer testing it
+    author = models.CharField(max_length=255)  # A character field for the namespace of the forked project
+    reviewer = models.CharField(max_length=255)  # A character field for the username of the peer; the author for the author's own branch
+
+    # Field for the branch of the author's testing project the peer works on
+    branch = models.CharField(max_length=255)  # A character field for the branch name
+
+    # Fields for how the assignment was made
+    strategy = models.CharField(max_length=32)  # A character field for the name of the assignment strategy
+    group = models.IntegerField(null=True, blank=True)  # An integer field for the group of group-based assignments, can be null
+
+    # Field for the time of the assignment
+    created_at = models.DateTimeField(auto_now_add=True)  # A date-time field set when the assignment is created
+
+    class Meta:
+        # Assignments are kept once made, so a branch is assigned to exactly one peer
+        unique_together = ('original_project_id', 'author', 'branch')
+
+# Define a model for background jobs processed by the `runjobs` management command
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    # Field for the primary key, which uniquely identifies each job
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # A UUID that is returned to the client as the job ID
+
+    # Field for the kind of job, which selects the handler that runs it
+    kind = models.CharField(max_length=100)  # A character field for the handler name, e.g. 'provision_project'
+
+    # Field for the arguments of the job
+    payload = models.JSONField(default=dict)  # A JSON field for the handler arguments
+
+    # Field for the current status of the job
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)  # One of queued, running, succeeded or failed
+
+    # Field for the stage the job is currently in
+    stage = models.CharField(max_length=100, null=True, blank=True)  # A character field for the current stage name
+
+    # Field for the progress of every stage, in the order the stages started
+    progress = models.JSONField(default=list)  # A JSON list of {'stage', 'status', 'at'} dictionaries
+
+    # Field for data a handler keeps between attempts so that a retry resumes where the last attempt stopped
+    state = models.JSONField(default=dict)  # A JSON field that is never returned to clients
+
+    # Field for the result of the job, returned to the client
+    result = models.JSONField(null=True, blank=True)  # A JSON field for the result, can be null
+
+    # Field for the error of the last failed attempt
+    error = models.TextField(null=True, blank=True)  # A text field for the error message, can be null
+
+    # Fields for retries
+    attempts = models.IntegerField(default=0)  # Number of attempts that have been started
+    max_attempts = models.IntegerField(default=3)  # Number of attempts before the job is marked as failed
+
+    # Field for the earliest time the job may run, used to back off between retries
+    run_after = models.DateTimeField(default=timezone.now)  # A date-time field for the next attempt
+
+    # Field for the time a worker claimed the job, used to recover jobs of workers that died
+    locked_at = models.DateTimeField(null=True, blank=True)  # A date-time field, can be null
+
+    # Fields for bookkeeping
+    created_at = models.DateTimeField(auto_now_add=True)  # A date-time field set when the job is created
+    updated_at = models.DateTimeField(auto_now=True)  # A date-time field that updates on every save
+
+    class Meta:
+        # Workers look up the next runnable job by status and time
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+# Define a model for the link between a commit of a forked project and the matching commit of its testing project
+class CommitMapping(models.Model):
+    # Field for the forked project the commit belongs to
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='commit_mappings')  # Mappings are deleted with their project
+
+    # Field for the commit SHA in the forked project
+    source_sha = models.CharField(max_length=64)  # A character field for the commit SHA of the forked project
+
+    # Field for the matching commit SHA in the testing project
+    testing_sha = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # A character field for the commit SHA of the testing project, can be null
+
+    # Field for the branch of the testing project the testing commit is on
+    branch = models.CharField(max_length=255, blank=True, default='')  # A character field for the branch name, empty when unknown
+
+    # Field for the time the mapping was recorded
+    created_at = models.DateTimeField(auto_now_add=True)  # A date-time field set when the mapping is created
+
+    class Meta:
+        # Comments and reviews look up the mapping of a commit within a project, optionally on one branch;
+        # lookups without a branch use the leading (project, source_sha) columns
+        indexes = [models.Index(fields=['project', 'source_sha', 'branch'])]
+
+# Define a model for the pipelines run on the branches of testing projects
+class PipelineRun(models.Model):
+    GITLAB = 'gitlab'
+    LOCAL = 'local'
+    SOURCE_CHOICES = [(GITLAB, 'GitLab'), (LOCAL, 'Local runner')]
+
+    # Field for the ID of the pipeline in GitLab
+    pipeline_id = models.IntegerField(null=True, blank=True, unique=True)  # An integer field for the GitLab pipeline ID, can be null for runs outside GitLab
+
+    # Field for the testing project the pipeline ran in
+    testing_project_id = models.IntegerField()  # An integer field for the GitLab ID of the testing project
+
+    # Fields for the commit the pipeline ran on
+    branch = models.CharField(max_length=255)  # A character field for the branch name
+    sha = models.CharField(max_length=64)  # A character field for the commit SHA
+
+    # Field for the status of the pipeline as reported by GitLab, e.g. 'running' or 'success'
+    status = models.CharField(max_length=32)  # A character field for the pipeline status
+
+    # Field for where the pipeline ran
+    source = models.CharField(max_length=32, choices=SOURCE_CHOICES, default=GITLAB)  # A character field for the runner of the pipeline
+
+    # Fields for the timing of the pipeline, copied from GitLab
+    created_at = models.DateTimeField(null=True, blank=True)  # A date-time field for the creation of the pipeline
+    started_at = models.DateTimeField(null=True, blank=True)  # A date-time field for the start of the pipeline
+    finished_at = models.DateTimeField(null=True, blank=True)  # A date-time field for the end of the pipeline
+    updated_at = models.DateTimeField(null=True, blank=True)  # A date-time field for the last change of the pipeline, used to resume reconciliation
+    duration = models.FloatField(null=True, blank=True)  # Seconds the pipeline ran
+    queued_duration = models.FloatField(null=True, blank=True)  # Seconds the pipeline waited for a runner
+
+    # Field for a summary of every job of the pipeline
+    jobs = models.JSONField(default=list)  # A JSON list of {'id', 'name', 'stage', 'status', 'duration'} dictionaries
+
+    # Field for the time the test reports of the pipeline were read into TestCaseResult and CoverageResult
+    results_ingested_at = models.DateTimeField(null=True, blank=True)  # A date-time field, null until the reports are ingested
+
+    # Field for the time the row was last written
+    recorded_at = models.DateTimeField(auto_now=True)  # A date-time field that updates on every save
+
+    class Meta:
+        # The tests endpoints list the pipelines of a testing project, optionally by branch and status
+        indexes = [
+            models.Index(fields=['testing_project_id', 'branch', 'status']),
+            models.Index(fields=['testing_project_id', 'updated_at']),
+        ]
+
+# Define a model for the updates streamed to dashboards, kept so that clients can resume after a reconnect
+class ProjectEvent(models.Model):
+    # Field for the forked project the event belongs to
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='events')  # Events are deleted with their project
+
+    # Field for the kind of event, e.g. 'pipeline', 'comment' or 'review'
+    kind = models.CharField(max_length=32)  # A character field for the event name sent to clients
+
+    # Field for the data of the event
+    data = models.JSONField(default=dict)  # A JSON field sent to clients as the event data
+
+    # Field for the time the event was published
+    created_at = models.DateTimeField(auto_now_add=True)  # A date-time field set when the event is created
+
+    class Meta:
+        # Streams read the events of a project after the last event ID they sent
+        indexes = [models.Index(fields=['project', 'id'])]
+
+# Define a model for the result of one test case, read from the JUnit reports of a pipeline
+class TestCaseResult(models.Model):
+    PASSED = 'passed'
+    FAILED = 'failed'
+    ERROR = 'error'
+    SKIPPED = 'skipped'
+    STATUS_CHOICES = [(PASSED, 'Passed'), (FAILED, 'Failed'), (ERROR, 'Error'), (SKIPPED, 'Skipped')]
+
+    # Field for the pipeline the test ran in
+    run = models.ForeignKey(PipelineRun, on_delete=models.CASCADE, related_name='test_cases')  # Results are deleted with their pipeline
+
+    # Field for the CI job that produced the report
+    job_name = models.CharField(max_length=255)  # A character field for the job name, e.g. 'test_python'
+
+    # Fields that identify the test case
+    suite = models.CharField(max_length=255, blank=True, default='')  # A character field for the test suite name
+    classname = models.CharField(max_length=255, blank=True, default='')  # A character field for the class of the test case
+    name = models.CharField(max_length=255)  # A character field for the test case name
+
+    # Fields for the outcome of the test case
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES)  # One of passed, failed, error or skipped
+    duration = models.FloatField(null=True, blank=True)  # Seconds the test case ran
+    failure_message = models.TextField(null=True, blank=True)  # The failure or error message, can be null
+
+    class Meta:
+        # Aggregates are computed per pipeline, and the slowest tests are read by duration
+        indexes = [
+            models.Index(fields=['run', 'status']),
+            models.Index(fields=['run', 'duration']),
+        ]
+
+# Define a model for the coverage of one job, read from the Cobertura or JaCoCo report of a pipeline
+class CoverageResult(models.Model):
+    # Field for the pipeline the coverage was measured in
+    run = models.ForeignKey(PipelineRun, on_delete=models.CASCADE, related_name='coverage')  # Results are deleted with their pipeline
+
+    # Field for the CI job that produced the report
+    job_name = models.CharField(max_length=255)  # A character field for the job name, e.g. 'test_python'
+
+    # Fields for the measured coverage
+    line_rate = models.FloatField(null=True, blank=True)  # Fraction of lines covered, between 0 and 1
+    branch_rate = models.FloatField(null=True, blank=True)  # Fraction of branches covered, between 0 and 1
+    lines_covered = models.IntegerField(null=True, blank=True)  # Number of lines covered
+    lines_valid = models.IntegerField(null=True, blank=True)  # Number of lines that can be covered
@@ -0,0 +1,16 @@
+# pagination.py
+from rest_framework.pagination import CursorPagination  # Cursor based pagination from Django REST Framework
+
+# Define the pagination used when listing projects
+class ProjectCursorPagination(CursorPagination):
+    page_size = 20  # Number of projects returned per page by default
+    page_size_query_param = 'page_size'  # Clients may ask for a different page size with ?page_size=
+    max_page_size = 100  # Upper bound for ?page_size=
+    ordering = '-id'  # Newest GitLab projects first; the primary key gives a stable cursor
+
+# Define the pagination used when listing pipeline runs
+class PipelineRunCursorPagination(CursorPagination):
+    page_size = 20  # Number of pipeline runs returned per page by default
+    page_size_query_param = 'page_size'  # Clients may ask for a different page size with ?page_size=
+    max_page_size = 100  # Upper bound for ?page_size=
+    ordering = '-id'  # Newest runs first; the primary key gives a stable cursor
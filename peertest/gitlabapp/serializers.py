@@ -1,6 +1,6 @@
 # serializers.py
 from rest_framework import serializers
-from .models import Project
+from .models import Project, Job, PipelineRun
 # Define a serializer for the Project model
 class ProjectSerializer(serializers.ModelSerializer):  # ProjectSerializer inherits from ModelSerializer, which provides a convenient way to create serializers
     class Meta:
@@ -22,3 +22,31 @@ class ProjectSerializer(serializers.ModelSerializer):  # ProjectSerializer inher
         instance.save()
         # Return the updated instance
         return instance
+
+# Define a serializer for listing projects without exposing their access tokens
+class ProjectListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Project  # Specify the model that this serializer is for
+        exclude = ['gitlabaccesstoken']  # The access token of the forked project is never listed
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Only the ID of the testing project is listed, never its access token
+        if data.get('testingproject'):
+            data['testingproject'] = {'id': data['testingproject'].get('id')}
+        return data
+
+# Define a serializer for reporting background jobs to clients
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job  # Specify the model that this serializer is for
+        # The payload and the handler state may hold internal data, so only the progress is exposed
+        fields = ['id', 'kind', 'status', 'stage', 'progress', 'result', 'error', 'attempts', 'max_attempts', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+# Define a serializer for the pipelines recorded from GitLab
+class PipelineRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PipelineRun  # Specify the model that this serializer is for
+        fields = '__all__'  # Include all fields from the PipelineRun model in the serialized output
+        read_only_fields = [field.name for field in PipelineRun._meta.fields]
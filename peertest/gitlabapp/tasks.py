@@ -0,0 +1,161 @@
+from django.forms.models import model_to_dict  # Import model_to_dict to convert model instances to dictionaries
+
+from authapp.models import User
+from .jobs import handler, start_stage, JobFailed  # Job queue helpers
+from .models import Project, SyncState, PipelineRun  # Import the models used by the job handlers from the current module
+from .serializers import ProjectSerializer  # Import the serializer for the Project model
+from .utils.results import ingest_results  # Reads test reports into TestCaseResult and CoverageResult
+from .utils.localrunner import execute_local_run  # Runs the tests of a commit in containers
+from .utils.webhooks import publish_pipeline  # Streams the progress of local runs like that of pipelines
+from .utils.syncplan import get_cohort_usernames  # Participants of the cohort of a forked project
+from .utils.utils import gitauth, add_pipefiles, fork_project, get_forked_usernames, update_peertestingproject, get_latest_commits, record_commit_mappings, iter_files_in_branch
+
+
+@handler('provision_project')
+def provision_project(job):
+    """
+    Fork a project, create its testing project, sync every peer branch and save the project.
+
+    The forked project is kept in `job.state` as soon as it exists, so a retried job continues with the
+    remaining stages instead of forking again.
+
+    :param job: The Job, whose payload holds 'user_id', 'projectid' and 'new_project_name'.
+    :return: A dictionary with the ID of the saved project.
+    """
+    payload = job.payload
+    try:
+        user = User.objects.get(pk=payload['user_id'])
+    except User.DoesNotExist:
+        raise JobFailed('User with the provided GitLab access token does not exist')
+
+    gl = gitauth(user.gitlaburl, user.gitlabusertoken)
+
+    # Fork the project and create the testing project
+    if 'project' not in job.state:
+        start_stage(job, 'fork')
+        new_project = fork_project(gl, payload['projectid'], payload['new_project_name'])
+        if new_project[0] is not True:
+            raise JobFailed(str(new_project[1]))
+        job.state['project'] = new_project[1]
+        job.save(update_fields=['state', 'updated_at'])
+    data = job.state['project']
+
+    # Sync the peer branches of every project forked from the same original project
+    start_stage(job, 'sync')
+    projects = [model_to_dict(project) for project in Project.objects.filter(gitlaburl=user.gitlaburl)]
+    projects.append(data)
+    fork_project_usernames = get_forked_usernames(gl, payload['projectid'])
+    update_peertestingproject(user.gitlaburl, projects, gl.user.username, fork_project_usernames)
+
+    # Record the latest commits of the forked and testing projects
+    start_stage(job, 'commits')
+    latest_commits = get_latest_commits(gl, data['testingproject']['id'], data['id'], 'main', gl.user.username + 'p0')
+    data['commits'] = [latest_commits]
+    data['gitlaburl'] = user.gitlaburl
+
+    # Save the project
+    start_stage(job, 'save')
+    serializer = ProjectSerializer(data=data)
+    if not serializer.is_valid():
+        raise JobFailed(str(serializer.errors))
+    project = serializer.save()
+    record_commit_mappings(project.id, latest_commits, branch=gl.user.username + 'p0')
+    return {'project_id': project.id, 'testingproject_id': data['testingproject']['id']}
+
+
+@handler('peer_sync')
+def peer_sync(job):
+    """
+    Sync the peer branches of a forked project after its default branch changed.
+
+    Queued by the GitLab webhook. Only the paths changed since each branch was last synced are
+    committed (see update_peertestingproject). The testing commits are linked to the pushed commit when
+    the sync reached it; a later push queues its own sync.
+
+    :param job: The Job, whose payload holds 'project_id' and the pushed 'sha', if known.
+    :return: A dictionary with the ID of the project and the commits made in its testing project.
+    """
+    project = Project.objects.filter(pk=job.payload['project_id']).first()
+    if project is None:
+        raise JobFailed('Project not found')
+
+    start_stage(job, 'sync')
+    gl = gitauth(project.gitlaburl, project.gitlabaccesstoken)
+    fork_project_usernames = get_cohort_usernames(gl, model_to_dict(project))
+    _, _, pcommits = update_peertestingproject(project.gitlaburl, [model_to_dict(project)], project.namespace, fork_project_usernames)
+
+    # Link the pushed source commit to the new testing commits
+    commits = pcommits.get(project.id, [])
+    sha = job.payload.get('sha')
+    if commits and sha and SyncState.objects.filter(source_project_id=project.id, last_synced_sha=sha).exists():
+        record_commit_mappings(project.id, {sha: commits})
+    return {'project_id': project.id, 'commits': commits}
+
+
+@handler('ingest_results')
+def ingest_pipeline_results(job):
+    """
+    Read the JUnit and coverage reports of a finished pipeline.
+
+    Queued by the GitLab webhook when a pipeline of a testing project finishes.
+
+    :param job: The Job, whose payload holds 'pipeline_id'.
+    :return: A dictionary with the pipeline ID and the number of test cases and coverage reports read.
+    """
+    run = PipelineRun.objects.filter(pipeline_id=job.payload['pipeline_id']).first()
+    if run is None:
+        raise JobFailed('Pipeline not found')
+    project = Project.objects.filter(testing_project_id=run.testing_project_id).first()
+    if project is None:
+        raise JobFailed('Testing project not found')
+
+    start_stage(job, 'ingest')
+    gl = gitauth(project.gitlaburl, project.testingproject['gitlabaccesstoken'])
+    counts = ingest_results(gl.projects.get(run.testing_project_id, lazy=True), run)
+    return {'pipeline_id': run.pipeline_id, **counts}
+
+
+@handler('refresh_pipefiles')
+def refresh_pipefiles(job):
+    """
+    Bring the pipeline files of a peer branch in line with the languages of its tests.
+
+    Queued by the GitLab webhook when a peer branch changes. Nothing is committed when the files are
+    already up to date, so the commit made here does not queue another change.
+
+    :param job: The Job, whose payload holds 'testing_project_id' and 'branch'.
+    :return: A dictionary with the branch, the commit made (or None) and the detected languages.
+    """
+    project = Project.objects.filter(testing_project_id=job.payload['testing_project_id']).first()
+    if project is None:
+        raise JobFailed('Testing project not found')
+
+    start_stage(job, 'pipefiles')
+    result = add_pipefiles(project.gitlaburl, job.payload['branch'], project.testingproject['gitlabaccesstoken'], project.testing_project_id)
+    if result is None:
+        raise JobFailed(f"Failed to refresh the pipeline files of {job.payload['branch']}")
+    return {'branch': result['branch'], 'commit': result['id'], 'language': result['language']}
+
+
+@handler('local_run')
+def local_run(job):
+    """
+    Run the tests of a commit of a peer branch on this server.
+
+    Queued by the test view with runner=local (see start_local_run). The files are read with the token of
+    the testing project while the run goes on, so a failed read fails the run rather than the job.
+
+    :param job: The Job, whose payload holds 'run_id'.
+    :return: A dictionary with the run ID and its status.
+    """
+    run = PipelineRun.objects.filter(pk=job.payload['run_id'], source=PipelineRun.LOCAL).first()
+    if run is None:
+        raise JobFailed('Local run not found')
+    project = Project.objects.filter(testing_project_id=run.testing_project_id).first()
+    if project is None:
+        raise JobFailed('Testing project not found')
+
+    start_stage(job, 'run')
+    gl = gitauth(project.gitlaburl, project.testingproject['gitlabaccesstoken'])
+    run = execute_local_run(run, iter_files_in_branch(gl, run.testing_project_id, run.sha, ''), publish_pipeline)
+    return {'run_id': run.id, 'status': run.status}
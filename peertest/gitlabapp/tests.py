@@ -0,0 +1,923 @@
+import io  # Standard library module for building archives in memory.
+import os  # Standard library module for inspecting the files of the blob cache.
+import tempfile  # Standard library module for temporary cache directories.
+import threading  # Standard library module for watching the threads of the sync executor.
+import time  # Standard library module for keeping executor tasks busy.
+import asyncio  # Standard library module for waiting on event streams.
+import base64  # Standard library module for the base64 content of file actions.
+import subprocess  # Standard library module for building git repositories for the mirror tests.
+import tarfile  # Standard library module for building uploaded tar archives.
+import zipfile  # Standard library module for building uploaded zip archives.
+from collections import Counter  # Standard library class for counting the assignments of every pair.
+from datetime import timedelta  # Standard library class for backdating jobs.
+from unittest import mock  # Standard library module for faking the GitLab client.
+
+import gitlab  # GitLab API client for Python, used for its exceptions.
+from asgiref.sync import sync_to_async  # Publishes events from the async stream tests.
+from django.db.models import F  # Compares the reviewer of an assignment with its author.
+from django.forms.models import model_to_dict  # Project dictionaries, as the views pass them to the helpers.
+from django.test import SimpleTestCase, TestCase, override_settings  # Django test cases, without and with a database.
+from rest_framework.test import APIClient  # Test client for the API views.
+
+from authapp.models import User  # Users the API resolves access tokens to.
+from authapp.tokencache import token_cache  # Resolved tokens, cleared between tests.
+from . import jobs, tasks  # Database-backed job queue and its handlers.
+from .events import broker, format_event, prune_events, publish_project_event, stream_events  # Stream of project events.
+from .models import CommitMapping, PeerAssignment, PipelineRun, Project, ProjectEvent, Job, SyncState, TestCaseResult, CoverageResult  # Tables written by the code under test.
+from .utils.localrunner import container_command, run_command, start_local_run  # Runs tests on this server in containers.
+from .utils.executor import SyncExecutor  # Runs branch-level sync tasks in parallel.
+from .utils.gitmirror import COMMITTER, GitMirror, GitMirrorError, sync_peer_branches_git  # Git backend of peer syncs.
+from .utils.clients import GitlabClientRegistry  # Pool of authenticated GitLab clients.
+from .utils.assignments import ensure_assignments  # Peers assigned to test every forked project.
+from .utils.blobcache import BlobCache, git_blob_sha  # Git object ids, used as the blob SHAs of planned files.
+from .utils.languages import NO_LANGUAGE, classify_path, detect_languages  # Languages of the peers' tests.
+from .utils.pipefiles import CI_CONFIG_PATH, CI_JOBS, FALLBACK_JOB, LANGUAGE_PLACEHOLDER, ci_config, split_ci_template  # CI configuration of peer branches.
+from .utils.results import parse_report, store_reports  # Reads JUnit and coverage reports.
+from .utils.syncplan import TEST_PLACEHOLDER, commit_actions, plan_branch  # Planner of peer branch syncs.
+from .utils.refcache import can_access_project  # Cached check of a token's access to a project.
+from .utils.webhooks import handle_event  # Handler of GitLab webhook payloads.
+from .utils.uploads import UploadError, archive_actions, clean_path, iter_archive, validate_actions  # Batch update inputs.
+from .utils.utils import comment_on_commit, commit_actions_to_branch  # Commit comments and chunked multi-action commits.
+
+
+# Every test gets empty caches of its own instead of the file-based cache of the server
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def make_tar(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    buffer.seek(0)
+    return buffer
+
+
+def sha(content):
+    return git_blob_sha(content.encode('utf-8'))
+
+
+class ApiTestCase(TestCase):
+    """
+    A test case with a registered user, a forked project 10 and its testing project 11.
+    """
+    token = 'glpat-test'
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create(username='alice', email='alice@example.com', gitlabusertoken=self.token, gitlaburl='https://gitlab.example.com')
+        self.project = Project.objects.create(id=10, gitlaburl='https://gitlab.example.com', original_project_id=1, namespace='alice', gitlabaccesstoken='project-token',
+                                              testingproject={'id': 11, 'gitlabaccesstoken': 'bot-token'})
+        self.client = APIClient()
+
+
+class CleanPathTests(SimpleTestCase):
+    def test_normalises_paths(self):
+        self.assertEqual(clean_path('src/./a.py'), 'src/a.py')
+        self.assertEqual(clean_path('src\\b.py'), 'src/b.py')
+        self.assertEqual(clean_path('project-main/src/a.py', strip_components=1), 'src/a.py')
+
+    def test_rejects_paths_outside_the_repository(self):
+        for path in ('../etc/passwd', 'src/../../a.py', '/etc/passwd', '.git/config', '', '.', 'a/..'):
+            self.assertIsNone(clean_path(path), path)
+
+    def test_strip_components_cannot_empty_the_path(self):
+        self.assertIsNone(clean_path('top/a.py', strip_components=2))
+
+
+class ValidateActionsTests(SimpleTestCase):
+    def test_valid_actions(self):
+        actions, contents = validate_actions([
+            {'action': 'create', 'file_path': 'src/a.py', 'content': 'a = 1'},
+            {'action': 'update', 'file_path': 'img.bin', 'content': base64.b64encode(b'\xff\x00').decode(), 'encoding': 'base64'},
+            {'action': 'move', 'file_path': 'src/c.py', 'previous_path': 'src/b.py'},
+            {'action': 'delete', 'file_path': 'old.txt'},
+        ])
+        self.assertEqual([action['action'] for action in actions], ['create', 'update', 'move', 'delete'])
+        self.assertEqual(actions[1]['encoding'], 'base64')
+        self.assertEqual(actions[2]['previous_path'], 'src/b.py')
+        self.assertEqual(contents, {'src/a.py': b'a = 1', 'img.bin': b'\xff\x00'})
+
+    def test_invalid_actions(self):
+        invalid = [
+            [],
+            [{'action': 'chmod', 'file_path': 'a'}],
+            [{'action': 'create', 'file_path': '../a', 'content': 'x'}],
+            [{'action': 'create', 'file_path': 'a'}],
+            [{'action': 'move', 'file_path': 'a', 'previous_path': '/etc/passwd'}],
+            [{'action': 'create', 'file_path': 'a', 'content': 'not base64!', 'encoding': 'base64'}],
+        ]
+        for actions in invalid:
+            with self.assertRaises(UploadError, msg=actions):
+                validate_actions(actions)
+
+
+class ArchiveTests(SimpleTestCase):
+    def test_reads_zip_and_tar(self):
+        files = {'p/src/a.py': b'a', 'p/bin/x': b'\xff\xfe'}
+        for archive in (make_zip(files), make_tar(files)):
+            self.assertEqual(dict(iter_archive(archive)), files)
+
+    @override_settings(UPLOAD_MAX_FILES=2)
+    def test_file_count_limit(self):
+        with self.assertRaisesMessage(UploadError, 'more than 2 files'):
+            list(iter_archive(make_zip({'a': b'1', 'b': b'2', 'c': b'3'})))
+
+    @override_settings(UPLOAD_MAX_BYTES=10)
+    def test_size_limit(self):
+        for archive in (make_zip({'a': b'123456', 'b': b'123456'}), make_tar({'a': b'12345678901'})):
+            with self.assertRaisesMessage(UploadError, 'more than 10 bytes'):
+                list(iter_archive(archive))
+
+    def test_not_an_archive(self):
+        with self.assertRaises(UploadError):
+            list(iter_archive(io.BytesIO(b'plain text')))
+
+    def test_archive_actions(self):
+        archive = make_zip({'p/src/a.py': b'a', 'p/src/b.py': b'b', 'p/../evil': b'x', 'p/bin': b'\xff'})
+        actions, contents = archive_actions(archive, {'src/a.py'}, strip_components=1)
+        self.assertEqual({action['file_path']: action['action'] for action in actions}, {'src/a.py': 'update', 'src/b.py': 'create', 'bin': 'create'})
+        self.assertEqual(next(action for action in actions if action['file_path'] == 'bin')['encoding'], 'base64')
+        self.assertEqual(contents['bin'], b'\xff')
+
+    def test_empty_archive(self):
+        with self.assertRaises(UploadError):
+            archive_actions(make_zip({'../a': b'x'}), set())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RejectedTokenTests(ApiTestCase):
+    def test_rejected_token_is_a_bad_request(self):
+        with mock.patch('gitlabapp.views.gitauth', side_effect=gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')):
+            for url in ('/api/v1/tests/', '/api/v1/tests/1/'):
+                response = self.client.get(url, {'testingproject_id': 11, 'pipeline_id': 100, 'gitlabaccesstoken': self.token})
+                self.assertEqual(response.status_code, 400, url)
+                self.assertEqual(response.json()['message'], 'gitlabaccesstoken is invalid')
+
+    def test_revoked_token_cannot_access_projects(self):
+        gl = mock.Mock()
+        gl.projects.get.side_effect = gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')
+        self.assertFalse(can_access_project(gl, self.token, 11))
+        # The failure is not cached, so a valid client is asked again
+        gl.projects.get.side_effect = None
+        self.assertTrue(can_access_project(gl, self.token, 11))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PipelineEventTests(ApiTestCase):
+    def event(self, status, **attributes):
+        return {'object_kind': 'pipeline', 'project': {'id': 11},
+                'object_attributes': {'id': 100, 'ref': 'bobp1', 'sha': 'abc', 'status': status, **attributes},
+                'builds': [{'id': 7, 'name': 'test_python', 'stage': 'test', 'status': status, 'duration': 1.5}]}
+
+    def test_records_pipelines_of_testing_projects(self):
+        self.assertEqual(handle_event(self.event('running')), {'project_id': 11, 'pipeline_id': 100, 'status': 'running'})
+        run = PipelineRun.objects.get(pipeline_id=100)
+        self.assertEqual((run.testing_project_id, run.branch, run.sha, run.status), (11, 'bobp1', 'abc', 'running'))
+        self.assertEqual(run.jobs[0]['name'], 'test_python')
+
+    def test_finished_status_is_kept_and_results_are_queued(self):
+        handle_event(self.event('success', duration=3))
+        handle_event(self.event('running'))
+        self.assertEqual(PipelineRun.objects.get(pipeline_id=100).status, 'success')
+        self.assertEqual(Job.objects.filter(kind='ingest_results', payload__pipeline_id=100).count(), 1)
+
+    def test_ignores_other_projects(self):
+        event = self.event('running')
+        event['project']['id'] = 99
+        self.assertIsNone(handle_event(event))
+        self.assertFalse(PipelineRun.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventStreamTests(ApiTestCase):
+    def test_publish_by_testing_project(self):
+        event = publish_project_event(11, 'comment', {'note': 'nice'})
+        self.assertEqual((event.project_id, event.kind, event.data), (10, 'comment', {'note': 'nice'}))
+        self.assertIsNone(publish_project_event(99, 'comment', {}))
+        self.assertEqual(format_event(event), f'id: {event.id}\nevent: comment\ndata: {{"note":"nice"}}\n\n')
+
+    async def test_stream_resumes_after_last_event(self):
+        first = await ProjectEvent.objects.acreate(project_id=10, kind='pipeline', data={'status': 'running'})
+        second = await ProjectEvent.objects.acreate(project_id=10, kind='pipeline', data={'status': 'success'})
+        stream = stream_events(10, last_event_id=first.id)
+        try:
+            self.assertTrue((await stream.__anext__()).startswith('retry: '))
+            self.assertEqual(await stream.__anext__(), format_event(second))
+        finally:
+            await stream.aclose()
+        # Closing the stream unsubscribes it
+        self.assertNotIn(10, broker._subscribers)
+
+    async def test_published_events_wake_the_stream(self):
+        stream = stream_events(10, last_event_id=0)
+        try:
+            with self.settings(EVENT_STREAM_POLL_INTERVAL=60, EVENT_STREAM_HEARTBEAT=60):
+                await stream.__anext__()
+                waiting = asyncio.ensure_future(stream.__anext__())
+                event = await sync_to_async(publish_project_event)(11, 'review', {'note': '⭐⭐⭐'})
+                self.assertEqual(await asyncio.wait_for(waiting, 5), format_event(event))
+        finally:
+            await stream.aclose()
+
+    async def test_idle_stream_sends_heartbeats(self):
+        stream = stream_events(10, last_event_id=0)
+        try:
+            with self.settings(EVENT_STREAM_POLL_INTERVAL=0.01, EVENT_STREAM_HEARTBEAT=0.01):
+                await stream.__anext__()
+                self.assertEqual(await asyncio.wait_for(stream.__anext__(), 5), ': heartbeat\n\n')
+        finally:
+            await stream.aclose()
+
+    @override_settings(EVENT_RETENTION=60)
+    def test_old_events_are_pruned(self):
+        old = publish_project_event(10, 'comment', {})
+        new = publish_project_event(10, 'comment', {})
+        ProjectEvent.objects.filter(pk=old.pk).update(created_at=old.created_at - timedelta(minutes=5))
+        self.assertEqual(prune_events(), 1)
+        self.assertEqual(list(ProjectEvent.objects.values_list('pk', flat=True)), [new.pk])
+
+    def test_rejected_token_is_a_bad_request(self):
+        with mock.patch('gitlabapp.views.gitauth', side_effect=gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')):
+            response = self.client.get('/api/v1/projects/10/events/', {'gitlabaccesstoken': self.token})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_of_an_accessible_project(self):
+        with mock.patch('gitlabapp.views.gitauth'), mock.patch('gitlabapp.views.can_access_project', return_value=True):
+            response = self.client.get('/api/v1/projects/10/events/', {'gitlabaccesstoken': self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        response.close()
+
+
+class ParseReportTests(SimpleTestCase):
+    def test_junit(self):
+        report = b"""<?xml version="1.0"?>
+        <testsuites>
+          <testsuite name="calc">
+            <testcase classname="test_calc" name="test_add" time="0.5"/>
+            <testcase classname="test_calc" name="test_sub" time="0.25"><failure message="assert 1 == 2">trace</failure></testcase>
+            <testcase classname="test_calc" name="test_div"><error>ZeroDivisionError</error></testcase>
+            <testcase classname="test_calc" name="test_mul"><skipped/></testcase>
+          </testsuite>
+        </testsuites>"""
+        items = list(parse_report(io.BytesIO(report)))
+        self.assertTrue(all(kind == 'testcase' for kind, _ in items))
+        cases = {case['name']: case for _, case in items}
+        self.assertEqual([case['status'] for case in cases.values()],
+                         [TestCaseResult.PASSED, TestCaseResult.FAILED, TestCaseResult.ERROR, TestCaseResult.SKIPPED])
+        self.assertEqual(cases['test_add']['suite'], 'calc')
+        self.assertEqual(cases['test_add']['duration'], 0.5)
+        self.assertEqual(cases['test_sub']['failure_message'], 'assert 1 == 2')
+        self.assertEqual(cases['test_div']['failure_message'], 'ZeroDivisionError')
+        self.assertIsNone(cases['test_div']['duration'])
+
+    def test_single_testsuite(self):
+        report = b'<testsuite name="s"><testcase classname="c" name="t"/></testsuite>'
+        self.assertEqual([case['suite'] for _, case in parse_report(io.BytesIO(report))], ['s'])
+
+    def test_cobertura(self):
+        report = b'<coverage line-rate="0.75" branch-rate="0.5" lines-covered="3" lines-valid="4"><packages/></coverage>'
+        self.assertEqual(list(parse_report(io.BytesIO(report))), [
+            ('coverage', {'line_rate': 0.75, 'branch_rate': 0.5, 'lines_covered': 3, 'lines_valid': 4})
+        ])
+
+    def test_jacoco(self):
+        report = b"""<report name="demo">
+          <package name="p"><counter type="LINE" missed="100" covered="100"/></package>
+          <counter type="INSTRUCTION" missed="5" covered="5"/>
+          <counter type="LINE" missed="1" covered="3"/>
+        </report>"""
+        self.assertEqual(list(parse_report(io.BytesIO(report))), [
+            ('coverage', {'line_rate': 0.75, 'branch_rate': None, 'lines_covered': 3, 'lines_valid': 4})
+        ])
+
+    def test_other_xml(self):
+        self.assertEqual(list(parse_report(io.BytesIO(b'<project><modelVersion/></project>'))), [])
+
+
+class StoreReportsTests(TestCase):
+    def test_store_reports(self):
+        run = PipelineRun.objects.create(pipeline_id=100, testing_project_id=11, branch='bobp1', sha='abc', status='success')
+        junit = b'<testsuite name="s"><testcase classname="c" name="a"/><testcase classname="c" name="b"><failure/></testcase></testsuite>'
+        reports = [('report.xml', lambda: io.BytesIO(junit)), ('coverage.xml', lambda: io.BytesIO(b'<coverage line-rate="0.5"/>')),
+                   ('broken.xml', lambda: io.BytesIO(b'<testsuite'))]
+        counts = {'test_cases': 0, 'coverage': 0}
+        store_reports(run, 'test_python', reports, counts)
+        self.assertEqual(counts, {'test_cases': 2, 'coverage': 1})
+        self.assertEqual(sorted(run.test_cases.values_list('name', 'status')), [('a', 'passed'), ('b', 'failed')])
+        self.assertEqual(run.coverage.get().line_rate, 0.5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestStatisticsViewTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        run = PipelineRun.objects.create(pipeline_id=100, testing_project_id=11, branch='bobp1', sha='abc', status='success')
+        TestCaseResult.objects.bulk_create([TestCaseResult(run=run, job_name='test_python', name=f't{i}', status='passed', duration=i) for i in range(1, 4)])
+
+    def slowest(self, **params):
+        with mock.patch('gitlabapp.views.gitauth'), mock.patch('gitlabapp.views.can_access_project', return_value=True):
+            return self.client.get('/api/v1/tests/slowest/', {'testingproject_id': 11, 'gitlabaccesstoken': self.token, **params})
+
+    def test_slowest_first(self):
+        response = self.slowest(limit=2)
+        self.assertEqual([case['name'] for case in response.json()['data']], ['t3', 't2'])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.slowest(limit=0).json()['data']), 1)
+        self.assertEqual(len(self.slowest(limit=-5).json()['data']), 1)
+        self.assertEqual(len(self.slowest(limit=1000).json()['data']), 3)
+        self.assertEqual(self.slowest(limit='many').status_code, 400)
+
+    def test_rejected_token_is_a_bad_request(self):
+        with mock.patch('gitlabapp.views.gitauth', side_effect=gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')):
+            for url in ('/api/v1/tests/stats/', '/api/v1/tests/slowest/'):
+                response = self.client.get(url, {'testingproject_id': 11, 'gitlabaccesstoken': self.token})
+                self.assertEqual(response.status_code, 400, url)
+
+
+class PlanBranchTests(SimpleTestCase):
+    def plan(self, branch_blobs, source_blobs=None, main_blobs=None, is_new=False):
+        return plan_branch(None, 'bobp1', is_new, source_blobs or {}, main_blobs or {}, branch_blobs, None)
+
+    def test_create_update_delete(self):
+        pipefile = ci_config((NO_LANGUAGE,))
+        plan = self.plan(
+            branch_blobs={'src/a.py': sha('old'), 'src/same.py': sha('same'), 'src/gone.py': sha('gone'), 'test/t.py': sha('t'), CI_CONFIG_PATH: pipefile.sha},
+            source_blobs={'src/a.py': sha('new'), 'src/same.py': sha('same'), 'src/b.py': sha('b'), 'test/own.py': sha('own')},
+            main_blobs={'README': sha('readme')},
+        )
+        actions = {action['file_path']: action for action in plan.actions}
+        self.assertEqual({path: action['action'] for path, action in actions.items()},
+                         {'src/a.py': 'update', 'src/b.py': 'create', 'README': 'create', 'src/gone.py': 'delete'})
+        self.assertEqual(actions['src/a.py']['origin'], 'source')
+        self.assertEqual(actions['README']['origin'], 'main')
+        self.assertIsNone(actions['src/gone.py']['blob_id'])
+
+    def test_source_overrides_main(self):
+        plan = self.plan({}, source_blobs={'README': sha('fork')}, main_blobs={'README': sha('main')})
+        readme = next(action for action in plan.actions if action['file_path'] == 'README')
+        self.assertEqual((readme['blob_id'], readme['origin']), (sha('fork'), 'source'))
+
+    def test_up_to_date_branch_has_no_actions(self):
+        pipefile = ci_config((NO_LANGUAGE,))
+        plan = self.plan({'src/a.py': sha('a'), CI_CONFIG_PATH: pipefile.sha}, source_blobs={'src/a.py': sha('a')})
+        self.assertEqual(plan.actions, [])
+        self.assertEqual(plan.commits, 0)
+
+    def test_new_branch_gets_placeholder_and_pipefile(self):
+        plan = self.plan({}, source_blobs={'src/a.py': sha('a'), 'test/own.py': sha('own')}, is_new=True)
+        actions = {action['file_path']: action for action in plan.actions}
+        self.assertEqual(actions[TEST_PLACEHOLDER['path']]['origin'], 'placeholder')
+        self.assertEqual(actions[CI_CONFIG_PATH]['origin'], 'pipefile')
+        self.assertNotIn('test/own.py', actions)
+        self.assertTrue(plan.message.endswith('[ci skip]'))
+
+
+class CommitActionsToBranchTests(SimpleTestCase):
+    @override_settings(GITLAB_COMMIT_MAX_ACTIONS=1)
+    def test_failed_chunk_is_reported(self):
+        gl = mock.Mock()
+        gl.projects.get.return_value.commits.create.side_effect = [mock.Mock(id='c1'), gitlab.exceptions.GitlabCreateError('rejected'), mock.Mock(id='c3')]
+        actions = [{'action': 'create', 'file_path': f'f{i}', 'content': 'x'} for i in range(3)]
+        self.assertEqual(commit_actions_to_branch(gl, 1, 'bobp1', actions, 'sync'), ('c1', False))
+
+    @override_settings(GITLAB_COMMIT_MAX_ACTIONS=2)
+    def test_all_chunks_committed(self):
+        gl = mock.Mock()
+        gl.projects.get.return_value.commits.create.side_effect = [mock.Mock(id='c1'), mock.Mock(id='c2')]
+        actions = [{'action': 'create', 'file_path': f'f{i}', 'content': 'x'} for i in range(3)]
+        self.assertEqual(commit_actions_to_branch(gl, 1, 'bobp1', actions, 'sync'), ('c2', True))
+        self.assertEqual(commit_actions_to_branch(gl, 1, 'bobp1', [], 'sync'), (None, True))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncPlanViewTests(ApiTestCase):
+    def test_rejected_token_is_a_bad_request(self):
+        with mock.patch('gitlabapp.views.gitauth', side_effect=gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')):
+            response = self.client.get('/api/v1/projects/10/sync_plan/', {'gitlabaccesstoken': self.token})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'gitlabaccesstoken is invalid')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchUpdateViewTests(ApiTestCase):
+    url = '/api/v1/projects/10/batch_update/'
+
+    def setUp(self):
+        super().setUp()
+        self.gl = mock.Mock()
+        self.gl.projects.get.return_value.repository_tree.return_value = [{'path': 'src/a.py', 'type': 'blob'}, {'path': 'src', 'type': 'tree'}]
+        for target, kwargs in [('gitauth', {'return_value': self.gl}), ('can_access_project', {'return_value': True}),
+                               ('get_cohort_usernames', {'return_value': ['bob']}), ('sync_commit', {'return_value': ['t1']}),
+                               ('commit_actions_to_branch', {'return_value': ('c1', True)})]:
+            patcher = mock.patch(f'gitlabapp.views.{target}', **kwargs)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def post(self, data, format='json'):
+        return self.client.post(self.url, {'gitlabaccesstoken': self.token, 'branch_name': 'main', 'commit_message': 'Update', **data}, format=format)
+
+    def test_actions_are_committed_and_synced(self):
+        actions = [{'action': 'create', 'file_path': 'src/b.py', 'content': 'b'}, {'action': 'delete', 'file_path': 'src/a.py'}]
+        response = self.post({'actions': actions})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'commit': 'c1', 'actions': 2, 'testing_commits': ['t1']})
+        self.assertEqual(self.commit_actions_to_branch.call_args.args[4], 'Update [ci skip]')
+        self.assertEqual(self.sync_commit.call_args.args[4], {'src/b.py': b'b'})
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.commits, {'c1': ['t1']})
+        self.assertEqual(list(CommitMapping.objects.values_list('source_sha', 'testing_sha')), [('c1', 't1')])
+
+    def test_archive_updates_existing_files(self):
+        archive = make_zip({'src/a.py': b'a', 'src/c.py': b'c'})
+        archive.name = 'upload.zip'
+        response = self.post({'archive': archive}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        actions = {action['file_path']: action['action'] for action in self.commit_actions_to_branch.call_args.args[3]}
+        self.assertEqual(actions, {'src/a.py': 'update', 'src/c.py': 'create'})
+
+    def test_invalid_actions_are_a_bad_request(self):
+        response = self.post({'actions': [{'action': 'create', 'file_path': '../a.py', 'content': 'a'}]})
+        self.assertEqual(response.status_code, 400)
+        self.commit_actions_to_branch.assert_not_called()
+
+    def test_incomplete_commit_is_not_synced(self):
+        self.commit_actions_to_branch.return_value = ('c1', False)
+        response = self.post({'actions': [{'action': 'create', 'file_path': 'src/b.py', 'content': 'b'}]})
+        self.assertEqual(response.status_code, 400)
+        self.sync_commit.assert_not_called()
+
+    def test_rejected_token_is_a_bad_request(self):
+        self.gitauth.side_effect = gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')
+        response = self.post({'actions': [{'action': 'create', 'file_path': 'src/b.py', 'content': 'b'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'gitlabaccesstoken is invalid')
+
+
+@mock.patch('gitlabapp.utils.clients.time.monotonic')
+@mock.patch('gitlabapp.utils.clients.gitlab.Gitlab', side_effect=lambda *args, **kwargs: mock.Mock())
+class GitlabClientRegistryTests(SimpleTestCase):
+    def test_client_is_reused_until_the_auth_ttl_expires(self, Gitlab, monotonic):
+        registry = GitlabClientRegistry(auth_ttl=300)
+        monotonic.return_value = 0
+        client = registry.get('https://gitlab.example.com', 'a')
+        monotonic.return_value = 299
+        self.assertIs(registry.get('https://gitlab.example.com', 'a'), client)
+        self.assertEqual(client.auth.call_count, 1)
+        monotonic.return_value = 600
+        self.assertIs(registry.get('https://gitlab.example.com', 'a'), client)
+        self.assertEqual(client.auth.call_count, 2)
+        self.assertEqual(Gitlab.call_count, 1)
+
+    def test_tokens_of_a_host_share_one_session(self, Gitlab, monotonic):
+        registry = GitlabClientRegistry()
+        monotonic.return_value = 0
+        self.assertIsNot(registry.get('https://gitlab.example.com', 'a'), registry.get('https://gitlab.example.com', 'b'))
+        registry.get('https://other.example.com', 'a')
+        sessions = [call.kwargs['session'] for call in Gitlab.call_args_list]
+        self.assertIs(sessions[0], sessions[1])
+        self.assertIsNot(sessions[0], sessions[2])
+
+    def test_least_recently_used_and_idle_clients_are_evicted(self, Gitlab, monotonic):
+        registry = GitlabClientRegistry(max_clients=2, idle_timeout=100)
+        monotonic.return_value = 0
+        first = registry.get('https://gitlab.example.com', 'a')
+        registry.get('https://gitlab.example.com', 'b')
+        registry.get('https://gitlab.example.com', 'a')
+        registry.get('https://gitlab.example.com', 'c')
+        self.assertEqual(len(registry._clients), 2)
+        self.assertIs(registry.get('https://gitlab.example.com', 'a'), first)
+        monotonic.return_value = 50
+        registry.get('https://gitlab.example.com', 'a')
+        monotonic.return_value = 120
+        registry.get('https://gitlab.example.com', 'd')
+        self.assertEqual(len(registry._clients), 2)
+
+    def test_rejected_token_is_forgotten(self, Gitlab, monotonic):
+        registry = GitlabClientRegistry(auth_ttl=0)
+        monotonic.return_value = 0
+        client = registry.get('https://gitlab.example.com', 'a')
+        client.auth.side_effect = gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')
+        with self.assertRaises(gitlab.exceptions.GitlabAuthenticationError):
+            registry.get('https://gitlab.example.com', 'a')
+        self.assertEqual(len(registry._clients), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProjectRejectedTokenTests(ApiTestCase):
+    def test_rejected_token_is_refused(self):
+        with mock.patch('gitlabapp.views.gitauth', side_effect=gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')):
+            self.assertEqual(self.client.get('/api/v1/projects/', {'gitlabaccesstoken': self.token}).status_code, 400)
+            self.assertEqual(self.client.get('/api/v1/projects/10/', {'gitlabaccesstoken': self.token}).status_code, 400)
+            response = self.client.put('/api/v1/projects/10/', {'gitlabaccesstoken': self.token, 'file_path': 'a.py', 'commit_message': 'Update',
+                                                                'content': 'a', 'projectid': 10, 'branch_name': 'main'}, format='json')
+            self.assertEqual(response.status_code, 401)
+
+    def test_rejected_token_when_commenting(self):
+        CommitMapping.objects.create(project=self.project, source_sha='a1', testing_sha='t1', branch='bobp1')
+        with mock.patch('gitlabapp.utils.utils.gitauth', side_effect=gitlab.exceptions.GitlabAuthenticationError('401 Unauthorized')):
+            self.assertEqual(comment_on_commit(self.user.gitlaburl, model_to_dict(self.project), 'a1', 'Looks good'),
+                             (False, 'Invalid GitLab token for testing project'))
+
+
+class CiConfigTests(SimpleTestCase):
+    def test_split_ci_template(self):
+        template = "stages:\n  - test\n\n# Python tests\ntest_python:\n  script:\n    - pytest\n\n  after_script:\n    - echo\n\n.hidden:\n  rules: []\n"
+        shared, jobs = split_ci_template(template)
+        self.assertEqual(list(jobs), ['test_python'])
+        # A job starts with the comments above it
+        self.assertEqual(jobs['test_python'].strip('\n').split('\n')[:2], ['# Python tests', 'test_python:'])
+        self.assertIn('  after_script:', jobs['test_python'])
+        self.assertIn('stages:', shared)
+        self.assertIn('.hidden:', shared)
+        self.assertNotIn('pytest', shared)
+
+    def test_ci_config(self):
+        config = ci_config(('python',))
+        self.assertEqual(config.path, CI_CONFIG_PATH)
+        self.assertIn('test_python:', config.content)
+        self.assertNotIn('test_java:', config.content)
+        self.assertNotIn(LANGUAGE_PLACEHOLDER, config.content)
+        self.assertNotIn('\n\n\n', config.content)
+        self.assertEqual(config.sha, sha(config.content))
+
+    def test_fallback_job(self):
+        self.assertIn(FALLBACK_JOB, CI_JOBS)
+        self.assertIn(f'{FALLBACK_JOB}:', ci_config((NO_LANGUAGE,)).content)
+        self.assertIn(f'{FALLBACK_JOB}:', ci_config(('not-a-language',)).content)
+
+
+class DetectLanguagesTests(SimpleTestCase):
+    def test_by_extension(self):
+        self.assertEqual(classify_path('test/Calc.JAVA'), 'java')
+        self.assertIsNone(classify_path('test/README'))
+        self.assertEqual(detect_languages(['test/a.py', 'test/b.py', 'test/c.js', 'test/README']), ['python', 'nodejs'])
+
+    def test_by_content(self):
+        read = mock.Mock(return_value=b'import unittest\n')
+        self.assertEqual(detect_languages(['test/check'], read=read), ['python'])
+        read.assert_called_once_with('test/check')
+
+    def test_content_only_read_without_known_extension(self):
+        read = mock.Mock()
+        detect_languages(['test/a.py', 'test/check'], read=read)
+        read.assert_not_called()
+
+    def test_nothing_detected(self):
+        self.assertEqual(detect_languages([]), [NO_LANGUAGE])
+        self.assertEqual(detect_languages(['test/data'], read=lambda path: b'\x00'), [NO_LANGUAGE])
+
+
+class BlobCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_git_blob_sha(self):
+        # The object id `git hash-object` prints for these contents
+        self.assertEqual(git_blob_sha(b''), 'e69de29bb2d1d6434b8b29ae775ad8c2e48c5391')
+        self.assertEqual(git_blob_sha(b'hello\n'), 'ce013625030ba8dba906f756967f9e9ca394464a')
+
+    def test_memory_only(self):
+        cache = BlobCache(max_memory_bytes=8)
+        cache.put('a', b'1234')
+        cache.put('b', b'5678')
+        cache.get('a')
+        cache.put('c', b'9')
+        self.assertEqual(cache.get('a'), b'1234')
+        self.assertIsNone(cache.get('b'))
+        self.assertIn('c', cache)
+        cache.put('big', b'123456789')
+        self.assertNotIn('big', cache)
+
+    def test_disk_tier_survives_a_new_cache(self):
+        cache = BlobCache(self.directory, max_memory_bytes=0)
+        cache.put('ab12', b'content')
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'ab', 'ab12')))
+        self.assertEqual(BlobCache(self.directory).get('ab12'), b'content')
+        self.assertIsNone(cache.get('cd34'))
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = BlobCache(self.directory, max_memory_bytes=0, max_disk_bytes=8)
+        cache.put('aa01', b'1234')
+        cache.put('bb02', b'5678')
+        os.utime(os.path.join(self.directory, 'aa', 'aa01'), (0, 0))
+        cache.put('cc03', b'9')
+        self.assertNotIn('aa01', cache)
+        self.assertEqual((cache.get('bb02'), cache.get('cc03')), (b'5678', b'9'))
+
+
+class SyncExecutorTests(SimpleTestCase):
+    def test_results_keep_the_order_of_the_tasks(self):
+        executor = SyncExecutor(max_workers=4)
+        error = ValueError('branch failed')
+
+        def fail():
+            raise error
+
+        results = executor.run('https://gitlab.example.com', [lambda i=i: time.sleep(0.01 * (3 - i)) or i for i in range(3)] + [fail])
+        self.assertEqual(results, [0, 1, 2, error])
+
+    def test_tasks_per_host_are_capped(self):
+        executor = SyncExecutor(max_workers=8, per_host=2)
+        lock = threading.Lock()
+        running = {'now': 0, 'most': 0}
+
+        def task():
+            with lock:
+                running['now'] += 1
+                running['most'] = max(running['most'], running['now'])
+            time.sleep(0.02)
+            with lock:
+                running['now'] -= 1
+
+        executor.run('https://gitlab.example.com', [task] * 6)
+        self.assertLessEqual(running['most'], 2)
+
+    def test_single_worker_runs_in_the_calling_thread(self):
+        executor = SyncExecutor(max_workers=1)
+        self.assertEqual(executor.run('https://gitlab.example.com', [threading.get_ident] * 2), [threading.get_ident()] * 2)
+        self.assertIsNone(executor._pool)
+
+
+@override_settings(JOB_RETRY_DELAY=30)
+class JobQueueTests(TestCase):
+    def run_next(self):
+        job = jobs.claim_next_job()
+        return job and jobs.run_job(job)
+
+    def test_job_runs_its_stages(self):
+        def provision(job):
+            jobs.start_stage(job, 'fork')
+            jobs.start_stage(job, 'sync')
+            return {'id': job.payload['id']}
+
+        with mock.patch.dict(jobs.HANDLERS, {'provision': provision}):
+            jobs.enqueue('provision', {'id': 10})
+            job = self.run_next()
+        self.assertEqual((job.status, job.result, job.attempts), (Job.SUCCEEDED, {'id': 10}, 1))
+        self.assertEqual([(entry['stage'], entry['status']) for entry in job.progress], [('fork', Job.SUCCEEDED), ('sync', Job.SUCCEEDED)])
+        self.assertIsNone(self.run_next())
+
+    def test_failed_attempts_are_retried_with_back_off(self):
+        with mock.patch.dict(jobs.HANDLERS, {'flaky': mock.Mock(side_effect=RuntimeError('GitLab is down'))}):
+            job = jobs.enqueue('flaky', {}, max_attempts=2)
+            job = self.run_next()
+            self.assertEqual((job.status, job.error), (Job.QUEUED, 'GitLab is down'))
+            # The retry is not due yet
+            self.assertIsNone(jobs.claim_next_job())
+            Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+            job = self.run_next()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_job_failed_and_unknown_kinds_are_not_retried(self):
+        def fail(job):
+            raise jobs.JobFailed('project not found')
+
+        with mock.patch.dict(jobs.HANDLERS, {'fail': fail}):
+            jobs.enqueue('fail', {})
+            self.assertEqual(self.run_next().status, Job.FAILED)
+        jobs.enqueue('unknown', {})
+        self.assertEqual(self.run_next().status, Job.FAILED)
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_stale_jobs_are_released(self):
+        job = jobs.enqueue('provision', {})
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, locked_at=job.created_at - timedelta(minutes=5))
+        self.assertEqual(jobs.release_stale_jobs(), 1)
+        self.assertEqual(jobs.claim_next_job().pk, job.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PushEventTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project.testing_project_id = 11
+        self.project.save()
+
+    def push(self, project_id, branch, after, user_name='alice'):
+        return handle_event({'object_kind': 'push', 'ref': f'refs/heads/{branch}', 'after': after, 'user_name': user_name,
+                             'project': {'id': project_id, 'default_branch': 'main'}})
+
+    def test_pushes_to_the_default_branch_share_one_sync(self):
+        first = self.push(10, 'main', 'a1')
+        second = self.push(10, 'main', 'a2')
+        self.assertEqual(first['job'], second['job'])
+        self.assertEqual(Job.objects.get(pk=first['job']).payload, {'project_id': 10, 'sha': 'a2'})
+        Job.objects.filter(pk=first['job']).update(status=Job.RUNNING)
+        self.assertNotEqual(self.push(10, 'main', 'a3')['job'], first['job'])
+
+    def test_peer_pushes_refresh_the_pipeline_files(self):
+        job = Job.objects.get(pk=self.push(11, 'bobp1', 't1')['job'])
+        self.assertEqual((job.kind, job.payload), ('refresh_pipefiles', {'testing_project_id': 11, 'branch': 'bobp1'}))
+        self.assertIsNone(handle_event({'object_kind': 'push', 'ref': 'refs/tags/v1', 'project': {'id': 11}}))
+
+    def test_own_commits_do_not_refresh_the_pipeline_files(self):
+        CommitMapping.objects.create(project=self.project, source_sha='a1', testing_sha='t1', branch='bobp1')
+        self.assertIsNone(self.push(11, 'bobp1', 't1')['job'])
+        self.assertIsNone(self.push(11, 'bobp1', 't2', user_name='ptbot')['job'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_sync_links_the_pushed_commit(self):
+        job = Job.objects.get(pk=self.push(10, 'main', 'a1')['job'])
+        SyncState.objects.create(source_project_id=10, testing_project_id=11, branch='bobp1', last_synced_sha='a1')
+        SyncState.objects.create(source_project_id=10, testing_project_id=11, branch='carolp1', last_synced_sha='a0')
+        with mock.patch('gitlabapp.tasks.gitauth'), mock.patch('gitlabapp.tasks.get_cohort_usernames', return_value=['alice', 'bob']), \
+                mock.patch('gitlabapp.tasks.update_peertestingproject', return_value=(True, '', {10: ['t1']})):
+            self.assertEqual(tasks.peer_sync(job), {'project_id': 10, 'commits': ['t1']})
+            job.payload['sha'] = 'a2'
+            tasks.peer_sync(job)
+        self.assertEqual(list(CommitMapping.objects.values_list('source_sha', 'testing_sha')), [('a1', 't1')])
+
+
+def make_repository(path, files):
+    """
+    Create a bare repository at `path` whose main branch holds `files`, a dictionary of path -> bytes.
+    """
+    environment = {**os.environ, **COMMITTER}
+    work = path + '.work'
+    subprocess.run(['git', 'init', '--quiet', '--initial-branch=main', work], check=True, env=environment)
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(work, name)), exist_ok=True)
+        with open(os.path.join(work, name), 'wb') as file:
+            file.write(content)
+    subprocess.run(['git', 'add', '-A'], cwd=work, check=True, env=environment)
+    subprocess.run(['git', 'commit', '--quiet', '-m', 'Initial commit'], cwd=work, check=True, env=environment)
+    subprocess.run(['git', 'clone', '--quiet', '--bare', work, path], check=True, env=environment)
+    return path
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GitMirrorTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.testing_url = make_repository(os.path.join(self.directory, 'testing.git'), {'README': b'main'})
+        self.fork_url = make_repository(os.path.join(self.directory, 'fork.git'), {'src/a.py': b'a', 'test/own_test.py': b'import unittest'})
+        self.project = {'id': 10, 'gitlabaccesstoken': 'project-token', 'testingproject': {'id': 11, 'gitlabaccesstoken': 'bot-token'}}
+        settings = self.settings(GIT_MIRROR_DIR=os.path.join(self.directory, 'mirrors'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def sync(self, branches):
+        return sync_peer_branches_git(self.project, {'branch': 'main'}, branches, self.fork_url, self.testing_url)
+
+    def remote(self, *args):
+        return subprocess.run(['git', '--git-dir', self.testing_url, *args], check=True, capture_output=True).stdout.decode()
+
+    def test_peer_branches_are_composed_and_pushed(self):
+        [(branch, (sha, synced))] = self.sync(['bobp1'])
+        self.assertEqual((branch, synced), ('bobp1', True))
+        self.assertEqual(self.remote('rev-parse', 'refs/heads/bobp1').strip(), sha)
+        self.assertEqual(sorted(self.remote('ls-tree', '-r', '--name-only', 'bobp1').split()), sorted(['README', 'src/a.py', 'test/init.txt', CI_CONFIG_PATH]))
+        # Nothing changed since, so nothing is committed
+        self.assertEqual(self.sync(['bobp1']), [('bobp1', (None, True))])
+
+    def test_rejected_refs_are_not_accepted(self):
+        self.sync(['bobp1'])
+        mirror = GitMirror(os.path.join(self.directory, 'mirrors', '11.git'))
+        heads = mirror.refs('refs/testing/')
+        stale = mirror.commit(mirror.git('rev-parse', f"{heads['main']}^{{tree}}"), heads['main'], 'Not a fast-forward')
+        self.assertEqual(mirror.push(self.testing_url, None, {'bobp1': stale, 'carolp1': stale}), {'carolp1'})
+
+    def test_failed_push_raises(self):
+        self.sync(['bobp1'])
+        mirror = GitMirror(os.path.join(self.directory, 'mirrors', '11.git'))
+        with self.assertRaisesRegex(GitMirrorError, 'git push failed: .+'):
+            mirror.push(os.path.join(self.directory, 'missing.git'), None, {'bobp1': mirror.refs('refs/testing/')['main']})
+
+    def test_files_are_read_as_bytes(self):
+        mirror = GitMirror(os.path.join(self.directory, 'fork.git'))
+        paths, read = mirror.tree_files('main^{tree}')
+        self.assertEqual(sorted(paths), ['src/a.py', 'test/own_test.py'])
+        self.assertEqual(read('src/a.py'), b'a')
+        with self.assertRaises(GitMirrorError):
+            read('missing.py')
+
+
+class CommitActionsTests(SimpleTestCase):
+    def commit(self, *diffs):
+        defaults = {'new_file': False, 'renamed_file': False, 'deleted_file': False, 'diff': '@@'}
+        return mock.Mock(diff=mock.Mock(return_value=[{**defaults, **diff} for diff in diffs]))
+
+    def test_translates_the_diff(self):
+        commit = self.commit(
+            {'old_path': 'src/a.py', 'new_path': 'src/a.py'},
+            {'old_path': 'src/b.py', 'new_path': 'src/b.py', 'new_file': True},
+            {'old_path': 'src/old.py', 'new_path': 'src/old.py', 'deleted_file': True},
+            {'old_path': 'src/x.py', 'new_path': 'src/y.py', 'renamed_file': True, 'diff': ''},
+            {'old_path': 'test/t.py', 'new_path': 'test/t.py'},
+        )
+        actions = commit_actions(commit, {'src/a.py': 'a', 'src/b.py': b'b'})
+        self.assertEqual([(action['action'], action['file_path']) for action in actions],
+                         [('update', 'src/a.py'), ('create', 'src/b.py'), ('delete', 'src/old.py'), ('move', 'src/y.py')])
+        self.assertEqual(actions[0]['blob_id'], sha('a'))
+        self.assertEqual(actions[3]['previous_path'], 'src/x.py')
+
+    def test_unknown_content(self):
+        commit = self.commit({'old_path': 'src/a.py', 'new_path': 'src/a.py'})
+        self.assertIsNone(commit_actions(commit, {}))
+
+    def test_files_already_on_the_branch_are_updated(self):
+        commit = self.commit(
+            {'old_path': 'README', 'new_path': 'README', 'new_file': True},
+            {'old_path': 'src/x.py', 'new_path': 'LICENSE', 'renamed_file': True},
+            {'old_path': 'src/z.py', 'new_path': 'NOTICE', 'renamed_file': True, 'diff': ''},
+        )
+        branch_paths = {'README', 'LICENSE', 'NOTICE'}
+        actions = commit_actions(commit, {'README': 'fork', 'LICENSE': 'MIT'}, branch_paths)
+        self.assertIsNone(actions)
+        actions = commit_actions(commit, {'README': 'fork', 'LICENSE': 'MIT', 'NOTICE': 'n'}, branch_paths)
+        self.assertEqual([(action['action'], action['file_path']) for action in actions],
+                         [('update', 'README'), ('delete', 'src/x.py'), ('update', 'LICENSE'), ('delete', 'src/z.py'), ('update', 'NOTICE')])
+
+
+class EnsureAssignmentsTests(TestCase):
+    @override_settings(PEER_ASSIGNMENT_STRATEGY='round_robin', PEER_REVIEWERS=1)
+    def test_new_cohort(self):
+        self.assertEqual(ensure_assignments(1, ['a', 'b']), {'a': ['ap0', 'bp1'], 'b': ['ap1', 'bp0']})
+        # Stored assignments are returned again without new rows
+        self.assertEqual(ensure_assignments(1, ['b', 'a']), {'a': ['ap0', 'bp1'], 'b': ['ap1', 'bp0']})
+        self.assertEqual(PeerAssignment.objects.filter(original_project_id=1).count(), 4)
+
+    @override_settings(PEER_ASSIGNMENT_STRATEGY='round_robin')
+    def test_legacy_cohort_keeps_all_pairs(self):
+        Project.objects.create(id=10, gitlaburl='https://gitlab.example.com', original_project_id=2, namespace='a', gitlabaccesstoken='token')
+        branches = ensure_assignments(2, ['a', 'b'])
+        self.assertEqual(branches['a'], ['ap0', 'ap1', 'bp0', 'bp1'])
+        self.assertEqual(set(PeerAssignment.objects.filter(original_project_id=2).values_list('strategy', flat=True)), {'all_pairs'})
+
+    @override_settings(PEER_ASSIGNMENT_STRATEGY='round_robin', PEER_REVIEWERS=1)
+    def test_rows_stored_by_a_concurrent_sync(self):
+        # Another sync, which only knew 'a' and 'b', stored its assignments after this one read the (empty) cohort
+        ensure_assignments(3, ['a', 'b'])
+        select_for_update = PeerAssignment.objects.select_for_update
+        with mock.patch.object(PeerAssignment.objects, 'select_for_update', side_effect=[PeerAssignment.objects.none(), select_for_update()]):
+            branches = ensure_assignments(3, ['a', 'b', 'c'])
+        stored = {}
+        for author, branch in PeerAssignment.objects.filter(original_project_id=3).values_list('author', 'branch'):
+            stored.setdefault(author, []).append(branch)
+        self.assertEqual(branches, {author: sorted(author_branches) for author, author_branches in stored.items()})
+        # The newcomer is added on top of the stored assignments, as if the syncs had run one after the other
+        ensure_assignments(4, ['a', 'b'])
+        self.assertEqual(branches, ensure_assignments(4, ['a', 'b', 'c']))
+        reviewers = Counter(PeerAssignment.objects.filter(original_project_id=3).exclude(reviewer=F('author')).values_list('author', 'reviewer'))
+        self.assertEqual(set(reviewers.values()), {1})
+
+
+@override_settings(LOCAL_RUNNER_IMAGE='peertest-runner', LOCAL_RUNNER_MEMORY_BYTES=2 * 1024 * 1024 * 1024, LOCAL_RUNNER_TIMEOUT=5)
+class LocalRunnerTests(ApiTestCase):
+    def test_container_is_isolated(self):
+        args = container_command('peertest-1', 'python3 -m pytest', '/tmp/checkout', {'LANGUAGE': 'python'})
+        self.assertEqual(args[:2], ['docker', 'run'])
+        self.assertEqual(args[-4:], ['peertest-runner', 'sh', '-c', 'python3 -m pytest'])
+        options = list(zip(args, args[1:]))
+        for option in [('--network', 'none'), ('--cap-drop', 'ALL'), ('--memory', str(2 * 1024 * 1024 * 1024)),
+                       ('--volume', f"{os.path.realpath('/tmp/checkout')}:/work"), ('--user', f'{os.getuid()}:{os.getgid()}')]:
+            self.assertIn(option, options)
+        # The checkout is the only directory of the host the container sees
+        self.assertEqual([value for option, value in options if option == '--volume'], [f"{os.path.realpath('/tmp/checkout')}:/work"])
+        self.assertIn('--env=LANGUAGE=python', args)
+
+    def test_timed_out_container_is_removed(self):
+        process = mock.Mock(pid=123)
+        process.wait.side_effect = [subprocess.TimeoutExpired('docker', 5), None]
+        with mock.patch('gitlabapp.utils.localrunner.subprocess.Popen', return_value=process), \
+                mock.patch('gitlabapp.utils.localrunner.subprocess.run') as run, mock.patch('gitlabapp.utils.localrunner.os.killpg'):
+            returncode, _, _ = run_command('sleep 60', self.id())
+        self.assertIsNone(returncode)
+        name = run.call_args.args[0][3]
+        self.assertEqual(run.call_args.args[0], ['docker', 'rm', '--force', name])
+        self.assertTrue(name.startswith('peertest-'))
+
+    def test_runs_are_queued_for_the_job_worker(self):
+        self.project.testing_project_id = 11
+        self.project.save()
+        run = start_local_run(11, 'bobp1', 'abc')
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.payload, job.max_attempts), ('local_run', {'run_id': run.id}, 1))
+
+        files = [{'path': 'src/a.py', 'content': b'a', 'mode': '100644'}, {'path': 'test/test_a.py', 'content': b'import unittest', 'mode': '100644'}]
+        with mock.patch('gitlabapp.tasks.gitauth'), mock.patch('gitlabapp.tasks.iter_files_in_branch', return_value=iter(files)) as iter_files, \
+                mock.patch('gitlabapp.utils.localrunner.run_command', return_value=(0, 1.5, 'ok')) as run_command:
+            self.assertEqual(tasks.local_run(job), {'run_id': run.id, 'status': 'success'})
+        # The recorded commit is tested, not the branch head at the time the job runs
+        self.assertEqual(iter_files.call_args.args[1:3], (11, 'abc'))
+        self.assertEqual(run_command.call_args.args[0], 'python3 -m pytest ./test/ --junitxml=report.xml')
+        run.refresh_from_db()
+        self.assertEqual([(job['name'], job['status']) for job in run.jobs], [('local_python', 'success')])
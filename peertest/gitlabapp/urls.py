@@ -1,7 +1,7 @@
 # Import necessary modules and classes for defining URL patterns
 from django.urls import path, include  # Import path and include for routing
 from rest_framework.routers import DefaultRouter  # Import DefaultRouter for easy routing of viewsets
-from .views import ProjectViewSet, Comment, Review, StatusAPIView,TestViewSet  # Import the view classes that will handle the requests
+from .views import ProjectViewSet, Comment, Review, StatusAPIView,TestViewSet, JobAPIView, GitlabWebhookAPIView, ProjectEventStreamView  # Import the view classes that will handle the requests
 
 
 # Create an instance of DefaultRouter, which automatically generates URL patterns for viewsets
@@ -18,6 +18,9 @@ urlpatterns = [
     # Map the 'status/' URL path to the StatusAPIView and give it a name 'status-api'
     path('status/', StatusAPIView.as_view(), name='status-api'),  
     
+    # Map the 'projects/<id>/events/' URL path to the ProjectEventStreamView that streams project updates
+    path('projects/<int:pk>/events/', ProjectEventStreamView.as_view(), name='project-events'),  
+
     # Include the router's generated URLs; this will cover all routes for the registered viewsets
     path('', include(router.urls)),  
     
@@ -26,6 +29,12 @@ urlpatterns = [
     
     # Map the 'reviews/' URL path to the Review view and give it a name 'review-api'
     path('reviews/', Review.as_view(), name='review'),  
+
+    # Map the 'jobs/<id>/' URL path to the JobAPIView to follow background jobs
+    path('jobs/<uuid:pk>/', JobAPIView.as_view(), name='job'),  
+
+    # Map the 'webhooks/gitlab/' URL path to the GitlabWebhookAPIView that receives GitLab events
+    path('webhooks/gitlab/', GitlabWebhookAPIView.as_view(), name='gitlab-webhook'),  
 ]
 
 
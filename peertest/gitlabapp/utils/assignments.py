@@ -0,0 +1,234 @@
+import random  # Standard library module for seeded, reproducible assignments.
+from collections import Counter  # Counts how many authors every peer tests.
+
+from django.conf import settings  # Django settings, used to read the assignment strategy.
+from django.db import IntegrityError, transaction  # Keeps concurrent syncs of one cohort from assigning twice.
+
+from ..models import PeerAssignment, Project  # Assignments are stored once made; saved projects reveal cohorts created before them.
+
+
+def peer_branch(username, slot):
+    """
+    :param username: The peer working on the branch.
+    :param slot: 0 for the author's own branch, 1 and up for the peers testing the author.
+    :return: The name of the branch in the author's testing project.
+    """
+    return f"{username}p{slot}"
+
+
+class AssignmentStrategy:
+    """
+    Decides which peers test which forked project.
+
+    Assignments that were stored are never changed, since peers may already have written tests on their
+    branches; strategies only add assignments for participants who joined since the last call.
+    """
+    name = None
+
+    def __init__(self, reviewers=3, seed=None, group_size=4):
+        self.reviewers = reviewers
+        self.rng = random.Random(seed)
+        self.group_size = group_size
+
+    def order(self, usernames):
+        # The order participants are assigned in
+        return sorted(usernames)
+
+    def assign(self, usernames, existing, groups):
+        """
+        :param usernames: The usernames of every participant, sorted.
+        :param existing: A dictionary of author -> list of the peers already assigned to the author.
+        :param groups: A dictionary of username -> group of the stored group-based assignments.
+        :return: A list of new (author, reviewer, group) tuples.
+        """
+        raise NotImplementedError
+
+
+class RoundRobinStrategy(AssignmentStrategy):
+    """
+    Every author is tested by the next `reviewers` participants in order, so every participant tests
+    exactly that many authors. Participants joining later are tested by the least busy peers and test the
+    authors with the fewest peers.
+    """
+    name = 'round_robin'
+
+    def tiebreak(self, username):
+        return username
+
+    def assign(self, usernames, existing, groups):
+        order = self.order(usernames)
+        count = min(self.reviewers, len(order) - 1)
+        pairs = []
+        if not existing:
+            for i, author in enumerate(order):
+                pairs.extend((author, order[(i + d) % len(order)], None) for d in range(1, count + 1))
+            return pairs
+
+        assigned = {author: list(peers) for author, peers in existing.items()}
+        load = Counter(peer for peers in assigned.values() for peer in peers)
+        for author in order:
+            if author in assigned:
+                continue
+            assigned[author] = []
+            # The newcomer is tested by the least busy peers...
+            for peer in sorted((u for u in order if u != author), key=lambda u: (load[u], self.tiebreak(u)))[:count]:
+                pairs.append((author, peer, None))
+                assigned[author].append(peer)
+                load[peer] += 1
+            # ...and tests the authors with the fewest peers
+            for other in sorted((a for a in assigned if a != author and author not in assigned[a]), key=lambda a: (len(assigned[a]), self.tiebreak(a)))[:count]:
+                pairs.append((other, author, None))
+                assigned[other].append(author)
+                load[author] += 1
+        return pairs
+
+
+class BalancedRandomStrategy(RoundRobinStrategy):
+    """
+    Round robin over a seeded random order, so neighbours in the class list do not always test each other
+    while every participant still tests the same number of authors.
+    """
+    name = 'balanced_random'
+
+    def order(self, usernames):
+        order = sorted(usernames)
+        self.rng.shuffle(order)
+        return order
+
+    def tiebreak(self, username):
+        return self.rng.random()
+
+
+class GroupStrategy(AssignmentStrategy):
+    """
+    Participants are split into groups of `group_size` in which everybody tests everybody else.
+    Participants joining later are added to the smallest group.
+    """
+    name = 'group'
+
+    def assign(self, usernames, existing, groups):
+        pairs = []
+        members = {}
+        for username, group in groups.items():
+            members.setdefault(group, []).append(username)
+
+        newcomers = [u for u in usernames if u not in groups]
+        if not members:
+            order = sorted(newcomers)
+            self.rng.shuffle(order)
+            chunks = [order[i:i + self.group_size] for i in range(0, len(order), self.group_size)]
+            if len(chunks) > 1 and len(chunks[-1]) < 2:
+                # Nobody is left in a group of one
+                chunks[-2].extend(chunks.pop())
+            members = dict(enumerate(chunks))
+            newcomers = []
+        else:
+            for username in newcomers:
+                group = min(members, key=lambda g: (len(members[g]), g))
+                members[group].append(username)
+
+        joined = set(newcomers)
+        for group, group_members in members.items():
+            for author in group_members:
+                for peer in group_members:
+                    if peer != author and (not existing or author in joined or peer in joined):
+                        pairs.append((author, peer, group))
+        return pairs
+
+
+class AllPairsStrategy(AssignmentStrategy):
+    """
+    The original scheme: the testing project of every author has a branch `<user>p<i>` for every
+    participant and every i below the number of participants. Kept for cohorts that already use it.
+    """
+    name = 'all_pairs'
+
+    def assign(self, usernames, existing, groups):
+        # Branch names are set by ensure_assignments; every participant is paired with every author
+        return [(author, peer, None) for author in usernames for peer in usernames]
+
+
+# Strategies by the name used in the PEER_ASSIGNMENT_STRATEGY setting
+ASSIGNMENT_STRATEGIES = {strategy.name: strategy for strategy in (RoundRobinStrategy, BalancedRandomStrategy, GroupStrategy, AllPairsStrategy)}
+
+
+def get_strategy(name, original_project_id):
+    """
+    :param name: The name of the strategy.
+    :param original_project_id: The original project of the cohort, the default seed.
+    :return: An AssignmentStrategy configured from the PEER_* settings.
+    """
+    if name not in ASSIGNMENT_STRATEGIES:
+        raise ValueError(f"Unknown peer assignment strategy '{name}'")
+    seed = getattr(settings, 'PEER_ASSIGNMENT_SEED', None)
+    return ASSIGNMENT_STRATEGIES[name](
+        reviewers=getattr(settings, 'PEER_REVIEWERS', 3),
+        seed=f"{seed}:{original_project_id}" if seed else original_project_id,
+        group_size=getattr(settings, 'PEER_GROUP_SIZE', 4),
+    )
+
+
+def ensure_assignments(original_project_id, usernames):
+    """
+    Make sure every participant of a cohort is assigned and return the branches of every author.
+
+    A cohort keeps the strategy its first assignments were made with; PEER_ASSIGNMENT_STRATEGY only
+    applies to new cohorts. Cohorts with saved projects but no stored assignments were created before
+    assignments existed and keep the all-pairs scheme (a new cohort is assigned by the sync that runs
+    before its first project is saved). Every author also gets the own branch `<author>p0`.
+
+    The new assignments are planned against the rows read and stored all at once. select_for_update
+    locks nothing on a cohort without rows, so a concurrent first sync may store its own assignments,
+    possibly for other participants, first; the insert then fails as a whole and the assignments are
+    planned again on top of the stored ones.
+
+    :param original_project_id: The GitLab ID of the original project the cohort forked.
+    :param usernames: The usernames of every participant.
+    :return: A dictionary of author -> list of branch names in the author's testing project.
+    """
+    usernames = sorted(set(usernames))
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return _assign(original_project_id, usernames)
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def _assign(original_project_id, usernames):
+    # Plan and store the assignments missing from the rows of the cohort
+    rows = list(PeerAssignment.objects.select_for_update().filter(original_project_id=original_project_id).order_by('id'))
+    if rows:
+        name = rows[0].strategy
+    elif Project.objects.filter(original_project_id=original_project_id).exists():
+        name = AllPairsStrategy.name
+    else:
+        name = getattr(settings, 'PEER_ASSIGNMENT_STRATEGY', RoundRobinStrategy.name)
+    strategy = get_strategy(name, original_project_id)
+
+    existing, groups, branches = {}, {}, {}
+    for row in rows:
+        branches.setdefault(row.author, set()).add(row.branch)
+        if row.reviewer != row.author:
+            existing.setdefault(row.author, []).append(row.reviewer)
+        if row.group is not None:
+            groups[row.author] = row.group
+
+    new_rows = []
+    for author in usernames:
+        if peer_branch(author, 0) not in branches.setdefault(author, set()):
+            branches[author].add(peer_branch(author, 0))
+            new_rows.append(PeerAssignment(original_project_id=original_project_id, author=author, reviewer=author, branch=peer_branch(author, 0), strategy=name))
+    for author, peer, group in strategy.assign(usernames, existing, groups):
+        if name == AllPairsStrategy.name:
+            candidates = [peer_branch(peer, i) for i in range(len(usernames))]
+        else:
+            candidates = [peer_branch(peer, len(existing.setdefault(author, [])) + 1)]
+            existing[author].append(peer)
+        for branch in candidates:
+            if branch not in branches[author]:
+                branches[author].add(branch)
+                new_rows.append(PeerAssignment(original_project_id=original_project_id, author=author, reviewer=peer, branch=branch, strategy=name, group=group))
+    PeerAssignment.objects.bulk_create(new_rows)
+    return {author: sorted(author_branches) for author, author_branches in branches.items()}
@@ -0,0 +1,141 @@
+import os  # Standard library module for interacting with the operating system.
+import hashlib  # Standard library module used to compute git blob SHAs.
+import tempfile  # Standard library module used to write cache files atomically.
+import threading  # Standard library module for guarding the cache against concurrent syncs.
+from collections import OrderedDict  # Ordered dictionary used to keep the memory front in least-recently-used order.
+
+from django.conf import settings  # Django settings, used to read the cache location and limits.
+
+
+def git_blob_sha(content):
+    """
+    Compute the git object id of a blob, the same id GitLab returns in repository trees.
+
+    :param content: The blob content as bytes.
+    :return: The hex SHA-1 of the blob object.
+    """
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+class BlobCache:
+    """
+    Content-addressed cache of git blobs keyed by blob SHA.
+
+    Blobs are immutable, so entries are never invalidated, only evicted. A small in-memory LRU sits in
+    front of a directory of blob files; both tiers are bounded in bytes and drop their least recently
+    used entries first. The modification time of a blob file records when it was last used.
+    """
+
+    def __init__(self, directory=None, max_memory_bytes=32 * 1024 * 1024, max_disk_bytes=1024 * 1024 * 1024):
+        self.directory = str(directory) if directory else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # blob sha -> content
+        self._memory_bytes = 0
+        self._disk_bytes = None  # Computed lazily on the first write
+        self._lock = threading.Lock()
+
+    def _path(self, sha):
+        # Shard the files by the first two characters of the SHA, like git does
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def _remember(self, sha, content):
+        # Add an entry to the memory front and trim it back under its limit
+        if sha in self._memory:
+            self._memory.move_to_end(sha)
+            return
+        if len(content) > self.max_memory_bytes:
+            return
+        self._memory[sha] = content
+        self._memory_bytes += len(content)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _disk_entries(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and not entry.name.startswith('.'):
+                        yield entry
+
+    def _evict_disk(self):
+        # Remove the least recently used blob files until the directory is back under its limit
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(entry.stat().st_size for entry in self._disk_entries())
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = sorted(self._disk_entries(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                self._disk_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def get(self, sha):
+        """
+        Return the cached content of a blob.
+
+        :param sha: The blob SHA.
+        :return: The blob content as bytes, or None if the blob is not cached.
+        """
+        with self._lock:
+            content = self._memory.get(sha)
+            if content is not None:
+                self._memory.move_to_end(sha)
+                return content
+        if not self.directory:
+            return None
+        path = self._path(sha)
+        try:
+            with open(path, 'rb') as blob_file:
+                content = blob_file.read()
+            os.utime(path)  # Mark the blob as recently used
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._remember(sha, content)
+        return content
+
+    def put(self, sha, content):
+        """
+        Store the content of a blob.
+
+        :param sha: The blob SHA.
+        :param content: The blob content as bytes.
+        """
+        with self._lock:
+            self._remember(sha, content)
+        if not self.directory:
+            return
+        path = self._path(sha)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so that readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+        with os.fdopen(fd, 'wb') as blob_file:
+            blob_file.write(content)
+        os.replace(temp_path, path)
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(content)
+            self._evict_disk()
+
+    def __contains__(self, sha):
+        with self._lock:
+            if sha in self._memory:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(sha))
+
+
+# Cache shared by every sync running in this process
+blob_cache = BlobCache(
+    directory=getattr(settings, 'BLOB_CACHE_DIR', None),
+    max_memory_bytes=getattr(settings, 'BLOB_CACHE_MAX_MEMORY_BYTES', 32 * 1024 * 1024),
+    max_disk_bytes=getattr(settings, 'BLOB_CACHE_MAX_DISK_BYTES', 1024 * 1024 * 1024),
+)
@@ -0,0 +1,121 @@
+import time  # Standard library module for measuring how long a client has been idle.
+import hashlib  # Standard library module used to hash tokens before they are used as cache keys.
+import threading  # Standard library module for guarding the registry against concurrent requests.
+from collections import OrderedDict  # Ordered dictionary used to keep clients in least-recently-used order.
+from urllib.parse import urlparse  # Standard library helper for extracting the host from a GitLab URL.
+
+import gitlab  # GitLab API client for Python to interact with GitLab.
+import requests  # HTTP library used by python-gitlab; one session is shared per GitLab host.
+from requests.adapters import HTTPAdapter  # Adapter used to size the keep-alive connection pool.
+from django.conf import settings  # Django settings, used to read the registry limits.
+
+
+def hash_token(private_token):
+    """
+    Hash an access token so that it never has to be kept as a plain dictionary key.
+
+    :param private_token: The GitLab access token.
+    :return: The hex SHA-256 digest of the token.
+    """
+    return hashlib.sha256(private_token.encode('utf-8')).hexdigest()
+
+
+class GitlabClientRegistry:
+    """
+    Process-wide registry of authenticated GitLab clients.
+
+    Clients are keyed by (gitlaburl, token hash). Every client talking to the same GitLab host
+    shares one keep-alive requests session, the result of the gl.auth() check is reused for
+    `auth_ttl` seconds, and the least recently used clients are evicted once the registry holds
+    more than `max_clients` entries or a client has been idle for longer than `idle_timeout`.
+    """
+
+    def __init__(self, max_clients=256, auth_ttl=300, idle_timeout=900, pool_size=20):
+        self.max_clients = max_clients
+        self.auth_ttl = auth_ttl
+        self.idle_timeout = idle_timeout
+        self.pool_size = pool_size
+        self._clients = OrderedDict()  # (gitlaburl, token hash) -> {'client', 'authenticated_at', 'last_used'}
+        self._sessions = {}  # GitLab host -> shared requests session
+        self._lock = threading.Lock()
+
+    def _get_session(self, gitlaburl):
+        # Reuse one keep-alive session per GitLab host so TLS connections are shared between tokens
+        host = urlparse(gitlaburl).netloc or gitlaburl
+        session = self._sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sessions[host] = session
+        return session
+
+    def _evict(self, now):
+        # Drop clients that have been idle for too long, then trim the least recently used ones
+        for key in [key for key, entry in self._clients.items() if now - entry['last_used'] > self.idle_timeout]:
+            del self._clients[key]
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+
+    def get(self, gitlaburl, private_token):
+        """
+        Return an authenticated GitLab client for the given URL and token.
+
+        :param gitlaburl: The URL of the GitLab instance.
+        :param private_token: The GitLab access token.
+        :return: A GitLab API client instance whose `user` attribute is populated.
+        :raises gitlab.exceptions.GitlabAuthenticationError: If the token is rejected by GitLab.
+        """
+        key = (gitlaburl, hash_token(private_token))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry['last_used'] = now
+                self._clients.move_to_end(key)
+                if now - entry['authenticated_at'] < self.auth_ttl:
+                    return entry['client']
+                client = entry['client']
+            else:
+                client = gitlab.Gitlab(gitlaburl, private_token=private_token, session=self._get_session(gitlaburl))
+
+        # Authenticate outside the lock so that one slow GitLab host does not block every request
+        try:
+            client.auth()
+        except gitlab.exceptions.GitlabError:
+            self.invalidate(gitlaburl, private_token)
+            raise
+
+        with self._lock:
+            self._clients[key] = {'client': client, 'authenticated_at': now, 'last_used': now}
+            self._clients.move_to_end(key)
+            self._evict(now)
+        return client
+
+    def invalidate(self, gitlaburl, private_token):
+        """
+        Forget the cached client for a URL and token, e.g. after the token was revoked.
+
+        :param gitlaburl: The URL of the GitLab instance.
+        :param private_token: The GitLab access token.
+        """
+        with self._lock:
+            self._clients.pop((gitlaburl, hash_token(private_token)), None)
+
+    def clear(self):
+        """
+        Drop every cached client. Shared sessions are kept so open connections can still be reused.
+        """
+        with self._lock:
+            self._clients.clear()
+
+
+# Registry shared by every request handled by this process
+client_registry = GitlabClientRegistry(
+    max_clients=getattr(settings, 'GITLAB_CLIENT_MAX_CLIENTS', 256),
+    auth_ttl=getattr(settings, 'GITLAB_CLIENT_AUTH_TTL', 300),
+    idle_timeout=getattr(settings, 'GITLAB_CLIENT_IDLE_TIMEOUT', 900),
+    pool_size=getattr(settings, 'GITLAB_CLIENT_POOL_SIZE', 20),
+)
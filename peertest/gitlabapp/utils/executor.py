@@ -0,0 +1,75 @@
+import os  # Standard library module for interacting with the operating system.
+import threading  # Standard library module for the per-host semaphores.
+from urllib.parse import urlparse  # Standard library helper for extracting the host from a GitLab URL.
+from concurrent.futures import ThreadPoolExecutor  # Thread pool that runs the branch-level work.
+
+from django.conf import settings  # Django settings, used to read the pool sizes.
+from django.db import close_old_connections  # Closes database connections opened by worker threads.
+
+
+class SyncExecutor:
+    """
+    Runs independent branch-level sync tasks in parallel.
+
+    Every task is one callable that performs all the work for one branch in order, so ordering within a
+    branch is kept while different branches run side by side. The number of tasks talking to the same
+    GitLab host at once is capped by `per_host` on top of the pool size.
+    """
+
+    def __init__(self, max_workers=None, per_host=8):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.per_host = per_host
+        self._pool = None
+        self._semaphores = {}  # GitLab host -> semaphore limiting concurrent tasks
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='peersync')
+            return self._pool
+
+    def _get_semaphore(self, gitlaburl):
+        host = urlparse(gitlaburl).netloc or gitlaburl
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    def run(self, gitlaburl, tasks):
+        """
+        Run tasks against a GitLab host and wait for all of them.
+
+        :param gitlaburl: The URL of the GitLab instance the tasks talk to.
+        :param tasks: A list of callables taking no arguments.
+        :return: A list with the result of each task in the order of `tasks`; a task that raised is
+                 reported by its exception instead of a result.
+        """
+        semaphore = self._get_semaphore(gitlaburl)
+
+        def guarded(task):
+            try:
+                with semaphore:
+                    return task()
+            except Exception as e:
+                return e
+
+        def pooled(task):
+            try:
+                return guarded(task)
+            finally:
+                # Worker threads must not keep database connections open between tasks
+                close_old_connections()
+
+        if self.max_workers == 1 or len(tasks) <= 1:
+            return [guarded(task) for task in tasks]
+
+        futures = [self._get_pool().submit(pooled, task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+# Executor shared by every sync running in this process
+sync_executor = SyncExecutor(
+    max_workers=getattr(settings, 'PEER_SYNC_WORKERS', None),
+    per_host=getattr(settings, 'PEER_SYNC_HOST_CONCURRENCY', 8),
+)
@@ -0,0 +1,240 @@
+import os  # Standard library module for interacting with the operating system.
+import base64  # Standard library module for encoding the credentials of git requests.
+import fcntl  # Standard library module for locking a mirror while it is in use.
+import subprocess  # Standard library module for running git.
+from contextlib import contextmanager  # Turns the mirror lock into a context manager.
+
+from django.conf import settings  # Django settings, used to read the mirror location.
+
+from .languages import TEST_FOLDER, get_tree_languages  # Languages of the peers' tests, cached per tree SHA.
+from .pipefiles import CI_CONFIG_PATH, RETIRED_FILES, ci_config  # Pipeline files committed with every peer branch.
+
+# Identity of the commits composed in the mirrors
+COMMITTER = {'GIT_AUTHOR_NAME': 'ptbot', 'GIT_AUTHOR_EMAIL': 'ptbot@noreply', 'GIT_COMMITTER_NAME': 'ptbot', 'GIT_COMMITTER_EMAIL': 'ptbot@noreply'}
+
+# Content of the placeholder that replaces the test folder on new peer branches
+TEST_PLACEHOLDER = ('init.txt', b'init data')
+
+
+class GitMirrorError(Exception):
+    """Raised when a git command run on a mirror fails."""
+
+
+class GitMirror:
+    """
+    A local bare repository mirroring a testing project and the forked project its peer branches copy.
+
+    Both projects are fetched into the same repository, so their objects are stored once and peer branches
+    can be composed from them with git plumbing alone: no working tree is checked out and no file content
+    goes through the GitLab REST API.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def run(self, *args, input=None, token=None, env=None):
+        """
+        Run a git command in the mirror and return its outcome whatever the exit status.
+
+        The access token is passed as an HTTP header through the environment, so it is neither stored in the
+        repository configuration nor visible in the process list.
+
+        :param args: The git arguments.
+        :param input: Bytes written to the standard input of git.
+        :param token: The GitLab access token of the remote the command talks to.
+        :param env: Extra environment variables.
+        :return: The subprocess.CompletedProcess, with the standard output and error as bytes.
+        :raises GitMirrorError: If git does not finish within GIT_MIRROR_TIMEOUT seconds.
+        """
+        environment = {**os.environ, 'GIT_DIR': self.path, 'GIT_TERMINAL_PROMPT': '0', **COMMITTER, **(env or {})}
+        if token:
+            credentials = base64.b64encode(f'oauth2:{token}'.encode()).decode()
+            environment.update({'GIT_CONFIG_COUNT': '1', 'GIT_CONFIG_KEY_0': 'http.extraHeader', 'GIT_CONFIG_VALUE_0': f'Authorization: Basic {credentials}'})
+        timeout = getattr(settings, 'GIT_MIRROR_TIMEOUT', 600)
+        try:
+            return subprocess.run(['git', *args], input=input, capture_output=True, env=environment, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise GitMirrorError(f"git {args[0]} did not finish within {timeout} seconds")
+
+    def git(self, *args, input=None, token=None, env=None, raw=False):
+        """
+        Run a git command in the mirror (see run) and fail unless it succeeds.
+
+        :param raw: Return the standard output as bytes instead of text.
+        :return: The standard output, as text stripped of its trailing newline unless `raw` is set.
+        :raises GitMirrorError: If git fails or does not finish in time.
+        """
+        result = self.run(*args, input=input, token=token, env=env)
+        if result.returncode != 0:
+            raise GitMirrorError(f"git {args[0]} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout if raw else result.stdout.decode('utf-8', 'replace').rstrip('\n')
+
+    def init(self):
+        if not os.path.isdir(self.path):
+            subprocess.run(['git', 'init', '--bare', '--quiet', self.path], check=True, capture_output=True)
+
+    def fetch(self, url, token, refspecs):
+        self.git('fetch', '--quiet', '--prune', '--no-tags', url, *refspecs, token=token)
+
+    def refs(self, prefix):
+        """
+        :param prefix: A ref prefix, e.g. 'refs/testing/'.
+        :return: A dictionary of ref name without the prefix -> commit SHA.
+        """
+        output = self.git('for-each-ref', '--format=%(objectname) %(refname)', prefix)
+        return {name[len(prefix):]: sha for sha, name in (line.split(' ', 1) for line in output.splitlines())}
+
+    def entries(self, tree):
+        """
+        :param tree: A tree-ish.
+        :return: A dictionary of name -> ls-tree line for the top level of the tree.
+        """
+        output = self.git('ls-tree', '-z', tree).split('\0')
+        return {line.split('\t', 1)[1]: line for line in output if line}
+
+    def write_blob(self, content):
+        return self.git('hash-object', '-w', '--stdin', input=content)
+
+    def make_tree(self, lines):
+        return self.git('mktree', '-z', input=''.join(line + '\0' for line in lines).encode('utf-8'))
+
+    def tree_files(self, tree):
+        # Paths of the files in a tree and a reader of their contents
+        paths = self.git('ls-tree', '-r', '-z', '--name-only', tree).split('\0')
+        return [path for path in paths if path], lambda path: self._read(f'{tree}:{path}')
+
+    def _read(self, object_name):
+        return self.git('cat-file', 'blob', object_name, raw=True)
+
+    def commit(self, tree, parent, message):
+        return self.git('commit-tree', tree, '-p', parent, '-m', message)
+
+    def push(self, url, token, updates):
+        """
+        Update many branches of a remote with one push.
+
+        Refs are pushed without force, so a branch a peer pushed to since it was fetched is rejected
+        instead of overwritten, and is retried by the next sync.
+
+        :param url: The URL of the remote repository.
+        :param token: The GitLab access token of the remote.
+        :param updates: A dictionary of branch name -> commit SHA.
+        :return: The set of branch names the remote accepted.
+        :raises GitMirrorError: If the push failed as a whole, e.g. because the token was rejected.
+        """
+        if not updates:
+            return set()
+        result = self.run('push', '--porcelain', url, *[f'{sha}:refs/heads/{branch}' for branch, sha in updates.items()], token=token)
+        accepted, reported = set(), False
+        for line in result.stdout.decode('utf-8', 'replace').splitlines():
+            parts = line.split('\t')
+            if len(parts) >= 2 and ':' in parts[1] and parts[0] in (' ', '*', '+', '=', '!', '-'):
+                reported = True
+                if parts[0] != '!':
+                    accepted.add(parts[1].split(':', 1)[1][len('refs/heads/'):])
+        # Git exits with an error when any ref is rejected; only a push without ref lines failed as a whole
+        if result.returncode != 0 and not reported:
+            raise GitMirrorError(f"git push failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return accepted
+
+
+@contextmanager
+def open_mirror(testing_project_id):
+    """
+    Open the mirror of a testing project, creating it on first use, and hold its lock.
+
+    :param testing_project_id: The GitLab ID of the testing project.
+    :return: A context manager yielding the GitMirror.
+    """
+    directory = getattr(settings, 'GIT_MIRROR_DIR', os.path.join(settings.BASE_DIR, '.gitmirrors'))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{testing_project_id}.lock'), 'w') as lock:
+        # Syncs of the same testing project from other threads or processes wait for each other
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            mirror = GitMirror(os.path.join(directory, f'{testing_project_id}.git'))
+            mirror.init()
+            yield mirror
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def compose_tree(mirror, source_tree, main_tree, base_tree):
+    """
+    Compose the tree of a peer branch.
+
+    Every top-level entry of the forked project is copied over the files of the testing project's main
+    branch, except the ones whose name starts with 'test', which hold tests; those come from the branch
+    itself, or are replaced by a placeholder test folder on a new branch. The CI configuration is
+    generated for the languages of the resulting test folder.
+
+    :param mirror: The GitMirror.
+    :param source_tree: The tree of the forked project's head commit.
+    :param main_tree: The tree of the testing project's main branch.
+    :param base_tree: The tree of the branch's head commit, or None for a new branch.
+    :return: The SHA of the composed tree.
+    """
+    source = mirror.entries(source_tree)
+    entries = {**mirror.entries(main_tree), **source}
+    entries = {name: line for name, line in entries.items() if not name.startswith('test') and name != CI_CONFIG_PATH and name not in RETIRED_FILES}
+    if base_tree is not None:
+        entries.update({name: line for name, line in mirror.entries(base_tree).items() if name.startswith('test')})
+    elif any(name.startswith('test') for name in source):
+        placeholder = mirror.make_tree([f'100644 blob {mirror.write_blob(TEST_PLACEHOLDER[1])}\t{TEST_PLACEHOLDER[0]}'])
+        entries[TEST_FOLDER] = f'040000 tree {placeholder}\t{TEST_FOLDER}'
+
+    test_tree = entries[TEST_FOLDER].split()[2] if TEST_FOLDER in entries and entries[TEST_FOLDER].split()[1] == 'tree' else None
+    languages = get_tree_languages(test_tree, lambda: mirror.tree_files(test_tree))
+    pipefile = ci_config(tuple(languages))
+    entries[CI_CONFIG_PATH] = f'100644 blob {mirror.write_blob(pipefile.content.encode("utf-8"))}\t{CI_CONFIG_PATH}'
+    return mirror.make_tree(entries.values())
+
+
+def sync_peer_branches_git(project, source, branches, fork_url, testing_url):
+    """
+    Bring the peer branches of a testing project up to date with one fetch per project and one push.
+
+    The forked project's head and the testing project's branches are fetched into the local mirror, each
+    branch's new tree is composed locally (see compose_tree), a commit is made for every branch whose tree
+    changed and all of them are pushed at once.
+
+    :param project: The project dictionary (forked project with its 'testingproject').
+    :param source: A dictionary returned by get_sync_source.
+    :param branches: The names of the peer branches to sync.
+    :param fork_url: The HTTP URL of the forked project's repository.
+    :param testing_url: The HTTP URL of the testing project's repository.
+    :return: A list of (branch name, (commit ID or None, whether the branch is in sync)) tuples.
+    """
+    testing = project['testingproject']
+    with open_mirror(testing['id']) as mirror:
+        mirror.fetch(fork_url, project['gitlabaccesstoken'], [f"+refs/heads/{source['branch']}:refs/source/{project['id']}"])
+        mirror.fetch(testing_url, testing['gitlabaccesstoken'], ['+refs/heads/*:refs/testing/*'])
+        heads = mirror.refs('refs/testing/')
+        source_sha = mirror.git('rev-parse', f"refs/source/{project['id']}")
+        source_tree = mirror.git('rev-parse', f'{source_sha}^{{tree}}')
+        if 'main' not in heads:
+            raise GitMirrorError(f"Testing project {testing['id']} has no main branch")
+        main_tree = mirror.git('rev-parse', f"{heads['main']}^{{tree}}")
+
+        updates, messages, outcomes = {}, {}, {}
+        for branch in branches:
+            head = heads.get(branch)
+            head_tree = mirror.git('rev-parse', f'{head}^{{tree}}') if head else None
+            tree = compose_tree(mirror, source_tree, main_tree, head_tree)
+            if tree == head_tree:
+                outcomes[branch] = (None, True)
+                continue
+            # A new branch has no tests yet, so its first commit does not start a pipeline
+            message = f"Updated files in {branch}" if head else f"Initialised files in {branch} [ci skip]"
+            updates[branch] = mirror.commit(tree, head or heads['main'], message)
+            messages[branch] = message
+
+        accepted = mirror.push(testing_url, testing['gitlabaccesstoken'], updates)
+        for branch, sha in updates.items():
+            if branch in accepted:
+                print(f"{messages[branch]} ({sha})")
+                outcomes[branch] = (sha, True)
+            else:
+                print(f"Push of {branch} to testing project {testing['id']} was rejected")
+                outcomes[branch] = (None, False)
+    return [(branch, outcomes[branch]) for branch in branches]
@@ -0,0 +1,133 @@
+import re  # Standard library module for the content patterns.
+import posixpath  # Standard library module for splitting repository paths.
+from collections import Counter  # Counts the test files of every language.
+
+from django.core.cache import cache  # Django cache shared by every worker process.
+
+# Folder holding the peers' tests on every peer branch
+TEST_FOLDER = 'test'
+
+# Value of LANGUAGE when no test file is recognised; the CI configuration then runs the test_none job
+NO_LANGUAGE = 'none'
+
+# Most files with an unknown extension whose content is read when no extension is recognised
+MAX_CONTENT_FILES = 50
+
+# Language of a test file by extension, using the names the jobs of .gitlab-ci.yml match LANGUAGE against
+EXTENSIONS = {
+    '.py': 'python', '.js': 'nodejs', '.java': 'java', '.c': 'c', '.cpp': 'cpp', '.cc': 'cpp', '.go': 'go',
+    '.rs': 'rust', '.rb': 'ruby', '.php': 'php', '.pl': 'perl', '.swift': 'swift', '.r': 'r', '.ts': 'typescript',
+    '.m': 'objective-c', '.sql': 'sql', '.groovy': 'groovy', '.scala': 'scala', '.dart': 'dart', '.lua': 'lua',
+    '.jl': 'julia', '.hs': 'haskell', '.sh': 'shell', '.ps1': 'powershell', '.vb': 'vb', '.asm': 'assembly',
+    '.vhd': 'vhdl', '.vhdl': 'vhdl', '.v': 'verilog', '.pas': 'pascal', '.tcl': 'tcl', '.rkt': 'racket',
+    '.coffee': 'coffeescript', '.hx': 'haxe', '.awk': 'awk', '.nim': 'nim', '.cr': 'crystal', '.lisp': 'lisp',
+    '.lsp': 'lisp', '.clj': 'clojure', '.cljs': 'clojure', '.cljc': 'clojure', '.fth': 'forth', '.4th': 'forth',
+    '.pike': 'pike', '.zig': 'zig', '.fs': 'fsharp', '.ml': 'ocaml', '.feature': 'gherkin',
+}
+
+# Content patterns for files whose extension says nothing, tried in order; every pattern must match
+CONTENT_RULES = [
+    ('python', [re.compile(rb'^\s*(import (unittest|pytest)|from (unittest|pytest) import)', re.M)]),
+    ('nodejs', [re.compile(rb'\bconst\b'), re.compile(rb'\brequire\(')]),
+    ('java', [re.compile(rb'\bimport org\.junit')]),
+    ('cpp', [re.compile(rb'#include\s*<iostream>')]),
+    ('c', [re.compile(rb'#include\s*<stdio\.h>')]),
+    ('go', [re.compile(rb'^package \w+', re.M), re.compile(rb'^import\b', re.M)]),
+    ('rust', [re.compile(rb'\bextern crate\b|#\[test\]')]),
+    ('ruby', [re.compile(rb'\bRSpec\.describe\b')]),
+    ('php', [re.compile(rb'\bclass\b'), re.compile(rb'\bpublic function\b')]),
+]
+
+
+def language_cache_key(tree_sha):
+    return f'peertest:language:{tree_sha}'
+
+
+def classify_path(path):
+    """
+    :param path: A repository path.
+    :return: The language of the file by its extension, or None.
+    """
+    return EXTENSIONS.get(posixpath.splitext(path)[1].lower())
+
+
+def classify_content(content):
+    """
+    :param content: The content of a file as bytes.
+    :return: The language of the file by the first matching content rule, or None.
+    """
+    for language, patterns in CONTENT_RULES:
+        if all(pattern.search(content) for pattern in patterns):
+            return language
+    return None
+
+
+def detect_languages(paths, read=None):
+    """
+    Classify a set of test files in one pass.
+
+    Files are classified by extension; the content of files with an unknown extension is only read when
+    no extension was recognised at all.
+
+    :param paths: The paths of the test files.
+    :param read: Callable returning the content of a path as bytes, or None to classify by extension only.
+    :return: The detected languages, most test files first, or [NO_LANGUAGE].
+    """
+    counts = Counter()
+    unknown = []
+    for path in paths:
+        language = classify_path(path)
+        if language is None:
+            unknown.append(path)
+        else:
+            counts[language] += 1
+
+    if not counts and read is not None:
+        for path in unknown[:MAX_CONTENT_FILES]:
+            language = classify_content(read(path))
+            if language is not None:
+                counts[language] += 1
+
+    return [language for language, _ in counts.most_common()] or [NO_LANGUAGE]
+
+
+def get_test_languages(project, ref, tree_sha):
+    """
+    Get the languages of the tests in the test folder of a branch.
+
+    Classification only depends on the content of the folder, so results are cached by the SHA of the
+    folder's tree and never expire; a push that does not touch the tests reuses the cached result.
+
+    :param project: The GitLab testing project.
+    :param ref: The branch the tree was read from.
+    :param tree_sha: The SHA of the test folder's tree, or None if the branch has no test folder.
+    :return: The detected languages, most test files first, or [NO_LANGUAGE].
+    """
+    def list_files():
+        # Imported here because utils.py imports this module through pipefiles.py
+        from .utils import read_blob
+
+        blobs = {item['path']: item['id'] for item in project.repository_tree(ref=ref, path=TEST_FOLDER, recursive=True, get_all=True) if item['type'] == 'blob'}
+        return blobs, lambda path: read_blob(project, blobs[path])
+
+    return get_tree_languages(tree_sha, list_files)
+
+
+def get_tree_languages(tree_sha, list_files):
+    """
+    Get the languages of the tests in a test folder tree, classifying it only once per tree SHA.
+
+    :param tree_sha: The SHA of the test folder's tree, or None if there is no test folder.
+    :param list_files: Callable returning the paths of the files in the tree and a callable reading a path as bytes.
+    :return: The detected languages, most test files first, or [NO_LANGUAGE].
+    """
+    if tree_sha is None:
+        return [NO_LANGUAGE]
+
+    key = language_cache_key(tree_sha)
+    languages = cache.get(key)
+    if languages is None:
+        paths, read = list_files()
+        languages = detect_languages(paths, read=read)
+        cache.set(key, languages, timeout=None)
+    return languages
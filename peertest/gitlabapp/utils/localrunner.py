@@ -0,0 +1,205 @@
+import os  # Standard library module for interacting with the operating system.
+import glob  # Standard library module for finding the reports written by a test command.
+import uuid  # Standard library module for naming the container of every test command.
+import signal  # Standard library module for killing test commands that time out.
+import tempfile  # Standard library module for the checkout directories.
+import subprocess  # Standard library module for running test containers.
+
+from django.conf import settings  # Django settings, used to read the runner limits.
+from django.utils import timezone  # Django helper for timezone-aware timestamps.
+
+from ..models import PipelineRun  # Local runs are recorded like the pipelines of GitLab.
+from ..jobs import enqueue  # Runs are executed by the job worker, outside the web server.
+from .languages import TEST_FOLDER, detect_languages  # Languages of the peers' tests.
+from .results import store_reports  # Reads the JUnit and coverage reports of a run.
+
+# Test command of every language the local runner supports, run by `sh -c` in the checkout inside the runner
+# container, and the report files it leaves behind; the commands mirror the jobs of .gitlab-ci.yml
+LOCAL_COMMANDS = {
+    'python': ('python3 -m pytest ./test/ --junitxml=report.xml', ['report.xml']),
+    'nodejs': ('npm test', []),
+    'typescript': ('npm test', []),
+    'java': ('./gradlew test --offline', ['build/test-results/test/**/TEST-*.xml']),
+    'c': ('gcc -o test/test_program test/*.c && ./test/test_program', []),
+    'cpp': ('g++ -o test/test_program test/*.cpp && ./test/test_program', []),
+    'go': ('go test ./test/...', []),
+    'rust': ('cargo test --offline', []),
+    'ruby': ('bundle exec rspec', []),
+    'perl': ('prove -lr', []),
+    'shell': ('bash test/test_script.sh', []),
+}
+
+# Git mode of executable files, and the files made executable when the tree gives no mode
+EXECUTABLE_MODE = '100755'
+EXECUTABLE_FILES = ('gradlew',)
+
+
+def checkout(files, directory):
+    """
+    Write the files of a branch into a directory.
+
+    Files keep their executable bit when the tree gives their mode; without it, the Gradle wrapper is
+    still made executable since the Java command runs it directly.
+
+    :param files: An iterable of {'path', 'content', 'mode'} dictionaries, with the content as bytes (see iter_files_in_branch).
+    :param directory: The directory to write to.
+    :return: The repository paths written.
+    """
+    paths = []
+    root = os.path.realpath(directory)
+    for file in files:
+        target = os.path.realpath(os.path.join(root, file['path']))
+        if not target.startswith(root + os.sep):
+            # Never write outside the checkout
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as handle:
+            handle.write(file['content'])
+        mode = file.get('mode')
+        if mode == EXECUTABLE_MODE or (mode is None and os.path.basename(file['path']) in EXECUTABLE_FILES):
+            os.chmod(target, 0o755)
+        paths.append(file['path'])
+    return paths
+
+
+def container_command(name, command, directory, env=None):
+    """
+    Build the command line that runs a test command in a throwaway container.
+
+    The container has no network, sees nothing of the host but the checkout, mounted at /work, and runs
+    as the unprivileged user of the job worker without any capability. Its memory is capped by the
+    cgroup of the container rather than an address space limit, so virtual machines such as the JVM
+    can reserve address space as usual.
+
+    :param name: The name of the container, used to kill it.
+    :param command: The shell command.
+    :param directory: The checkout the command runs in.
+    :param env: Extra environment variables.
+    :return: The argument list of the container runtime.
+    """
+    memory = int(getattr(settings, 'LOCAL_RUNNER_MEMORY_BYTES', 1024 * 1024 * 1024))
+    environment = {'HOME': '/work', 'LANG': 'C.UTF-8', 'CI': 'true', **(env or {})}
+    return [
+        getattr(settings, 'LOCAL_RUNNER_CONTAINER_RUNTIME', 'docker'), 'run', '--rm', '--name', name,
+        '--network', 'none',
+        '--user', f'{os.getuid()}:{os.getgid()}',
+        '--cap-drop', 'ALL', '--security-opt', 'no-new-privileges',
+        '--read-only', '--tmpfs', '/tmp',
+        '--memory', str(memory), '--memory-swap', str(memory),
+        '--cpus', str(getattr(settings, 'LOCAL_RUNNER_CPUS', 1)),
+        '--pids-limit', str(getattr(settings, 'LOCAL_RUNNER_PIDS', 256)),
+        '--ulimit', f"cpu={int(getattr(settings, 'LOCAL_RUNNER_CPU_SECONDS', 300))}",
+        '--ulimit', f"fsize={int(getattr(settings, 'LOCAL_RUNNER_FILE_BYTES', 100 * 1024 * 1024))}",
+        '--volume', f'{os.path.realpath(directory)}:/work', '--workdir', '/work',
+        *[f'--env={key}={value}' for key, value in environment.items()],
+        settings.LOCAL_RUNNER_IMAGE, 'sh', '-c', command,
+    ]
+
+
+def run_command(command, directory, env=None):
+    """
+    Run a test command in a container (see container_command).
+
+    The container is removed after LOCAL_RUNNER_TIMEOUT seconds, together with every process it started.
+
+    :param command: The shell command.
+    :param directory: The checkout the command runs in.
+    :param env: Extra environment variables.
+    :return: A tuple of the exit status (None on timeout), the seconds it ran and the end of its output.
+    """
+    name = f'peertest-{uuid.uuid4().hex}'
+    max_trace = getattr(settings, 'LOCAL_RUNNER_TRACE_BYTES', 16 * 1024)
+
+    started = timezone.now()
+    with tempfile.TemporaryFile() as output:
+        process = subprocess.Popen(container_command(name, command, directory, env), stdin=subprocess.DEVNULL, stdout=output,
+                                   stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            returncode = process.wait(timeout=getattr(settings, 'LOCAL_RUNNER_TIMEOUT', 600))
+        except subprocess.TimeoutExpired:
+            # Killing the client would leave the container running, so the container is removed first
+            subprocess.run([getattr(settings, 'LOCAL_RUNNER_CONTAINER_RUNTIME', 'docker'), 'rm', '--force', name], capture_output=True)
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            returncode = None
+        output.seek(max(0, output.seek(0, os.SEEK_END) - max_trace))
+        trace = output.read().decode('utf-8', 'replace')
+    return returncode, (timezone.now() - started).total_seconds(), trace
+
+
+def _read(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def _save(run, publish, *fields):
+    run.save(update_fields=[*fields, 'recorded_at'])
+    if publish is not None:
+        publish(run)
+
+
+def execute_local_run(run, files, publish=None):
+    """
+    Run the tests of a branch locally and record the outcome in its PipelineRun.
+
+    The branch is checked out into a temporary directory, the languages of its tests are detected and the
+    command of each language runs as one job. Job summaries, timings and statuses are kept in the same
+    fields GitLab pipelines fill in, and the JUnit reports are read into TestCaseResult.
+
+    :param run: The PipelineRun, with the 'pending' status.
+    :param files: An iterable of the {'path', 'content'} files of the branch.
+    :param publish: Optional callable receiving the run after every status change.
+    :return: The finished PipelineRun.
+    """
+    run.status = 'running'
+    run.started_at = timezone.now()
+    _save(run, publish, 'status', 'started_at')
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='peertest-') as directory:
+            paths = checkout(files, directory)
+            languages = detect_languages([path for path in paths if path.startswith(TEST_FOLDER + '/')],
+                                         read=lambda path: _read(os.path.join(directory, path)))
+            commands = [(language, LOCAL_COMMANDS[language]) for language in languages if language in LOCAL_COMMANDS]
+            run.jobs = [{'id': None, 'name': f'local_{language}', 'stage': 'test', 'status': 'pending', 'duration': None} for language, _ in commands]
+            _save(run, publish, 'jobs')
+
+            counts = {'test_cases': 0, 'coverage': 0}
+            for job, (language, (command, reports)) in zip(run.jobs, commands):
+                job['status'] = 'running'
+                _save(run, publish, 'jobs')
+                returncode, job['duration'], job['trace'] = run_command(command, directory, {'LANGUAGE': ','.join(languages)})
+                job['status'] = 'success' if returncode == 0 else 'failed'
+                report_paths = sorted({path for pattern in reports for path in glob.glob(os.path.join(directory, pattern), recursive=True)})
+                store_reports(run, job['name'], [(os.path.relpath(path, directory), lambda path=path: open(path, 'rb')) for path in report_paths], counts)
+                _save(run, publish, 'jobs')
+
+        run.status = 'success' if run.jobs and all(job['status'] == 'success' for job in run.jobs) else 'failed'
+        run.results_ingested_at = timezone.now()
+    except Exception as e:
+        print(f"Local run {run.id} of {run.branch} failed: {e}")
+        run.status = 'failed'
+    run.finished_at = timezone.now()
+    run.updated_at = run.finished_at
+    run.duration = (run.finished_at - run.started_at).total_seconds()
+    _save(run, publish, 'status', 'jobs', 'finished_at', 'updated_at', 'duration', 'results_ingested_at')
+    return run
+
+
+def start_local_run(testing_project_id, branch, sha):
+    """
+    Record a pending local run of a commit and queue it for the job worker (see tasks.local_run).
+
+    Peers' code never runs in the web server: the job worker checks the commit out and runs its tests in
+    containers. A run is attempted once, so the code of a run that failed half way is not run again.
+
+    :param testing_project_id: The GitLab ID of the testing project.
+    :param branch: The peer branch.
+    :param sha: The head commit of the branch, which is the commit tested.
+    :return: The pending PipelineRun.
+    """
+    now = timezone.now()
+    run = PipelineRun.objects.create(testing_project_id=testing_project_id, branch=branch, sha=sha, status='pending',
+                                     source=PipelineRun.LOCAL, created_at=now, updated_at=now)
+    enqueue('local_run', {'run_id': run.id}, max_attempts=1)
+    return run
@@ -0,0 +1,123 @@
+import re  # Standard library module for splitting the CI configuration template.
+import functools  # Standard library module used to generate every CI configuration only once.
+from pathlib import Path  # Standard library class used to find the templates next to this module.
+
+from .blobcache import git_blob_sha  # Git object ids, compared with the blob SHAs of repository trees.
+from .languages import TEST_FOLDER, get_test_languages  # Languages of the peers' tests, cached per tree SHA.
+
+# Directory holding the pipeline templates, independent of the working directory of the process
+TEMPLATE_DIR = Path(__file__).resolve().parent
+
+
+class PipeFile:
+    """
+    A file committed to every peer branch so that GitLab CI runs the peers' tests.
+
+    The content is addressed by its git blob SHA so that the copy on a branch can be compared without
+    downloading it.
+    """
+
+    def __init__(self, path, content):
+        self.path = path
+        self.content = content
+        self.sha = git_blob_sha(content.encode('utf-8'))
+
+    def action(self, action):
+        # A GitLab commit action writing this file
+        return {'action': action, 'file_path': self.path, 'content': self.content}
+
+
+def load_template(name):
+    return (TEMPLATE_DIR / name).read_text(encoding='utf-8')
+
+
+def split_ci_template(text):
+    """
+    Split the CI configuration template into its shared part and its test jobs.
+
+    Every top-level key starts a block, together with the comment lines just above it. Blocks of keys
+    starting with 'test_' are jobs; all other blocks (stages, variables, hidden jobs) are shared.
+
+    :param text: The template.
+    :return: A tuple of the shared text and a dictionary of job name -> job text, in template order.
+    """
+    blocks = [['', []]]  # (key, lines) of every block
+    pending = []  # Comment and blank lines not yet given to a block
+    for line in text.splitlines(keepends=True):
+        match = re.match(r'([A-Za-z_.][\w.-]*):', line)
+        if match:
+            blocks.append([match.group(1), pending])
+            pending = []
+        elif line.startswith('#') or not line.strip():
+            pending.append(line)
+            continue
+        else:
+            # Blank lines inside a block stay where they are
+            blocks[-1][1].extend(pending)
+            pending = []
+        blocks[-1][1].append(line)
+    blocks[-1][1].extend(pending)
+
+    shared = ''.join(''.join(lines) for key, lines in blocks if not key.startswith('test_'))
+    jobs = {key: ''.join(lines) for key, lines in blocks if key.startswith('test_')}
+    return shared, jobs
+
+
+# Path of the CI configuration and the marker its template holds in place of the detected languages
+CI_CONFIG_PATH = '.gitlab-ci.yml'
+LANGUAGE_PLACEHOLDER = '__LANGUAGE__'
+CI_SHARED, CI_JOBS = split_ci_template(load_template(CI_CONFIG_PATH))
+
+# Job run when none of the detected languages has a job of its own
+FALLBACK_JOB = 'test_none'
+
+# Files committed by earlier versions that are no longer used and are removed from the branches
+RETIRED_FILES = ('detect_and_test.sh',)
+
+
+def job_name(language):
+    # Name of the template job of a language, e.g. 'objective-c' -> 'test_objective_c'
+    return 'test_' + re.sub(r'\W', '_', language)
+
+
+@functools.lru_cache(maxsize=256)
+def ci_config(languages):
+    """
+    Generate the CI configuration for a set of languages.
+
+    Only the test jobs of the given languages are included, so pipelines do not schedule jobs that have
+    nothing to test; each job brings its own dependency cache and change rules from the template.
+
+    :param languages: A tuple of language names (see languages.detect_languages).
+    :return: The PipeFile of the configuration, with LANGUAGE set to the comma-separated languages.
+    """
+    jobs = [CI_JOBS[name] for name in dict.fromkeys(job_name(language) for language in languages) if name in CI_JOBS]
+    content = '\n\n'.join(block.strip('\n') for block in [CI_SHARED] + (jobs or [CI_JOBS[FALLBACK_JOB]])) + '\n'
+    return PipeFile(CI_CONFIG_PATH, content.replace(LANGUAGE_PLACEHOLDER, ','.join(languages)))
+
+
+def pipefile_actions(project, branchname):
+    """
+    Work out which pipeline files of a branch are missing or out of date.
+
+    The files at the root of the branch are read with a single tree request. Their blob SHAs are compared
+    with the SHAs of the rendered files, so files that are already identical are left alone, and the SHA
+    of the test folder's tree selects the cached languages of the tests (see get_test_languages).
+
+    :param project: The GitLab testing project.
+    :param branchname: The name of the peer branch.
+    :return: A tuple of the list of commit actions, empty if the branch is up to date, and the detected languages.
+    """
+    existing = {item['path']: item['id'] for item in project.repository_tree(ref=branchname, get_all=True)}
+    languages = get_test_languages(project, branchname, existing.get(TEST_FOLDER))
+
+    actions = []
+    pipefile = ci_config(tuple(languages))
+    if pipefile.path not in existing:
+        actions.append(pipefile.action('create'))
+    elif existing[pipefile.path] != pipefile.sha:
+        actions.append(pipefile.action('update'))
+    for path in RETIRED_FILES:
+        if path in existing:
+            actions.append({'action': 'delete', 'file_path': path})
+    return actions, languages
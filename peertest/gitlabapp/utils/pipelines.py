@@ -0,0 +1,136 @@
+from datetime import timedelta, timezone as dt_timezone  # Standard library helpers for the reconciliation cursor and naive GitLab timestamps.
+
+from dateutil import parser as dateparser  # Parses both the ISO timestamps of the API and the '... UTC' timestamps of webhooks.
+from django.db import IntegrityError, transaction  # Database transactions for concurrent webhook deliveries.
+from django.db.models import Max  # Aggregate used to find where reconciliation stopped.
+
+from ..models import PipelineRun  # Local copy of the pipelines of testing projects.
+
+# Pipeline statuses that never change again; late events with an older status must not overwrite them
+FINISHED_STATUSES = {'success', 'failed', 'canceled', 'skipped'}
+
+
+def parse_time(value):
+    """
+    Parse a GitLab timestamp.
+
+    :param value: A timestamp from the API or a webhook, or None.
+    :return: A timezone-aware datetime, or None.
+    """
+    if not value:
+        return None
+    parsed = dateparser.parse(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+def job_summary(job):
+    """
+    Reduce a GitLab job to the fields kept in PipelineRun.jobs.
+
+    :param job: A job dictionary from the API, from the 'builds' of a pipeline webhook, or a job webhook.
+    :return: A dictionary with the 'id', 'name', 'stage', 'status' and 'duration' of the job.
+    """
+    return {
+        'id': job.get('id', job.get('build_id')),
+        'name': job.get('name', job.get('build_name')),
+        'stage': job.get('stage', job.get('build_stage')),
+        'status': job.get('status', job.get('build_status')),
+        'duration': job.get('duration', job.get('build_duration')),
+    }
+
+
+def _save_run(pipeline_id, testing_project_id, update):
+    # Deliveries of the same pipeline may race to create its row; the loser retries as an update
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                run = PipelineRun.objects.select_for_update().filter(pipeline_id=pipeline_id).first()
+                if run is None:
+                    run = PipelineRun(pipeline_id=pipeline_id, testing_project_id=testing_project_id, status='created')
+                update(run)
+                run.save()
+                return run
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def record_pipeline(testing_project_id, attributes, jobs=None):
+    """
+    Create or update the PipelineRun of a GitLab pipeline.
+
+    :param testing_project_id: The GitLab ID of the testing project the pipeline ran in.
+    :param attributes: The pipeline attributes from the API or the 'object_attributes' of a pipeline webhook.
+    :param jobs: Optional list of job dictionaries that replaces the job summaries of the run.
+    :return: The saved PipelineRun.
+    """
+    def update(run):
+        status = attributes.get('status')
+        if status and not (run.status in FINISHED_STATUSES and status not in FINISHED_STATUSES):
+            run.status = status
+        run.branch = attributes.get('ref') or run.branch
+        run.sha = attributes.get('sha') or run.sha
+        for field in ('created_at', 'started_at', 'finished_at', 'updated_at'):
+            value = parse_time(attributes.get(field))
+            if value is not None:
+                setattr(run, field, value)
+        for field in ('duration', 'queued_duration'):
+            if attributes.get(field) is not None:
+                setattr(run, field, attributes[field])
+        if jobs is not None:
+            run.jobs = [job_summary(job) for job in jobs]
+
+    return _save_run(attributes['id'], testing_project_id, update)
+
+
+def record_job(testing_project_id, build):
+    """
+    Update the summary of one job in the PipelineRun of its pipeline.
+
+    :param testing_project_id: The GitLab ID of the testing project the job ran in.
+    :param build: The payload of a GitLab job webhook.
+    :return: The saved PipelineRun.
+    """
+    summary = job_summary(build)
+
+    def update(run):
+        run.branch = run.branch or build.get('ref') or ''
+        run.sha = run.sha or build.get('sha') or ''
+        run.jobs = [job for job in run.jobs if job.get('id') != summary['id']] + [summary]
+
+    return _save_run(build['pipeline_id'], testing_project_id, update)
+
+
+def reconcile_pipelines(project, per_page=100):
+    """
+    Copy the pipelines of a testing project that changed since the last reconciliation.
+
+    Pages are read by seeking on `updated_at` rather than by page number, so pipelines created while the
+    backfill runs do not shift the pages. Every request overlaps the previous page by a second so that
+    pipelines sharing the timestamp of the cursor are not skipped; they are simply recorded again.
+    Webhook deliveries that GitLab dropped are filled in this way.
+
+    :param project: The GitLab testing project.
+    :param per_page: Number of pipelines read per request.
+    :return: The number of pipelines recorded.
+    """
+    cursor = PipelineRun.objects.filter(testing_project_id=project.id, source=PipelineRun.GITLAB).aggregate(Max('updated_at'))['updated_at__max']
+    page = 1
+    count = 0
+    while True:
+        params = {'order_by': 'updated_at', 'sort': 'asc', 'per_page': per_page, 'page': page}
+        if cursor is not None:
+            params['updated_after'] = (cursor - timedelta(seconds=1)).isoformat()
+        pipelines = project.pipelines.list(**params)
+        for pipeline in pipelines:
+            record_pipeline(project.id, pipeline.attributes, [job.attributes for job in pipeline.jobs.list(get_all=True)])
+        count += len(pipelines)
+        if len(pipelines) < per_page:
+            return count
+
+        last = parse_time(pipelines[-1].attributes.get('updated_at'))
+        if last is None or last == cursor:
+            # A full page does not get past the cursor, so step over it by page number
+            page += 1
+        else:
+            cursor, page = last, 1
@@ -0,0 +1,127 @@
+import gitlab  # GitLab API client for Python, used for its exceptions.
+from django.conf import settings  # Django settings, used to read how long references are cached.
+from django.core.cache import cache  # Django cache shared by every worker process.
+
+from .clients import hash_token  # Tokens are only ever used as cache keys in hashed form.
+
+
+def branches_cache_key(project_id):
+    return f'peertest:branches:{project_id}'
+
+
+def commits_cache_key(project_id, ref=None):
+    return f'peertest:commits:{project_id}:{ref or ""}'
+
+
+def comments_cache_key(project_id, sha):
+    return f'peertest:comments:{project_id}:{sha}'
+
+
+def access_cache_key(token, project_id):
+    return f'peertest:access:{hash_token(token)}:{project_id}'
+
+
+def _timeout():
+    # Bounds how stale an entry can get when a GitLab webhook is missed
+    return getattr(settings, 'REF_CACHE_TTL', 300)
+
+
+def get_branches(project):
+    """
+    Get the branches of a project with their head commits.
+
+    Branch heads move on every push, so entries are dropped by the GitLab webhook (see invalidate_branch)
+    and otherwise expire after REF_CACHE_TTL seconds.
+
+    :param project: A GitLab project object.
+    :return: A list of {'name', 'commit'} dictionaries.
+    """
+    key = branches_cache_key(project.id)
+    branches = cache.get(key)
+    if branches is None:
+        branches = [{'name': branch.name, 'commit': branch.commit['id']} for branch in project.branches.list(get_all=True)]
+        cache.set(key, branches, timeout=_timeout())
+    return branches
+
+
+def get_commits(project, ref=None):
+    """
+    Get the commits of a branch of a project.
+
+    :param project: A GitLab project object.
+    :param ref: The branch to list, or None for the default branch.
+    :return: A list of {'id', 'message', 'author_name', 'created_at'} dictionaries.
+    """
+    key = commits_cache_key(project.id, ref)
+    commits = cache.get(key)
+    if commits is None:
+        commits = [{
+            'id': commit.id,
+            'message': commit.message,
+            'author_name': commit.author_name,
+            'created_at': commit.created_at
+        } for commit in (project.commits.list(ref_name=ref) if ref else project.commits.list())]
+        cache.set(key, commits, timeout=_timeout())
+    return commits
+
+
+def get_commit_comments(project, sha):
+    """
+    Get the comments on a commit of a project.
+
+    :param project: A GitLab project object.
+    :param sha: The commit SHA.
+    :return: A list of comment attribute dictionaries.
+    """
+    key = comments_cache_key(project.id, sha)
+    comments = cache.get(key)
+    if comments is None:
+        comments = [c.attributes for c in project.commits.get(sha).comments.list()]
+        cache.set(key, comments, timeout=_timeout())
+    return comments
+
+
+def can_access_project(gl, token, project_id):
+    """
+    Check whether a GitLab token can read a project, asking GitLab at most once every REF_CACHE_TTL seconds.
+
+    :param gl: An authenticated GitLab connection object for the token.
+    :param token: The GitLab access token.
+    :param project_id: The GitLab ID of the project.
+    :return: True if the project can be read with the token.
+    """
+    key = access_cache_key(token, project_id)
+    allowed = cache.get(key)
+    if allowed is None:
+        try:
+            gl.projects.get(project_id)
+            allowed = True
+        except gitlab.exceptions.GitlabAuthenticationError:
+            # The token was revoked since the client was authenticated; a new token may be issued at any time
+            return False
+        except gitlab.exceptions.GitlabGetError:
+            allowed = False
+        cache.set(key, allowed, timeout=_timeout())
+    return allowed
+
+
+def invalidate_branch(project_id, branch):
+    """
+    Forget the cached references a push to a branch makes stale: the branch list of the project and the
+    commit lists of the branch and of the default branch. Folder trees are cached per commit SHA and
+    stay valid.
+
+    :param project_id: The GitLab ID of the project.
+    :param branch: The name of the branch that changed.
+    """
+    cache.delete_many([branches_cache_key(project_id), commits_cache_key(project_id, branch), commits_cache_key(project_id)])
+
+
+def invalidate_commit(project_id, sha):
+    """
+    Forget the cached comments on a commit.
+
+    :param project_id: The GitLab ID of the project.
+    :param sha: The commit SHA.
+    """
+    cache.delete(comments_cache_key(project_id, sha))
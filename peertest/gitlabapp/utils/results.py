@@ -0,0 +1,191 @@
+import functools  # Standard library module used to open report files lazily.
+import zipfile  # Standard library module for reading job artifact archives member by member.
+import tempfile  # Standard library module for spooling artifact archives to disk once they grow.
+import xml.etree.ElementTree as ET  # Standard library XML parser, used incrementally through iterparse.
+
+import gitlab  # GitLab API client for Python, used for its exceptions.
+from django.conf import settings  # Django settings, used to read the ingestion limits.
+from django.utils import timezone  # Django helper for timezone-aware timestamps.
+
+from ..models import TestCaseResult, CoverageResult  # Tables the reports are read into.
+
+# Longest failure message kept for a test case
+MAX_FAILURE_MESSAGE = 10000
+
+
+def _local(tag):
+    # Strip an XML namespace from a tag
+    return tag.rsplit('}', 1)[-1]
+
+
+def _float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def _int(value):
+    value = _float(value)
+    return int(value) if value is not None else None
+
+
+def _testcase(elem, suite):
+    # Build the result of a <testcase> element whose children have been parsed
+    status, message = TestCaseResult.PASSED, None
+    for child in elem:
+        tag = _local(child.tag)
+        if tag in ('failure', 'error', 'skipped'):
+            status = {'failure': TestCaseResult.FAILED, 'error': TestCaseResult.ERROR, 'skipped': TestCaseResult.SKIPPED}[tag]
+            message = child.get('message') or (child.text or '').strip() or None
+            break
+    return {
+        'suite': (suite or '')[:255],
+        'classname': (elem.get('classname') or '')[:255],
+        'name': (elem.get('name') or '')[:255],
+        'status': status,
+        'duration': _float(elem.get('time')),
+        'failure_message': message[:MAX_FAILURE_MESSAGE] if message else None,
+    }
+
+
+def parse_report(fileobj):
+    """
+    Parse a JUnit, Cobertura or JaCoCo XML report incrementally.
+
+    Elements are dropped as soon as they have been read, so memory use does not grow with the size of
+    the report. The kind of report is recognised from its root element.
+
+    :param fileobj: A binary file object with the XML report.
+    :return: A generator of ('testcase', dict) items for every test case of a JUnit report, or a single
+             ('coverage', dict) item for a coverage report. Other XML files yield nothing.
+    """
+    stack = []
+    suites = []
+    for event, elem in ET.iterparse(fileobj, events=('start', 'end')):
+        tag = _local(elem.tag)
+        if event == 'start':
+            if not stack:
+                if tag == 'coverage':
+                    # Cobertura keeps the totals on the root element
+                    yield 'coverage', {
+                        'line_rate': _float(elem.get('line-rate')),
+                        'branch_rate': _float(elem.get('branch-rate')),
+                        'lines_covered': _int(elem.get('lines-covered')),
+                        'lines_valid': _int(elem.get('lines-valid')),
+                    }
+                    return
+                if tag not in ('testsuites', 'testsuite', 'report'):
+                    return
+            if tag == 'testsuite':
+                suites.append(elem.get('name'))
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if tag == 'testcase':
+            yield 'testcase', _testcase(elem, suites[-1] if suites else None)
+        elif tag == 'testsuite':
+            suites.pop()
+        elif tag == 'counter' and len(stack) == 1 and _local(stack[0].tag) == 'report' and elem.get('type') == 'LINE':
+            # JaCoCo keeps the totals in the counters that are direct children of the root element
+            missed, covered = _int(elem.get('missed')) or 0, _int(elem.get('covered')) or 0
+            yield 'coverage', {
+                'line_rate': covered / (missed + covered) if missed + covered else None,
+                'branch_rate': None,
+                'lines_covered': covered,
+                'lines_valid': missed + covered,
+            }
+        if stack and _local(stack[-1].tag) == 'testcase':
+            # Failures are read together with their test case
+            continue
+        # The element has been read; drop it and its children
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+def store_reports(run, job_name, reports, counts):
+    """
+    Parse report files and write their results for a run.
+
+    :param run: The PipelineRun the results belong to.
+    :param job_name: The name of the job that produced the reports.
+    :param reports: An iterable of (name, open) tuples, where open() returns a binary file object of the report.
+    :param counts: A dictionary whose 'test_cases' and 'coverage' counters are increased.
+    """
+    batch_size = getattr(settings, 'RESULTS_BATCH_SIZE', 500)
+    batch = []
+    for name, open_report in reports:
+        with open_report() as report:
+            try:
+                for kind, data in parse_report(report):
+                    if kind == 'coverage':
+                        CoverageResult.objects.create(run=run, job_name=job_name, **data)
+                        counts['coverage'] += 1
+                        continue
+                    batch.append(TestCaseResult(run=run, job_name=job_name, **data))
+                    if len(batch) >= batch_size:
+                        TestCaseResult.objects.bulk_create(batch)
+                        counts['test_cases'] += len(batch)
+                        batch = []
+            except ET.ParseError as e:
+                print(f"Skipping malformed report {name} of job {job_name}: {e}")
+    TestCaseResult.objects.bulk_create(batch)
+    counts['test_cases'] += len(batch)
+
+
+def download_artifacts(project, job_id):
+    """
+    Download the artifact archive of a job into a spooled temporary file.
+
+    The archive is kept in memory up to ARTIFACT_SPOOL_BYTES and written to disk beyond that.
+
+    :param project: The GitLab testing project.
+    :param job_id: The ID of the CI job.
+    :return: The spooled file, positioned at its start; the caller closes it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=getattr(settings, 'ARTIFACT_SPOOL_BYTES', 8 * 1024 * 1024))
+    try:
+        project.jobs.get(job_id, lazy=True).artifacts(streamed=True, action=spool.write)
+        spool.seek(0)
+        return spool
+    except Exception:
+        spool.close()
+        raise
+
+
+def ingest_results(project, run):
+    """
+    Read the JUnit and coverage reports of a pipeline into TestCaseResult and CoverageResult rows.
+
+    Every job with an artifact archive is downloaded in turn and every XML file in it is parsed as a
+    stream; test cases are written in batches. Results read earlier for the pipeline are replaced, so
+    ingestion can be repeated.
+
+    :param project: The GitLab testing project.
+    :param run: The PipelineRun of the pipeline.
+    :return: A dictionary with the number of 'test_cases' and 'coverage' reports read.
+    """
+    max_bytes = getattr(settings, 'ARTIFACT_MAX_BYTES', 100 * 1024 * 1024)
+    TestCaseResult.objects.filter(run=run).delete()
+    CoverageResult.objects.filter(run=run).delete()
+
+    counts = {'test_cases': 0, 'coverage': 0}
+    for job in project.pipelines.get(run.pipeline_id, lazy=True).jobs.list(get_all=True):
+        archive = job.attributes.get('artifacts_file') or {}
+        if not archive.get('filename') or (archive.get('size') or 0) > max_bytes:
+            continue
+        try:
+            spool = download_artifacts(project, job.id)
+        except gitlab.exceptions.GitlabError as e:
+            print(f"Failed to download the artifacts of job {job.id}: {e}")
+            continue
+
+        with spool, zipfile.ZipFile(spool) as artifacts:
+            members = [member for member in artifacts.infolist() if not member.is_dir() and member.filename.lower().endswith('.xml')]
+            store_reports(run, job.name, [(member.filename, functools.partial(artifacts.open, member)) for member in members], counts)
+
+    run.results_ingested_at = timezone.now()
+    run.save(update_fields=['results_ingested_at', 'recorded_at'])
+    return counts
@@ -0,0 +1,407 @@
+import math  # Standard library module for counting the commits of chunked actions.
+import functools  # Standard library module used to bind the arguments of branch sync tasks.
+
+from django.conf import settings  # Django settings, used to read the commit limits.
+from django.db import transaction  # Dry runs roll back the assignments planning makes.
+
+from ..models import Project, SyncState  # Registered forks and the sync progress of peer branches.
+from .assignments import ensure_assignments  # Peers assigned to test every forked project.
+from .blobcache import blob_cache, git_blob_sha  # Blobs already downloaded cost no request.
+from .languages import TEST_FOLDER, NO_LANGUAGE, detect_languages, get_tree_languages  # Languages the CI configuration is rendered for.
+from .pipefiles import CI_CONFIG_PATH, RETIRED_FILES, ci_config  # Pipeline files planned with the copied files.
+from .uploads import encode_content  # Content fields of commit actions, base64 for files that are not UTF-8.
+from .utils import gitauth, read_blob, get_sync_source, get_forked_usernames, create_branch, commit_actions_to_branch, run_sync_tasks, git_sync_tasks  # GitLab helpers and the sync executor.
+
+# Placeholder written to the test folder of new peer branches when the forked project has tests of its own
+TEST_PLACEHOLDER = {'path': f'{TEST_FOLDER}/init.txt', 'content': 'init data'}
+
+
+def is_test_path(path):
+    # Paths holding the peers' tests, which a sync never touches
+    return path.startswith('test')
+
+
+class BranchPlan:
+    """
+    The operations needed to bring one peer branch up to date.
+
+    Every action names the file it writes by blob SHA and where the content comes from ('source' for the
+    forked project, 'main' for the testing project's main branch, 'pipefile' or 'placeholder'); the content
+    itself is only read when the plan runs.
+    """
+
+    def __init__(self, branch, is_new, actions=None, languages=None, up_to_date=False):
+        self.branch = branch
+        self.is_new = is_new
+        self.actions = actions or []
+        self.languages = languages
+        self.up_to_date = up_to_date  # Skipped because it was synced to the current source commit
+
+    @property
+    def commits(self):
+        # Commits made for the branch once its actions are split by GITLAB_COMMIT_MAX_ACTIONS
+        return math.ceil(len(self.actions) / getattr(settings, 'GITLAB_COMMIT_MAX_ACTIONS', 100))
+
+    @property
+    def message(self):
+        # A new branch has no tests yet, so its first commit does not start a pipeline
+        return f"Initialised files in {self.branch} [ci skip]" if self.is_new else f"Updated files in {self.branch}"
+
+    def as_dict(self):
+        return {
+            'branch': self.branch,
+            'create_branch': self.is_new,
+            'up_to_date': self.up_to_date,
+            'languages': self.languages,
+            'actions': [{key: action[key] for key in ('action', 'file_path', 'previous_path', 'blob_id', 'origin') if key in action} for action in self.actions],
+            'commits': self.commits,
+        }
+
+
+class ProjectPlan:
+    """
+    The branch plans of one forked project and what running them costs in GitLab requests.
+    """
+
+    def __init__(self, project, testing_project, source, branches):
+        self.project = project
+        self.testing_project = testing_project
+        self.source = source
+        self.branches = branches
+
+    def blobs_to_read(self):
+        # Blobs that are not in the blob cache yet; each is read once for every branch
+        return {action['blob_id'] for plan in self.branches for action in plan.actions if action['origin'] in ('source', 'main') and action['blob_id'] not in blob_cache}
+
+    def cost(self):
+        """
+        :return: A dictionary with the branches created, the commits made, the blobs read and their sum, the GitLab requests.
+        """
+        created = sum(plan.is_new for plan in self.branches)
+        commits = sum(plan.commits for plan in self.branches)
+        reads = len(self.blobs_to_read())
+        return {'branches_created': created, 'commits': commits, 'blob_reads': reads, 'requests': created + commits + reads}
+
+    def as_dict(self):
+        return {
+            'project_id': self.project['id'],
+            'testing_project_id': self.project['testingproject']['id'],
+            'source_branch': self.source['branch'] if self.source else None,
+            'source_sha': self.source['sha'] if self.source else None,
+            'branches': [plan.as_dict() for plan in self.branches],
+            'cost': self.cost(),
+        }
+
+
+def get_cohort_usernames(gl, project):
+    """
+    :param gl: Authenticated GitLab instance.
+    :param project: The project dictionary.
+    :return: The usernames of everybody who forked the original project of `project`.
+    """
+    usernames = get_forked_usernames(gl, project['original_project_id'])
+    if not usernames:
+        # The token of the fork may not see the original project; fall back to the registered forks
+        usernames = list(Project.objects.filter(gitlaburl=project['gitlaburl'], original_project_id=project['original_project_id']).values_list('namespace', flat=True))
+    return usernames
+
+
+def list_blobs(project, ref):
+    """
+    :param project: A GitLab project object.
+    :param ref: A branch name or commit SHA.
+    :return: A tuple of a dictionary of path -> blob SHA for every file and the SHA of the test folder's tree (or None).
+    """
+    items = project.repository_tree(ref=ref, recursive=True, get_all=True)
+    blobs = {item['path']: item['id'] for item in items if item['type'] == 'blob'}
+    test_tree = next((item['id'] for item in items if item['type'] == 'tree' and item['path'] == TEST_FOLDER), None)
+    return blobs, test_tree
+
+
+def plan_branch(testing_project, branch, is_new, source_blobs, main_blobs, branch_blobs, test_tree):
+    """
+    Work out the actions that turn a peer branch into its desired state.
+
+    The desired branch holds the files of the testing project's main branch overlaid with those of the
+    forked project, its own test folder and the CI configuration for the languages of its tests. Only the
+    paths whose blob SHA differs from the branch are planned, so identical files cost nothing.
+
+    :param testing_project: The GitLab testing project.
+    :param branch: The name of the peer branch.
+    :param is_new: Whether the branch has to be created from main first.
+    :param source_blobs: Path -> blob SHA of the forked project's head.
+    :param main_blobs: Path -> blob SHA of the testing project's main branch.
+    :param branch_blobs: Path -> blob SHA of the branch, or of main for a new branch.
+    :param test_tree: The SHA of the branch's test folder tree, or None.
+    :return: A BranchPlan.
+    """
+    desired = {path: (sha, 'main') for path, sha in main_blobs.items()}
+    desired.update({path: (sha, 'source') for path, sha in source_blobs.items()})
+    desired = {path: value for path, value in desired.items() if not is_test_path(path) and path != CI_CONFIG_PATH and path not in RETIRED_FILES}
+
+    actions = []
+    for path, (sha, origin) in desired.items():
+        if branch_blobs.get(path) != sha:
+            actions.append({'action': 'update' if path in branch_blobs else 'create', 'file_path': path, 'blob_id': sha, 'origin': origin})
+    for path in branch_blobs:
+        if path not in desired and not is_test_path(path) and path != CI_CONFIG_PATH:
+            actions.append({'action': 'delete', 'file_path': path, 'blob_id': None, 'origin': 'source'})
+
+    tests = {path: sha for path, sha in branch_blobs.items() if path.startswith(TEST_FOLDER + '/')}
+    if is_new and any(is_test_path(path) for path in source_blobs) and TEST_PLACEHOLDER['path'] not in tests:
+        # The forked project's tests are not copied; the new branch gets an empty test folder instead
+        placeholder = TEST_PLACEHOLDER['content'].encode('utf-8')
+        actions.append({'action': 'create', 'file_path': TEST_PLACEHOLDER['path'], 'blob_id': git_blob_sha(placeholder), 'origin': 'placeholder'})
+        languages = detect_languages([*tests, TEST_PLACEHOLDER['path']], read=lambda path: placeholder if path == TEST_PLACEHOLDER['path'] else read_blob(testing_project, tests[path]))
+    else:
+        languages = get_tree_languages(test_tree, lambda: (list(tests), lambda path: read_blob(testing_project, tests[path])))
+
+    pipefile = ci_config(tuple(languages or [NO_LANGUAGE]))
+    if branch_blobs.get(pipefile.path) != pipefile.sha:
+        actions.append({'action': 'update' if pipefile.path in branch_blobs else 'create', 'file_path': pipefile.path, 'blob_id': pipefile.sha, 'origin': 'pipefile'})
+    return BranchPlan(branch, is_new, actions, languages)
+
+
+def plan_project(gitlaburl, project, expected_branches):
+    """
+    Plan the sync of the peer branches of one forked project.
+
+    Planning reads the trees of the forked project's head, of the testing project's main branch and of
+    every existing branch that needs work, one request each; file contents are only read to detect the
+    languages of tests whose extension says nothing, once per test folder tree. Branches
+    already synced to the source head (see SyncState) are planned as up to date without any request.
+
+    This supersedes the incremental sync through the compare API, which committed the changes between
+    a branch's last synced SHA and the source head. A compare only sees the forked project, so changes to
+    the testing project's main branch, to the CI templates or to the languages of a branch's tests were
+    never synced; comparing trees by blob SHA covers all of them.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param project: The project dictionary (forked project with its 'testingproject').
+    :param expected_branches: The peer branches the testing project should have.
+    :return: A ProjectPlan, or None if the forked project has no branches.
+    """
+    glp = gitauth(gitlaburl, project['testingproject']['gitlabaccesstoken'])
+    testing_project = glp.projects.get(project['testingproject']['id'])
+    source = get_sync_source(gitauth(gitlaburl, project['gitlabaccesstoken']), project['id'])
+    if source is None:
+        return None
+
+    existing = {branch.name for branch in testing_project.branches.list(all=True)}
+    states = {state.branch: state for state in SyncState.objects.filter(source_project_id=project['id'])}
+    plans = []
+    trees = {}  # ref -> (blobs, test folder tree), read on first use
+    for branch in expected_branches:
+        is_new = branch not in existing
+        state = states.get(branch)
+        if not is_new and state is not None and state.last_synced_sha == source['sha']:
+            # Nothing changed in the forked project since this branch was last synced
+            plans.append(BranchPlan(branch, False, up_to_date=True))
+            continue
+        if 'source' not in trees:
+            trees['source'] = list_blobs(source['project'], source['sha'])
+            trees['main'] = list_blobs(testing_project, 'main')
+        branch_blobs, test_tree = trees['main'] if is_new else list_blobs(testing_project, branch)
+        plans.append(plan_branch(testing_project, branch, is_new, trees['source'][0], trees['main'][0], branch_blobs, test_tree))
+    return ProjectPlan(project, testing_project, source, plans)
+
+
+def plan_peer_sync(gitlaburl, projects, fork_project_usernames):
+    """
+    Plan the sync of every project whose owner belongs to the cohort.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param projects: A list of project dictionaries.
+    :param fork_project_usernames: The usernames of everybody who forked the original project.
+    :return: A list of ProjectPlan.
+    """
+    assignments = {}  # original project ID -> branches of every author of the cohort
+    plans = []
+    for project in projects:
+        if project['namespace'] not in fork_project_usernames:
+            continue
+        # The branches of the project follow the peers assigned to it
+        cohort = project['original_project_id']
+        if cohort not in assignments:
+            assignments[cohort] = ensure_assignments(cohort, fork_project_usernames)
+        plan = plan_project(gitlaburl, project, assignments[cohort].get(project['namespace'], []))
+        if plan is not None:
+            plans.append(plan)
+    return plans
+
+
+def dry_run(gitlaburl, projects, fork_project_usernames):
+    """
+    Plan a sync without changing anything.
+
+    Assignments made for participants who joined since the last sync are rolled back, so they are only
+    stored by the sync that creates their branches.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param projects: A list of project dictionaries.
+    :param fork_project_usernames: The usernames of everybody who forked the original project.
+    :return: A list of ProjectPlan.
+    """
+    with transaction.atomic():
+        plans = plan_peer_sync(gitlaburl, projects, fork_project_usernames)
+        transaction.set_rollback(True)
+    return plans
+
+
+def plan_tasks(gitlaburl, plans):
+    """
+    :param gitlaburl: The URL of the GitLab instance.
+    :param plans: A list of ProjectPlan.
+    :return: The sync tasks of every branch that is not up to date (see run_sync_tasks).
+    """
+    return [(plan.project, branch_plan.branch, plan.source, functools.partial(execute_branch_plan, gitlaburl, plan, branch_plan))
+            for plan in plans for branch_plan in plan.branches if not branch_plan.up_to_date]
+
+
+def plan_commit(gitlaburl, project, fork_project_usernames, commit_sha, contents):
+    """
+    Plan the sync of one new commit of a forked project to the peer branches of its own testing project.
+
+    Branches synced to the commit's parent only receive the paths the commit changed, with the content
+    the caller already has, so no blob is read (see commit_actions); other branches of the project get a full plan
+    (see plan_project). Other projects of the cohort are never looked at.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param project: The project dictionary (forked project with its 'testingproject').
+    :param fork_project_usernames: The usernames of everybody who forked the original project.
+    :param commit_sha: The new commit of the forked project.
+    :param contents: A dictionary of path -> content (str or bytes) of the files the commit wrote.
+    :return: A list of ProjectPlan, empty if the commit is not on the branch peer branches copy.
+    """
+    source = get_sync_source(gitauth(gitlaburl, project['gitlabaccesstoken']), project['id'])
+    if source is None or source['sha'] != commit_sha:
+        # The commit is on another branch, or newer commits follow it and a regular sync picks them up
+        return []
+
+    branches = ensure_assignments(project['original_project_id'], fork_project_usernames).get(project['namespace'], [])
+    commit = source['project'].commits.get(commit_sha)
+    parents = set(commit.parent_ids)
+    states = {state.branch: state.last_synced_sha for state in SyncState.objects.filter(source_project_id=project['id'], branch__in=branches)}
+    current = [branch for branch in branches if states.get(branch) in parents]
+    others = [branch for branch in branches if branch not in current]
+
+    actions = None
+    if current:
+        # Branches synced to the parent hold the parent's files over those of main, so the files the commit
+        # adds are only already there if main has them; one tree of main answers for every branch
+        testing_project = gitauth(gitlaburl, project['testingproject']['gitlabaccesstoken']).projects.get(project['testingproject']['id'], lazy=True)
+        actions = commit_actions(commit, contents, set(list_blobs(testing_project, 'main')[0]))
+    if actions is None:
+        # Some content is unknown, so every branch gets a full plan
+        current, others = [], branches
+
+    plans = []
+    if current:
+        plans.append(ProjectPlan(project, None, source, [BranchPlan(branch, False, list(actions)) for branch in current]))
+    if others:
+        plans.append(plan_project(gitlaburl, project, others))
+    return [plan for plan in plans if plan is not None]
+
+
+def commit_actions(commit, contents, branch_paths=()):
+    """
+    Translate the diff of a forked project commit into the actions of a peer branch synced to its parent.
+
+    Paths in the test folder are left alone, as in a full sync. A file the commit adds is updated rather
+    than created when the branch already has it, as in plan_branch. The content of every written file is
+    put in the blob cache, so the executor does not read it back from GitLab.
+
+    :param commit: The GitLab commit.
+    :param contents: A dictionary of path -> content (str or bytes) of the files the commit wrote.
+    :param branch_paths: The paths of the files on the peer branch.
+    :return: A list of planned actions, or None if the commit wrote a file whose content is not in `contents`.
+    """
+    actions = []
+    for diff in commit.diff(get_all=True):
+        old_path, new_path = diff['old_path'], diff['new_path']
+        if diff['deleted_file'] or (diff['renamed_file'] and is_test_path(new_path)):
+            if not is_test_path(old_path) and old_path not in RETIRED_FILES:
+                actions.append({'action': 'delete', 'file_path': old_path, 'blob_id': None, 'origin': 'source'})
+            continue
+        if is_test_path(new_path) or new_path == CI_CONFIG_PATH or new_path in RETIRED_FILES:
+            continue
+        moved = diff['renamed_file'] and not is_test_path(old_path)
+        if moved and new_path in branch_paths:
+            # GitLab cannot move a file over another one; the old path is deleted and the new one updated
+            actions.append({'action': 'delete', 'file_path': old_path, 'blob_id': None, 'origin': 'source'})
+            moved = False
+        if new_path not in contents:
+            if moved and not diff.get('diff'):
+                # A pure rename keeps the content of the file
+                actions.append({'action': 'move', 'file_path': new_path, 'previous_path': old_path, 'blob_id': None, 'origin': 'source'})
+                continue
+            return None
+        content = contents[new_path]
+        content = content.encode('utf-8') if isinstance(content, str) else content
+        blob_cache.put(git_blob_sha(content), content)
+        action = 'move' if moved else 'create' if (diff['new_file'] or diff['renamed_file']) and new_path not in branch_paths else 'update'
+        actions.append({'action': action, 'file_path': new_path, 'blob_id': git_blob_sha(content), 'origin': 'source',
+                        **({'previous_path': old_path} if moved else {})})
+    return actions
+
+
+def sync_commit(gitlaburl, project, fork_project_usernames, commit_sha, contents):
+    """
+    Sync one new commit of a forked project to the peer branches of its testing project only.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param project: The project dictionary (forked project with its 'testingproject').
+    :param fork_project_usernames: The usernames of everybody who forked the original project.
+    :param commit_sha: The new commit of the forked project.
+    :param contents: A dictionary of path -> content of the files the commit wrote.
+    :return: The commit IDs made in the testing project.
+    """
+    if getattr(settings, 'PEER_SYNC_BACKEND', 'rest') == 'git':
+        tasks = git_sync_tasks(gitlaburl, [project], fork_project_usernames)
+    else:
+        tasks = plan_tasks(gitlaburl, plan_commit(gitlaburl, project, fork_project_usernames, commit_sha, contents))
+    return run_sync_tasks(gitlaburl, tasks).get(project['id'], [])
+
+
+def action_content(plan, branch_plan, action):
+    """
+    :param plan: The ProjectPlan.
+    :param branch_plan: The BranchPlan the action belongs to.
+    :param action: A planned action.
+    :return: The GitLab commit action, with the content of the file it writes.
+    """
+    payload = {'action': action['action'], 'file_path': action['file_path']}
+    if 'previous_path' in action:
+        payload['previous_path'] = action['previous_path']
+    if action['blob_id'] is None:
+        # Deletions, and moves that keep the content of the file
+        return payload
+    if action['origin'] == 'placeholder':
+        return {**payload, 'content': TEST_PLACEHOLDER['content']}
+    if action['origin'] == 'pipefile':
+        return {**payload, 'content': ci_config(tuple(branch_plan.languages or [NO_LANGUAGE])).content}
+    return {**payload, **encode_content(read_blob(plan.source['project'] if action['origin'] == 'source' else plan.testing_project, action['blob_id']))}
+
+
+def execute_branch_plan(gitlaburl, plan, branch_plan):
+    """
+    Run the plan of one peer branch: create it if needed and commit its actions.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param plan: The ProjectPlan the branch belongs to.
+    :param branch_plan: The BranchPlan.
+    :return: A tuple of the last commit ID (or None) and whether the branch is now in sync with the source.
+    """
+    glp = gitauth(gitlaburl, plan.project['testingproject']['gitlabaccesstoken'])
+    testing_project_id = plan.project['testingproject']['id']
+    if branch_plan.is_new:
+        create_branch(glp, testing_project_id, branch_plan.branch, ref='main')
+    if not branch_plan.actions:
+        return (None, True)
+
+    actions = [action_content(plan, branch_plan, action) for action in branch_plan.actions]
+    commit_id, complete = commit_actions_to_branch(glp, testing_project_id, branch_plan.branch, actions, branch_plan.message)
+    if commit_id is not None:
+        print(f"{branch_plan.message} ({commit_id})")
+    # A branch that only received some of its chunks is not in sync, so the next plan retries it
+    return (commit_id, complete)
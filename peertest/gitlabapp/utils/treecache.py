@@ -0,0 +1,33 @@
+import json  # Standard library module used to serialise folder structures.
+import zlib  # Standard library module used to compress cached folder structures.
+
+from django.core.cache import cache  # Django cache shared by every worker process.
+
+
+def tree_cache_key(project_id, sha):
+    return f'peertest:tree:{project_id}:{sha}'
+
+
+def get_folder_structure(project, sha):
+    """
+    Get the nested folder structure of a project at a commit, reading the tree from GitLab only once.
+
+    A tree never changes for a given commit SHA, so cached structures never expire. They are stored as
+    compressed compact JSON to keep large repositories cheap to hold in the cache.
+
+    :param project: A GitLab project object.
+    :param sha: The commit SHA (the head of a branch).
+    :return: A nested dictionary representing the folder structure (see create_folder_structure).
+    """
+    # Imported here because utils.py imports this module
+    from .utils import create_folder_structure
+
+    key = tree_cache_key(project.id, sha)
+    cached = cache.get(key)
+    if cached is not None:
+        return json.loads(zlib.decompress(cached))
+
+    files = project.repository_tree(recursive=True, ref=sha, get_all=True)
+    folder_structure = create_folder_structure(files)
+    cache.set(key, zlib.compress(json.dumps(folder_structure, separators=(',', ':')).encode('utf-8')), timeout=None)
+    return folder_structure
@@ -0,0 +1,175 @@
+import base64  # Standard library module for committing files that are not valid UTF-8.
+import binascii  # Standard library module, raised on malformed base64 content.
+import posixpath  # Standard library module for normalising repository paths.
+import tarfile  # Standard library module for reading uploaded tar archives.
+import tempfile  # Standard library module for the spooled upload files.
+import zipfile  # Standard library module for reading uploaded zip archives.
+
+from django.conf import settings  # Django settings, used to read the upload limits.
+from django.core.files.uploadedfile import UploadedFile  # The file handed to the view once the upload is complete.
+from django.core.files.uploadhandler import FileUploadHandler  # Base class of the upload handlers Django streams request bodies to.
+
+# File actions the batch update accepts, and the fields each one needs on top of 'file_path'
+FILE_ACTIONS = {'create': ('content',), 'update': ('content',), 'delete': (), 'move': ('previous_path',)}
+
+
+class UploadError(ValueError):
+    """Raised when uploaded actions or archives cannot be committed."""
+
+
+class SpooledUploadHandler(FileUploadHandler):
+    """
+    Streams uploaded files into spooled temporary files.
+
+    Each file is kept in memory up to UPLOAD_SPOOL_BYTES and written to disk beyond that, so a large
+    archive never sits in the memory of the worker. Files larger than UPLOAD_MAX_BYTES are dropped.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.spool = tempfile.SpooledTemporaryFile(max_size=getattr(settings, 'UPLOAD_SPOOL_BYTES', 8 * 1024 * 1024))
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > getattr(settings, 'UPLOAD_MAX_BYTES', 100 * 1024 * 1024):
+            self.too_large = True
+        if not self.too_large:
+            self.spool.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.too_large:
+            self.spool.close()
+            return None
+        self.spool.seek(0)
+        return UploadedFile(file=self.spool, name=self.file_name, content_type=self.content_type, size=file_size,
+                            charset=self.charset, content_type_extra=self.content_type_extra)
+
+
+def encode_content(content):
+    """
+    :param content: The content of a file as bytes.
+    :return: The 'content' and, for files that are not valid UTF-8, 'encoding' fields of a GitLab commit action.
+    """
+    try:
+        return {'content': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'content': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'}
+
+
+def clean_path(path, strip_components=0):
+    """
+    :param path: A path from a request or an archive.
+    :param strip_components: Number of leading directories to remove, like `tar --strip-components`.
+    :return: The normalised repository path, or None if the path is empty or points outside the repository.
+    """
+    parts = [part for part in posixpath.normpath(path.replace('\\', '/')).split('/') if part not in ('', '.')]
+    parts = parts[strip_components:]
+    if not parts or '..' in parts or parts[0] == '.git' or path.startswith('/'):
+        return None
+    return '/'.join(parts)
+
+
+def validate_actions(actions):
+    """
+    Check a list of GitLab-style file actions.
+
+    :param actions: A list of dictionaries with 'action', 'file_path' and the fields the action needs.
+    :return: A tuple of the commit actions and a dictionary of path -> content (bytes) of the files they write.
+    :raises UploadError: If an action is malformed.
+    """
+    if not isinstance(actions, list) or not actions:
+        raise UploadError('actions must be a non-empty list')
+
+    commit_actions, contents = [], {}
+    for index, action in enumerate(actions):
+        if not isinstance(action, dict) or action.get('action') not in FILE_ACTIONS:
+            raise UploadError(f"actions[{index}].action must be one of {', '.join(FILE_ACTIONS)}")
+        path = clean_path(str(action.get('file_path') or ''))
+        if path is None:
+            raise UploadError(f"actions[{index}].file_path is invalid")
+        for field in FILE_ACTIONS[action['action']]:
+            if action.get(field) is None:
+                raise UploadError(f"actions[{index}].{field} is required")
+
+        commit_action = {'action': action['action'], 'file_path': path}
+        if action['action'] == 'move':
+            commit_action['previous_path'] = clean_path(str(action['previous_path']))
+            if commit_action['previous_path'] is None:
+                raise UploadError(f"actions[{index}].previous_path is invalid")
+        if action.get('content') is not None:
+            try:
+                content = base64.b64decode(action['content'], validate=True) if action.get('encoding') == 'base64' else str(action['content']).encode('utf-8')
+            except binascii.Error:
+                raise UploadError(f"actions[{index}].content is not valid base64")
+            commit_action.update(encode_content(content))
+            contents[path] = content
+        commit_actions.append(commit_action)
+    return commit_actions, contents
+
+
+def iter_archive(fileobj):
+    """
+    Read the files of a zip or tar (optionally compressed) archive one at a time.
+
+    :param fileobj: A seekable file object holding the archive.
+    :return: A generator of (path, bytes) tuples; directories, links and devices are skipped.
+    :raises UploadError: If the archive cannot be read or exceeds UPLOAD_MAX_FILES or UPLOAD_MAX_BYTES once extracted.
+    """
+    max_files = getattr(settings, 'UPLOAD_MAX_FILES', 1000)
+    max_bytes = getattr(settings, 'UPLOAD_MAX_BYTES', 100 * 1024 * 1024)
+    total = 0
+
+    def check(count, size):
+        if count > max_files:
+            raise UploadError(f'The archive holds more than {max_files} files')
+        if total + size > max_bytes:
+            raise UploadError(f'The archive holds more than {max_bytes} bytes')
+
+    count = 0
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                count += 1
+                check(count, member.file_size)
+                total += member.file_size
+                yield member.filename, archive.read(member)
+        return
+
+    fileobj.seek(0)
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r:*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                count += 1
+                check(count, member.size)
+                total += member.size
+                yield member.name, archive.extractfile(member).read()
+    except tarfile.TarError as e:
+        raise UploadError(f'The archive is not a zip or tar file: {e}')
+
+
+def archive_actions(fileobj, existing_paths, strip_components=0):
+    """
+    Turn the files of an uploaded archive into commit actions.
+
+    :param fileobj: A seekable file object holding a zip or tar archive.
+    :param existing_paths: The paths of the files already on the branch, to choose between 'create' and 'update'.
+    :param strip_components: Number of leading directories to remove from every path.
+    :return: A tuple of the commit actions and a dictionary of path -> content (bytes) of the files they write.
+    :raises UploadError: If the archive cannot be read, is too large or holds no file.
+    """
+    commit_actions, contents = [], {}
+    for name, content in iter_archive(fileobj):
+        path = clean_path(name, strip_components)
+        if path is None or path in contents:
+            continue
+        commit_actions.append({'action': 'update' if path in existing_paths else 'create', 'file_path': path, **encode_content(content)})
+        contents[path] = content
+    if not commit_actions:
+        raise UploadError('The archive holds no file')
+    return commit_actions, contents
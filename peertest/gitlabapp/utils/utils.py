@@ -1,9 +1,22 @@
 import os  # Standard library module for interacting with the operating system.
 import gitlab  # GitLab API client for Python to interact with GitLab.
 import base64  # Standard library module for encoding and decoding data in base64.
+import io  # Standard library module for the file object used to stream repository archives.
+import tarfile  # Standard library module for reading repository archives entry by entry.
+import functools  # Standard library module used to bind the arguments of branch sync tasks.
 from datetime import datetime  # Standard library module for handling dates and times.
 from dateutil.relativedelta import relativedelta  # Module from the dateutil library for manipulating dates with relative deltas.
 from dotenv import load_dotenv  # Module from the python-dotenv library for loading environment variables from a .env file.
+from django.conf import settings  # Django settings, used for the GitLab request limits.
+from .clients import client_registry  # Process-wide registry of pooled, authenticated GitLab clients.
+from .blobcache import blob_cache, git_blob_sha  # Content-addressed cache of blobs keyed by git blob SHA.
+from .treecache import get_folder_structure  # Folder structures cached per (project, commit SHA).
+from .refcache import get_branches, get_commits, get_commit_comments, invalidate_commit  # Branches, commits and comments cached until a webhook reports a change.
+from .executor import sync_executor  # Thread pool that syncs independent peer branches in parallel.
+from .assignments import ensure_assignments  # Peers assigned to test every forked project.
+from .pipefiles import pipefile_actions  # Pipeline files rendered from templates loaded once and compared by blob SHA.
+from .gitmirror import sync_peer_branches_git  # Git backend composing and pushing all peer branches of a project at once.
+from ..models import SyncState, CommitMapping  # Sync progress of peer branches and forked-to-testing commit links.
 
 
 # Load environment variables from .env file
@@ -38,16 +51,21 @@ gitlab.OWNER_ACCESS = 50
 def gitauth(gitlaburl,private_token):
     """
     Authenticates to GitLab with the provided access token.
+
+    Clients come from a process-wide registry, so repeated calls with the same URL and token
+    reuse one keep-alive session and only repeat the gl.auth() check once its TTL has expired.
     
     Parameters:
-    - access_token: The GitLab personal access token for authentication.
+    - gitlaburl: The URL of the GitLab instance.
+    - private_token: The GitLab personal access token for authentication.
     
     Returns:
     - A GitLab API client instance.
+
+    Raises:
+    - gitlab.exceptions.GitlabAuthenticationError: If GitLab rejects the token.
     """
-    gl = gitlab.Gitlab(gitlaburl, private_token=private_token)
-    gl.auth()
-    return gl
+    return client_registry.get(gitlaburl, private_token)
 
 def get_user_details(gitlaburl, usertoken, user_id=None):
     """
@@ -195,36 +213,108 @@ def fork_project(gl, project_id, new_project_name=None):
         # Handle errors while retrieving the original project
         return (False, e)
 
-def get_files_in_branch(gl, project_id, branch, folder):
+class _ChunkReader(io.RawIOBase):
     """
-    Get all files in a folder (and subdirectories) along with their content from a specific branch.
-    
+    Read-only file object over an iterator of byte chunks, used to stream archives into tarfile.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        # Pull chunks from the iterator until there is something to hand out or it is exhausted
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+def iter_archive_files(gl, project_id, ref, folder=''):
+    """
+    Stream the files of a branch from a tar.gz repository archive.
+
+    The archive is downloaded in chunks and extracted entry by entry, so only the file being yielded
+    is held in memory.
+
+    :param gl: GitLab instance
+    :param project_id: ID of the project
+    :param ref: Branch name or commit SHA
+    :param folder: Optional path prefix to restrict the archive to
+    :return: A generator of (path, bytes) tuples.
+    :raises gitlab.exceptions.GitlabGetError: If archives cannot be downloaded for the project.
+    """
+    project = gl.projects.get(project_id)
+    chunks = project.repository_archive(sha=ref, path=folder or None, format='tar.gz', streamed=True, iterator=True, chunk_size=64 * 1024)
+    prefix = folder.strip('/') + '/' if folder else ''
+
+    with tarfile.open(fileobj=io.BufferedReader(_ChunkReader(chunks)), mode='r|gz') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            # Entries are stored below a '<project>-<ref>-<sha>/' directory which is not part of the repository path
+            path = member.name.split('/', 1)[1] if '/' in member.name else member.name
+            if not path.startswith(prefix):
+                continue
+            yield path, archive.extractfile(member).read()
+
+def read_blob(project, sha):
+    """
+    Read the content of a blob, using the blob cache before downloading it.
+
+    :param project: A GitLab project object.
+    :param sha: The blob SHA.
+    :return: The blob content as bytes.
+    """
+    content = blob_cache.get(sha)
+    if content is None:
+        content = project.repository_raw_blob(sha)
+        blob_cache.put(sha, content)
+    return content
+
+def iter_files_in_branch(gl, project_id, branch, folder):
+    """
+    Iterate over all files in a folder (and subdirectories) along with their content from a specific branch.
+
+    The folder is listed with one recursive tree call and every blob is looked up in the blob cache by
+    its SHA first. Missing blobs are downloaded through a streamed repository archive when there are at
+    least GITLAB_ARCHIVE_MIN_FILES of them, otherwise (or when GITLAB_USE_ARCHIVES is False or GitLab
+    refuses the archive) they are fetched one by one as raw blobs. Contents are yielded as bytes, so
+    binary files come through unchanged; decoding them is up to the caller (see uploads.encode_content).
+
     Parameters:
     - gl: GitLab instance
     - project_id: ID of the project
     - branch: Name of the branch
     - folder: Path to the folder
-    
+
     Returns:
-    - A list of dictionaries where each dictionary contains:
-      - 'path': The path of the file
-      - 'content': The content of the file
+    - A generator of dictionaries with 'path', 'content' (bytes) and 'mode' (e.g. '100755') keys.
     """
     project = gl.projects.get(project_id)
-    all_files = []
+    blobs = [item for item in project.repository_tree(ref=branch, path=folder, recursive=True, get_all=True) if item['type'] == 'blob']
+    missing = {item['id'] for item in blobs if item['id'] not in blob_cache}
 
-    def fetch_files(path):
-        items = project.repository_tree(ref=branch, path=path, all=True)
-        for item in items:
-            if item['type'] == 'blob':  # It's a file
-                file_path = item['path']
-                file_content = project.files.get(file_path, ref=branch).decode().decode('utf-8')
-                all_files.append({'path': file_path, 'content': file_content})
-            elif item['type'] == 'tree':  # It's a directory
-                fetch_files(item['path'])  # Recursive call
+    # Fill the cache from the archive when many blobs are missing
+    if missing and getattr(settings, 'GITLAB_USE_ARCHIVES', True) and len(missing) >= getattr(settings, 'GITLAB_ARCHIVE_MIN_FILES', 10):
+        try:
+            for path, content in iter_archive_files(gl, project_id, branch, folder):
+                sha = git_blob_sha(content)
+                if sha in missing:
+                    blob_cache.put(sha, content)
+                    missing.discard(sha)
+        except gitlab.exceptions.GitlabGetError as e:
+            print(f"Repository archive unavailable for project {project_id}, reading files one by one: {e}")
 
-    fetch_files(folder)
-    return all_files
+    for item in blobs:
+        yield {'path': item['path'], 'content': read_blob(project, item['id']), 'mode': item.get('mode')}
 
 # Helper function to create a file in a project
 def create_file(glp, project_id, branch_name, file_path, content):
@@ -255,9 +345,41 @@ def create_file(glp, project_id, branch_name, file_path, content):
         print(f"Failed to create file {file_path}: {e}")
         return None
 
+def get_sync_source(gl, project_id):
+    """
+    Describe the commit of a forked project that peer branches should be synced to.
+
+    :param gl: Authenticated GitLab instance with access to the forked project.
+    :param project_id: ID of the forked project.
+    :return: A dictionary with the GitLab 'project', its 'branch' and the head commit 'sha', or None if the project has no branches.
+    """
+    project = gl.projects.get(project_id)
+    branch = project.default_branch
+    if not branch:
+        branches = project.branches.list()
+        if not branches:
+            return None
+        branch = branches[0].name
+    return {'project': project, 'branch': branch, 'sha': project.branches.get(branch).commit['id']}
+
 def update_peertestingproject(gitlaburl,projects, username, fork_project_usernames):
     """
-    Updates the 'src' and 'test' folders in all peer-testing projects by either creating branches or updating files.
+    Updates the peer branches of every peer-testing project from the matching forked project.
+
+    Which peer branches a testing project has is decided by the stored peer assignments of its cohort
+    (see ensure_assignments), so each project gets a handful of branches rather than one for every
+    pair of participants.
+
+    The sync is planned first (see plan_peer_sync): the blob SHAs of the forked project, the testing
+    project's main branch and every peer branch are compared, and only the branch creations and file
+    actions that change something are run, one multi-action commit per branch holding both the copied
+    files and the pipeline files. The test folder, which holds the peers' tests, is never overwritten.
+    The last source commit copied to each peer branch is stored in SyncState, so branches already synced
+    to it are skipped without a request. Branches are independent, so they are synced in parallel by the
+    sync executor (see execute_branch_plan).
+
+    With PEER_SYNC_BACKEND set to 'git', the branches of a project are instead composed in a local
+    mirror and pushed together (see sync_peer_branches_git), one task per project.
     
     Parameters:
     - projects: A list of project objects.
@@ -267,61 +389,73 @@ def update_peertestingproject(gitlaburl,projects, username, fork_project_usernam
     Returns:
     - A tuple where the first element is a boolean indicating success, and the second element is a message or data.
     """
- 
-    folders = ['src', 'test']  # Define the folders to update
-    pcommits ={}
+    # Imported here because syncplan.py imports this module
+    from .syncplan import plan_peer_sync, plan_tasks
+
+    if getattr(settings, 'PEER_SYNC_BACKEND', 'rest') == 'git':
+        tasks = git_sync_tasks(gitlaburl, projects, fork_project_usernames)
+    else:
+        tasks = plan_tasks(gitlaburl, plan_peer_sync(gitlaburl, projects, fork_project_usernames))
+    pcommits = run_sync_tasks(gitlaburl, tasks)
+    return (True, 'Update completed successfully', {project['id']: pcommits.get(project['id'], []) for project in projects})
+
+def run_sync_tasks(gitlaburl, tasks):
+    """
+    Run sync tasks in parallel and record the branches they brought in sync in SyncState.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param tasks: A list of (project, branch name or None for a task syncing many branches, source, callable) tuples.
+    :return: A dictionary of forked project ID -> commit IDs made in its testing project.
+    """
+    pcommits = {}
+    results = sync_executor.run(gitlaburl, [task for _, _, _, task in tasks])
+    for (project, branchname, source, _), result in zip(tasks, results):
+        commits = pcommits.setdefault(project['id'], [])
+        if isinstance(result, Exception):
+            print(f"Failed to sync {branchname or 'the branches'} of project {project['id']}: {result}")
+            continue
+        # Git backend tasks cover many branches, REST tasks a single one
+        outcomes = result if branchname is None else [(branchname, result)]
+        for synced_branch, (commit_id, synced) in outcomes:
+            if commit_id is not None:
+                commits.append(commit_id)
+            if synced:
+                SyncState.objects.update_or_create(
+                    source_project_id=project['id'], branch=synced_branch,
+                    defaults={'testing_project_id': project['testingproject']['id'], 'last_synced_sha': source['sha']}
+                )
+    return pcommits
+
+def git_sync_tasks(gitlaburl, projects, fork_project_usernames):
+    """
+    Build the tasks of the git backend: one per project, syncing through the local mirror every peer
+    branch that is missing or not synced to the source head.
+
+    :param gitlaburl: The URL of the GitLab instance.
+    :param projects: A list of project dictionaries.
+    :param fork_project_usernames: The usernames of everybody who forked the original project.
+    :return: A list of sync tasks (see run_sync_tasks).
+    """
+    assignments = {}  # original project ID -> branches of every author of the cohort
+    tasks = []
     for project in projects:
-        commits =[]
-        # Ensure the project's namespace is among the forked project usernames
-        #print(fork_project_usernames,'=>\n',project['namespace'])
-        if project['namespace'] in fork_project_usernames:
-            # Authenticate using the project's GitLab access token
-            glp = gitauth(gitlaburl,project['testingproject']['gitlabaccesstoken'])
-            
-            # Generate all expected branch names for the given forked project usernames
-            allexpectedbranches = [f"{user}p{i}" for user in fork_project_usernames for i in range(len(fork_project_usernames))]
-            
-            # Get the list of branches for the current project
-            branches = [branch.name for branch in glp.projects.get(project['testingproject']['id']).branches.list() if branch.name != 'main']
-            #print(allexpectedbranches,'\n',branches)
-            for branchname in allexpectedbranches:
-                if branchname not in branches:
-                    # Create the branch if it does not exist
-                    branch = create_branch(glp, project['testingproject']['id'], branchname, ref='main')
-                    #fetch the main branch from the forked project
-                    gp = gitauth(gitlaburl,project['gitlabaccesstoken'])
-                    branches = gp.projects.get(project['id']).branches.list()
-
-                    # Access the name of the first branch
-                    if branches:
-                        first_branch_name = branches[0].name
-                    files = get_files_in_branch(gp, project['id'], first_branch_name, '')
-                    for file in files:
-                        if not file['path'].startswith('test'):
-                            commit_id = commit_to_branch(glp, project['testingproject']['id'], branchname, file['path'], f"Initialised file: {file['path']} in {branchname}", file['content'])
-                            commits.append(commit_id)
-                            print(f"Initialised file: {file['path']} in branch: {branchname}")
-                        else:
-                            file_path = f'test/init.txt'
-                            content = 'init data'
-                            commit_id = create_file(glp, project['testingproject']['id'], branchname, file_path, content)
-                            commits.append(commit_id)
-                            print(f"Created file: {file_path} in branch: {branchname}")
-                    add_pipefiles(gitlaburl, branchname, project['testingproject']['gitlabaccesstoken'], project['testingproject']['id'])
-                        
-                else:
-                    # For existing branches, update files based on the updated_files dictionary
-                    for folder in folders:
-                        if username not in glp.projects.get(project['testingproject']['id']).name:
-                            folder = 'src'
-                        files = get_files_in_branch(glp, project['testingproject']['id'], branchname, folder)
-                        for file in files:
-                            commit_id = commit_to_branch(glp, project['testingproject']['id'], branchname, file['path'], f"Updated file: {file['path']} in {branchname}", file['content'])
-                            commits.append(commit_id)
-                            print(f"Updated file: {file['path']} in branch: {branchname}")
-                    add_pipefiles(gitlaburl, branchname, project['testingproject']['gitlabaccesstoken'], project['testingproject']['id'])
-        pcommits[project['id']] = commits
-    return (True, 'Update completed successfully', pcommits)
+        if project['namespace'] not in fork_project_usernames:
+            continue
+        cohort = project['original_project_id']
+        if cohort not in assignments:
+            assignments[cohort] = ensure_assignments(cohort, fork_project_usernames)
+
+        testing_project = gitauth(gitlaburl, project['testingproject']['gitlabaccesstoken']).projects.get(project['testingproject']['id'])
+        source = get_sync_source(gitauth(gitlaburl, project['gitlabaccesstoken']), project['id'])
+        if source is None:
+            continue
+        states = {state.branch: state.last_synced_sha for state in SyncState.objects.filter(source_project_id=project['id'])}
+        existing = {branch.name for branch in testing_project.branches.list(all=True)}
+        pending = [branch for branch in assignments[cohort].get(project['namespace'], []) if branch not in existing or states.get(branch) != source['sha']]
+        if pending:
+            tasks.append((project, None, source, functools.partial(sync_peer_branches_git, project, source, pending,
+                                                                  source['project'].http_url_to_repo, testing_project.http_url_to_repo)))
+    return tasks
 
 def get_forked_usernames(gl, original_project_id):
     """
@@ -386,6 +520,55 @@ def commit_to_branch(gl, project_id, branch_name, file_path, commit_message, con
         print(f"GitLab error: {general_error}")
         return None
     
+def commit_actions_to_branch(gl, project_id, branch_name, actions, commit_message):
+    """
+    Commit a list of file actions to a branch using as few multi-action commits as possible.
+
+    The actions are split into chunks bounded by GITLAB_COMMIT_MAX_ACTIONS and GITLAB_COMMIT_MAX_BYTES
+    so that large syncs stay below GitLab's request limits.
+
+    :param gl: Authenticated GitLab instance.
+    :param project_id: ID of the project where the commit will be made.
+    :param branch_name: Name of the branch to commit to.
+    :param actions: A list of GitLab commit actions ('create', 'update', 'delete' or 'move').
+    :param commit_message: Commit message.
+    :return: A tuple of the ID of the last created commit (or None if nothing was committed) and whether
+             every chunk was committed; when a chunk fails the later ones are not attempted.
+    """
+    if not actions:
+        return (None, True)
+
+    project = gl.projects.get(project_id)
+    max_actions = getattr(settings, 'GITLAB_COMMIT_MAX_ACTIONS', 100)
+    max_bytes = getattr(settings, 'GITLAB_COMMIT_MAX_BYTES', 10 * 1024 * 1024)
+
+    # Group the actions into chunks that respect the size limits
+    chunks = [[]]
+    chunk_bytes = 0
+    for action in actions:
+        size = len(action.get('content') or '')
+        if chunks[-1] and (len(chunks[-1]) >= max_actions or chunk_bytes + size > max_bytes):
+            chunks.append([])
+            chunk_bytes = 0
+        chunks[-1].append(action)
+        chunk_bytes += size
+
+    # Create one commit per chunk
+    commit_id = None
+    for index, chunk in enumerate(chunks):
+        message = commit_message if len(chunks) == 1 else f"{commit_message} ({index + 1}/{len(chunks)})"
+        try:
+            commit = project.commits.create({'branch': branch_name, 'commit_message': message, 'actions': chunk})
+            commit_id = commit.id
+            print(f"Commit ID: {commit.id}")
+        except gitlab.exceptions.GitlabCreateError as create_error:
+            print(f"Failed to create commit: {create_error}")
+            return (commit_id, False)
+        except gitlab.exceptions.GitlabError as general_error:
+            print(f"GitLab error: {general_error}")
+            return (commit_id, False)
+    return (commit_id, True)
+
 def get_latest_commits(gl, testing_project_id, forked_project_id, forked_branch_name, testing_branch_name):
     """
     Get the latest commits from a testing project and its forked project.
@@ -478,12 +661,45 @@ def delete_project(gitlaburl, gitlabusertoken, project_id,tproject_id):
         
     return (True,'Project deleted successfully')
 
-def list_projects(gl, ps):
+# Parts of a project that list_projects can read from GitLab
+PROJECT_EXPANSIONS = ('branches', 'tree', 'commits')
+
+def expand_project(gl, project_id, expand=PROJECT_EXPANSIONS):
+    """
+    Read the requested parts of a project from GitLab.
+
+    :param gl: An authenticated GitLab connection object.
+    :param project_id: The ID of the project.
+    :param expand: The parts to read: 'branches', 'tree' (the file structure of every branch, implies
+                   'branches', cached per commit) and 'commits'.
+    :return: A tuple of the GitLab project and a dictionary with the requested 'branches' and 'commits'.
+    """
+    project = gl.projects.get(project_id)
+    expansions = {}
+
+    if 'branches' in expand or 'tree' in expand:
+        branch_data = []
+        for branch in get_branches(project):
+            data = dict(branch)
+            if 'tree' in expand:
+                # The tree of a commit never changes, so it comes from the tree cache
+                data['files'] = get_folder_structure(project, branch['commit'])
+            branch_data.append(data)
+        expansions['branches'] = branch_data
+
+    if 'commits' in expand:
+        # Retrieve the list of commits in the project
+        expansions['commits'] = get_commits(project)
+
+    return project, expansions
+
+def list_projects(gl, ps, expand=PROJECT_EXPANSIONS):
     """
     List all projects associated with the given IDs, including their branches and file structures.
 
     :param gl: An authenticated GitLab connection object.
-    :param ids: A list of project IDs to be listed.
+    :param ps: The Project objects to be listed.
+    :param expand: The parts of each project to read from GitLab (see expand_project).
     :return: A list of projects with their branches and file structures.
     """
     projects = []
@@ -491,61 +707,19 @@ def list_projects(gl, ps):
     for proj in ps:
         project_id = proj.id
         try:
-            project = gl.projects.get(project_id)
-            branches = project.branches.list(get_all=True)
-            branch_data = []
-
-            for branch in branches:
-                files = project.repository_tree(recursive=True, ref=branch.name, get_all=True)
-                folder_structure = create_folder_structure(files)
-                branch_data.append({'name': branch.name, 'files': folder_structure})
-
+            project, expansions = expand_project(gl, project_id, expand)
             project_info = project.attributes
-            project_info['branches'] = branch_data
-
-            # Retrieve the list of commits in the project
-            commits = project.commits.list()
-            project_info['commits'] = commits
-            commits = project.commits.list()
-            commit_info_list = []
-            for commit in commits:
-                commit_info_list.append({
-                    'id': commit.id,
-                    'message': commit.message,
-                    'author_name': commit.author_name,
-                    'created_at': commit.created_at
-                })
-            project_info['commits'] = commit_info_list
+            project_info.update(expansions)
             projects.append(project_info)
-
-
         except Exception as e:
             print(f"Error processing project {project_id}: {e}")
+            continue
         
-        tproject_id = proj.testingproject['id']
+        tproject_id = proj.testing_project_id
         try:
-            tproject = gl.projects.get(tproject_id)
-            tbranches = tproject.branches.list(get_all=True)
-            tbranch_data = []
-
-            for branch in tbranches:
-                files = tproject.repository_tree(recursive=True, ref=branch.name, get_all=True)
-                folder_structure = create_folder_structure(files)
-                tbranch_data.append({'name': branch.name, 'files': folder_structure})
-
+            tproject, texpansions = expand_project(gl, tproject_id, expand)
             tproject_info = tproject.attributes
-            tproject_info['branches'] = tbranch_data
-            # Retrieve the list of commits in the project
-            tcommits = tproject.commits.list()
-            tcommit_info_list = []
-            for commit in tcommits:
-                tcommit_info_list.append({
-                    'id': commit.id,
-                    'message': commit.message,
-                    'author_name': commit.author_name,
-                    'created_at': commit.created_at
-                })
-            tproject_info['commits'] = tcommit_info_list
+            tproject_info.update(texpansions)
             project_info['testingproject'] = tproject_info
         except Exception as e:
             print(f"Error processing testing project {tproject_id}: {e}")
@@ -569,53 +743,76 @@ def create_folder_structure(files):
     return folder_structure
 
 
+def record_commit_mappings(project_id, commits, branch=''):
+    """
+    Record which testing project commits belong to which forked project commits.
+
+    :param project_id: The ID of the forked project (a saved Project).
+    :param commits: A dictionary of {fork_sha: testing_sha}, where testing_sha may also be a list of SHAs.
+    :param branch: The branch of the testing project the testing commits are on, if known.
+    :return: The list of created CommitMapping objects.
+    """
+    mappings = []
+    for source_sha, testing_shas in commits.items():
+        if not source_sha:
+            continue
+        for testing_sha in (testing_shas if isinstance(testing_shas, list) else [testing_shas]):
+            mappings.append(CommitMapping(project_id=project_id, source_sha=source_sha, testing_sha=testing_sha, branch=branch))
+    return CommitMapping.objects.bulk_create(mappings)
+
 def comment_on_commit(gitlaburl,project, commit_id, comment_text):
     """
     Add a comment to a commit in both the testing project and the main project.
+
+    The matching testing project commit is found through the indexed CommitMapping table.
     
     :param project: Dictionary containing project details and commits.
     :param commit_id: Commit ID to comment on.
     :param comment_text: Text of the comment to add.
     :return: None or exception if an error occurs.
     """
+    # Find the matching commit of the testing project before talking to GitLab
+    mapping = CommitMapping.objects.filter(project_id=project['id'], source_sha=commit_id).order_by('-created_at').first()
+    if mapping is None:
+        return (False,'Commit ID not found in project commits.')
+
     # Authenticate to GitLab for the testing project
-    gl_testing = gitauth(gitlaburl,project['testingproject']['gitlabaccesstoken'])
-    if not gl_testing:
-        return 'Invalid GitLab token for testing project'
+    try:
+        gl_testing = gitauth(gitlaburl,project['testingproject']['gitlabaccesstoken'])
+    except gitlab.exceptions.GitlabAuthenticationError:
+        return (False,'Invalid GitLab token for testing project')
     # Get the testing project
     try:
         testing_project = gl_testing.projects.get(project['testingproject']['id'])
     except gitlab.exceptions.GitlabGetError as e:
-        return f'Failed to get testing project: {e}'
+        return (False,f'Failed to get testing project: {e}')
     
     # Authenticate to GitLab for the main project
-    gl_main = gitauth(gitlaburl,project['gitlabaccesstoken'])
-    if not gl_main:
-        return 'Invalid GitLab token for main project'
+    try:
+        gl_main = gitauth(gitlaburl,project['gitlabaccesstoken'])
+    except gitlab.exceptions.GitlabAuthenticationError:
+        return (False,'Invalid GitLab token for main project')
     
     # Get the main project
     try:
         main_project = gl_main.projects.get(project['id'])
     except gitlab.exceptions.GitlabGetError as e:
-        return f'Failed to get main project: {e}'
+        return (False,f'Failed to get main project: {e}')
 
     # Add comments to the commit in both projects
     try:
-        # Create the comment
+        # Comment on the commit in the main project
+        main_commit = main_project.commits.get(commit_id)
+        main_commit.comments.create({'note': comment_text})
+        invalidate_commit(main_project.id, commit_id)
         
-        for commit in project['commits']:
-            if commit_id in commit.keys():
-
-                # Comment on the commit in the main project
-                main_commit = main_project.commits.get(commit_id)
-                main_commit.comments.create({'note': comment_text})
-                
-                # Comment on the commit in the testing project
-                testing_commit = testing_project.commits.get(commit[commit_id])
-                testing_commit.comments.create({'note': comment_text})
-                
-                return (True,'Comment added successfully!')
-        return (False,'Commit ID not found in project commits.')
+        # Comment on the commit in the testing project
+        if mapping.testing_sha:
+            testing_commit = testing_project.commits.get(mapping.testing_sha)
+            testing_commit.comments.create({'note': comment_text})
+            invalidate_commit(testing_project.id, mapping.testing_sha)
+        
+        return (True,'Comment added successfully!')
     
     except gitlab.exceptions.GitlabCreateError as e:
 
@@ -629,15 +826,12 @@ def get_comments_on_commit(gitlaburl,project_id, token, commit_id):
     :param token: GitLab personal access token.
     :param commit_id: ID of the commit to get comments for.
     :return: List of comments on the commit.
+    :raises gitlab.exceptions.GitlabAuthenticationError: If GitLab rejects the token.
     """
     try:
         gl = gitauth(gitlaburl,token)
-        if not gl:
-            return None
         project = gl.projects.get(project_id)
-        commit = project.commits.get(commit_id)
-        comments = commit.comments.list()
-        return [c.attributes for c in comments]
+        return get_commit_comments(project, commit_id)
     except gitlab.exceptions.GitlabGetError as e:
         return []
 
@@ -645,42 +839,35 @@ def add_pipefiles(gitlaburl, branchname, peerbottoken, project_id):
     """
     Run tests on a specific branch in a GitLab project by creating or updating and committing test files.
 
+    The CI configuration is rendered with the languages of the branch's tests, detected here so that the
+    pipeline needs no detection stage. Only the pipeline files that are missing or differ are committed
+    (see pipefile_actions); when the branch already holds identical files no commit is made, so no
+    pipeline is started for nothing.
+
     :param gitlaburl: The URL of the GitLab instance.
     :param branchname: The name of the branch to run tests on.
     :param peerbottoken: The GitLab access token for authentication.
     :param project_id: The ID of the project in which to run tests.
-    :return: A dictionary containing the commit ID, branch name, peerbottoken, and project ID if successful, otherwise None.
+    :return: A dictionary containing the commit ID (None if nothing was committed), branch name, peerbottoken,
+             project ID, whether the files 'changed' and the detected 'language' if successful, otherwise None.
     """
     try:
         # Authenticate to GitLab using the provided URL and access token
         gl = gitauth(gitlaburl, peerbottoken)
         
-        # Get the project by its ID
-        project = gl.projects.get(project_id)
+        # Get the project without an extra request; only its sub-resources are used
+        project = gl.projects.get(project_id, lazy=True)
 
-        # Check if the files exist, if they do, use 'update', otherwise use 'create'
-        actions = []
+        # Compare the files of the branch with the rendered templates by blob SHA
+        actions, languages = pipefile_actions(project, branchname)
+        if not actions:
+            return {'id': None, 'branch': branchname, 'peerbottoken': peerbottoken, 'project_id': project_id, 'changed': False, 'language': languages}
 
-        for file_path, content in [
-            ('.env', ''),
-            ('detect_and_test.sh', open(f'{os.getcwd()}/gitlabapp/utils/detect_and_test.sh').read()),
-            ('.gitlab-ci.yml', open(f'{os.getcwd()}/gitlabapp/utils/.gitlab-ci.yml').read())
-        ]:
-            try:
-                # Attempt to get the file to see if it exists
-                project.files.get(file_path=file_path, ref=branchname)
-                action = 'update'
-                commit_message = f'running tests on {branchname} branch'
-            except gitlab.GitlabGetError:
-                # If the file does not exist, it will raise a GitlabGetError
-                action = 'create'
-                commit_message = f'init tests on {branchname} branch'+' [ci skip]'
-
-            actions.append({
-                'action': action,
-                'file_path': file_path,
-                'content': content,
-            })
+        if actions[0]['action'] == 'create':
+            # The first CI configuration of a branch must not start a pipeline yet
+            commit_message = f'init tests on {branchname} branch'+' [ci skip]'
+        else:
+            commit_message = f'running tests on {branchname} branch'
 
         # Prepare the commit data
         data = {
@@ -693,7 +880,7 @@ def add_pipefiles(gitlaburl, branchname, peerbottoken, project_id):
         commit = project.commits.create(data)
 
         # Return a dictionary containing the commit details
-        return {'id': commit.id, 'branch': branchname, 'peerbottoken': peerbottoken, 'project_id': project_id}
+        return {'id': commit.id, 'branch': branchname, 'peerbottoken': peerbottoken, 'project_id': project_id, 'changed': True, 'language': languages}
 
     except Exception as e:
         # Print the error message if an exception occurs
@@ -711,7 +898,6 @@ def add_pipefiles(gitlaburl, branchname, peerbottoken, project_id):
 
 #print(list_project_branches(16023))
 # project_id = 16039
-# files = get_files_in_branch(project_id,'main')
 # print(f"Files in branch '{gitlabusername}':")
 # for file_info in files:
 #     if file_info['type'] == 'blob':  # Only process files (not directories)
@@ -0,0 +1,177 @@
+from ..models import Project, Job, CommitMapping  # Projects the events are matched to, the job queue and the commits made by syncs.
+from ..jobs import enqueue  # Helper that adds background jobs to the queue.
+from .refcache import invalidate_branch, invalidate_commit  # Cached branches, commits and comments that events make stale.
+from .pipelines import record_pipeline, record_job, FINISHED_STATUSES  # Local copy of the pipelines of testing projects.
+from ..events import publish_project_event  # Updates streamed to dashboards.
+from .utils import PEERTESTINGBOT  # Name of the bot that commits to testing projects.
+
+
+def enqueue_peer_sync(project_id, sha=None):
+    """
+    Queue an incremental sync of the peer branches of a forked project.
+
+    Pushes often come in bursts, so no job is added while one for the project is still waiting to run;
+    the waiting job syncs to the branch head it finds when it starts, and is given the SHA of the latest
+    push so that the testing commits it makes are linked to that commit.
+
+    :param project_id: The GitLab ID of the forked project.
+    :param sha: The commit the default branch was changed to, if known.
+    :return: The queued Job.
+    """
+    job = Job.objects.filter(kind='peer_sync', status=Job.QUEUED, payload__project_id=project_id).first()
+    if job is not None:
+        payload = {**job.payload, 'sha': sha or job.payload.get('sha')}
+        # The job may have been claimed in the meantime; it then syncs to an older head and a new job is needed
+        if Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(payload=payload):
+            job.payload = payload
+            return job
+    return enqueue('peer_sync', {'project_id': project_id, 'sha': sha})
+
+
+def enqueue_results_ingestion(pipeline_id):
+    """
+    Queue the ingestion of the test reports of a finished pipeline, unless it is already queued.
+
+    :param pipeline_id: The GitLab ID of the pipeline.
+    :return: The queued Job.
+    """
+    job = Job.objects.filter(kind='ingest_results', status__in=[Job.QUEUED, Job.RUNNING], payload__pipeline_id=pipeline_id).first()
+    return job or enqueue('ingest_results', {'pipeline_id': pipeline_id})
+
+
+def enqueue_pipefile_refresh(testing_project_id, branch):
+    """
+    Queue a refresh of the pipeline files of a peer branch, unless one is already waiting to run.
+
+    :param testing_project_id: The GitLab ID of the testing project.
+    :param branch: The name of the peer branch.
+    :return: The queued Job.
+    """
+    job = Job.objects.filter(kind='refresh_pipefiles', status=Job.QUEUED, payload__testing_project_id=testing_project_id, payload__branch=branch).first()
+    return job or enqueue('refresh_pipefiles', {'testing_project_id': testing_project_id, 'branch': branch})
+
+
+def made_by_sync(sha, user_name=None):
+    """
+    Tell whether a commit of a testing project was made by this application.
+
+    Syncs and pipeline file refreshes commit with the project access token named PEERTESTINGBOT, and the
+    commits of syncs are recorded in CommitMapping.
+
+    :param sha: The SHA of the commit.
+    :param user_name: The name of the user who pushed the commit, as reported in the event.
+    :return: True if the commit was made by this application.
+    """
+    return user_name == PEERTESTINGBOT or (bool(sha) and CommitMapping.objects.filter(testing_sha=sha).exists())
+
+
+def branch_changed(project_id, branch, default_branch=None, sha=None, user_name=None):
+    """
+    Handle a change of a branch reported by GitLab.
+
+    The cached references of the branch are dropped. If the branch is the one peer branches are synced
+    from, i.e. the default branch of a registered forked project, a peer sync is queued. If it is a peer
+    branch of a testing project, its pipeline files are refreshed, since the push may have changed the
+    languages of the tests, unless the push is one of this application's own commits, which already
+    carry up to date pipeline files.
+
+    :param project_id: The GitLab ID of the project.
+    :param branch: The name of the branch that changed.
+    :param default_branch: The default branch of the project, as reported in the event.
+    :param sha: The commit the branch was changed to, if known.
+    :param user_name: The name of the user who changed the branch, if known.
+    :return: A dictionary describing what was done.
+    """
+    invalidate_branch(project_id, branch)
+    result = {'project_id': project_id, 'branch': branch, 'job': None}
+    if branch == default_branch and Project.objects.filter(pk=project_id).exists():
+        result['job'] = str(enqueue_peer_sync(project_id, sha).id)
+    elif branch != default_branch and Project.objects.filter(testing_project_id=project_id).exists() and not made_by_sync(sha, user_name):
+        result['job'] = str(enqueue_pipefile_refresh(project_id, branch).id)
+    return result
+
+
+def handle_push(payload):
+    ref = payload.get('ref') or ''
+    if not ref.startswith('refs/heads/'):
+        # Tags do not affect any cached branch
+        return None
+    project = payload.get('project') or {}
+    return branch_changed(payload.get('project_id') or project.get('id'), ref[len('refs/heads/'):], project.get('default_branch'),
+                          payload.get('after'), payload.get('user_name'))
+
+
+def handle_merge_request(payload):
+    attributes = payload.get('object_attributes') or {}
+    if attributes.get('action') != 'merge':
+        # Only a merge changes a branch
+        return None
+    project = payload.get('project') or {}
+    return branch_changed(attributes.get('target_project_id') or project.get('id'), attributes.get('target_branch'), project.get('default_branch'),
+                          attributes.get('merge_commit_sha'))
+
+
+def handle_note(payload):
+    attributes = payload.get('object_attributes') or {}
+    if attributes.get('noteable_type') != 'Commit':
+        return None
+    project_id = payload.get('project_id') or (payload.get('project') or {}).get('id')
+    sha = (payload.get('commit') or {}).get('id') or attributes.get('commit_id')
+    invalidate_commit(project_id, sha)
+    note = attributes.get('note') or ''
+    if '[ci skip]' not in note:
+        # Notes posted through this application are published by the comment and review views
+        publish_project_event(project_id, 'review' if '⭐' in note else 'comment', {'commit_id': sha, 'note': note})
+    return {'project_id': project_id, 'commit': sha}
+
+
+def publish_pipeline(run):
+    # Dashboards receive the current status and job summaries of the pipeline
+    publish_project_event(run.testing_project_id, 'pipeline', {
+        'pipeline_id': run.pipeline_id, 'run_id': run.id, 'source': run.source, 'branch': run.branch, 'sha': run.sha, 'status': run.status, 'jobs': run.jobs,
+    })
+
+
+def handle_pipeline(payload):
+    attributes = payload.get('object_attributes') or {}
+    project_id = (payload.get('project') or {}).get('id')
+    if not Project.objects.filter(testing_project_id=project_id).exists():
+        # Only the pipelines of testing projects are kept
+        return None
+    run = record_pipeline(project_id, attributes, payload.get('builds'))
+    publish_pipeline(run)
+    if run.status in FINISHED_STATUSES and run.results_ingested_at is None:
+        enqueue_results_ingestion(run.pipeline_id)
+    return {'project_id': project_id, 'pipeline_id': run.pipeline_id, 'status': run.status}
+
+
+def handle_job(payload):
+    project_id = payload.get('project_id')
+    if not payload.get('pipeline_id') or not Project.objects.filter(testing_project_id=project_id).exists():
+        return None
+    run = record_job(project_id, payload)
+    publish_pipeline(run)
+    return {'project_id': project_id, 'pipeline_id': run.pipeline_id, 'job_id': payload.get('build_id')}
+
+
+# Event handlers, keyed by the object_kind GitLab puts in every webhook payload
+EVENT_HANDLERS = {
+    'push': handle_push,
+    'merge_request': handle_merge_request,
+    'note': handle_note,
+    'pipeline': handle_pipeline,
+    'build': handle_job,
+}
+
+
+def handle_event(payload):
+    """
+    Handle a GitLab webhook payload.
+
+    :param payload: The decoded JSON body of the webhook request.
+    :return: A dictionary describing what was done, or None if the event is not relevant.
+    """
+    event_handler = EVENT_HANDLERS.get(payload.get('object_kind'))
+    if event_handler is None:
+        return None
+    return event_handler(payload)
@@ -2,11 +2,28 @@ import gitlab.exceptions  # Import exceptions from the GitLab library for error
 from .utils.utils import *  # Import all utility functions from the utils module within the current package
 from rest_framework import viewsets, status  # Import viewsets and status codes from Django REST Framework
 from rest_framework.views import APIView  # Import APIView class to create views for handling API requests
+from rest_framework.decorators import action  # Import action to add the statistics endpoints to TestViewSet
 from rest_framework.response import Response  # Import Response class to return responses from API views
-from .models import Project # Import the Project and TestInstance models from the current module
-from authapp.models import User
+from .models import Project, Job, PipelineRun, TestCaseResult, CoverageResult # Import the models from the current module
+from authapp.tokencache import resolve_token  # Import the cached token-to-user lookup
 from django.forms.models import model_to_dict  # Import model_to_dict to convert model instances to dictionaries
-from .serializers import ProjectSerializer # Import serializers for the Project and TestInstance models
+from django.db.models import Q, Count, Avg, Max  # Import Q to look a project up by either of its GitLab IDs, and the aggregates of the test statistics
+from .serializers import ProjectSerializer, ProjectListSerializer, JobSerializer, PipelineRunSerializer # Import serializers for the Project, Job and PipelineRun models
+from .pagination import ProjectCursorPagination, PipelineRunCursorPagination  # Import the pagination used to list projects and pipeline runs
+from .jobs import enqueue  # Import the helper that adds background jobs to the queue
+from .utils.webhooks import handle_event, publish_pipeline  # Import the handler of GitLab webhook events and the publisher of pipeline updates
+from .utils.localrunner import start_local_run  # Import the helper that queues test runs on this server
+from .utils.refcache import can_access_project  # Import the cached check of a token's access to a project
+from .utils.pipelines import record_pipeline  # Import the helper that records a pipeline in the PipelineRun table
+from .utils.syncplan import dry_run, get_cohort_usernames, sync_commit  # Import the sync planner used by the dry run and by project updates
+from .utils.uploads import SpooledUploadHandler, UploadError, archive_actions, validate_actions  # Import the helpers of batch updates
+from .events import publish_project_event, stream_events  # Import the project event stream
+import hmac  # Import hmac to compare webhook tokens in constant time
+import json  # Import json to read the actions of multipart batch updates
+from asgiref.sync import sync_to_async  # Import sync_to_async to call synchronous helpers from async views
+from django.conf import settings  # Import settings to read the webhook secret
+from django.http import JsonResponse, StreamingHttpResponse  # Import the responses of the plain Django event stream view
+from django.views import View  # Import the Django base view, which unlike DRF views can be asynchronous
 
 class StatusAPIView(APIView):
     """
@@ -34,6 +51,120 @@ class StatusAPIView(APIView):
         # Return a successful response with status 200 and the data
         return Response({'success': True, "message": "Api is running", 'data': data}, status=status.HTTP_200_OK)
 
+class GitlabWebhookAPIView(APIView):
+    """
+    API view that receives GitLab webhooks.
+
+    Push and merge events drop the cached references of the changed branch and queue a peer sync when
+    the default branch of a forked project changed; note events drop the cached comments of the commit;
+    pipeline and job events of testing projects are recorded in the PipelineRun table.
+    GitLab must be configured to send GITLAB_WEBHOOK_SECRET as the secret token.
+    """
+    # GitLab authenticates with the secret token instead of a JWT
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handle a GitLab webhook event.
+
+        :param request: The HTTP request object, with the secret token in the X-Gitlab-Token header.
+        :return: JSON response with success status and what was done for the event.
+        """
+        secret = getattr(settings, 'GITLAB_WEBHOOK_SECRET', '')
+        token = request.headers.get('X-Gitlab-Token', '')
+        if not secret or not hmac.compare_digest(token.encode('utf-8'), secret.encode('utf-8')):
+            return Response({'success': False, "message": "invalid webhook token", 'data': None}, status=status.HTTP_403_FORBIDDEN)
+
+        result = handle_event(request.data)
+        if result is None:
+            return Response({'success': True, "message": "event ignored", 'data': None}, status=status.HTTP_200_OK)
+        return Response({'success': True, "message": "event processed", 'data': result}, status=status.HTTP_200_OK)
+
+class ProjectEventStreamView(View):
+    """
+    Asynchronous view that streams the updates of a project as server-sent events.
+
+    Pipeline status changes, comments and reviews are pushed to the client as they are published, so
+    dashboards hold an idle connection instead of polling the tests and reviews endpoints. Browsers that
+    reconnect send the Last-Event-ID header and receive the events they missed. Served under ASGI, an
+    open stream does not hold a worker thread.
+    """
+
+    async def get(self, request, pk, *args, **kwargs):
+        """
+        Open the event stream of a project.
+
+        :param request: The HTTP request object, with the `gitlabaccesstoken` query parameter and optionally
+                        the Last-Event-ID header or the `last_event_id` query parameter.
+        :param pk: The ID of the forked project.
+        :return: A text/event-stream response, or a JSON error response.
+        """
+        gitlabaccesstoken = request.GET.get("gitlabaccesstoken")
+        if not gitlabaccesstoken:
+            return JsonResponse({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = await sync_to_async(resolve_token)(gitlabaccesstoken)
+        if user is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'User with the provided GitLab access token does not exist',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        project = await Project.objects.filter(pk=pk).only('id').afirst()
+        try:
+            gl = await sync_to_async(gitauth)(user.gitlaburl, gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return JsonResponse({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if project is None or not await sync_to_async(can_access_project)(gl, gitlabaccesstoken, project.id):
+            return JsonResponse({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        response = StreamingHttpResponse(stream_events(project.id, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+        return response
+
+class JobAPIView(APIView):
+    """
+    API view to follow the progress of a background job.
+
+    Jobs are created by endpoints whose work takes too long for a single request, such as project creation.
+    """
+
+    def get(self, request, pk=None, *args, **kwargs):
+        """
+        Get the status and per-stage progress of a job.
+
+        :param request: The HTTP request object.
+        :param pk: The ID of the job.
+        :return: JSON response with success status and job details or error message.
+        """
+        gitlabaccesstoken = request.query_params.get("gitlabaccesstoken")
+        if not gitlabaccesstoken:
+            return Response({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
+            return Response({
+                'success': False,
+                'message': 'User with the provided GitLab access token does not exist',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the user who queued a job may follow it
+        job = Job.objects.filter(pk=pk, payload__user_id=str(user.id)).first()
+        if job is None:
+            return Response({'success': False, "message": "job not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({'success': True, "message": "job retrieved successfully", 'data': JobSerializer(job).data}, status=status.HTTP_200_OK)
+
 class ProjectViewSet(viewsets.ViewSet):
     """
     A viewset for handling CRUD operations on Project objects.
@@ -49,10 +180,12 @@ class ProjectViewSet(viewsets.ViewSet):
         """
         Create a new project.
 
-        This method forks a new project in GitLab, associates it with the testing project, and saves it in the database.
+        This method queues a job that forks a new project in GitLab, associates it with the testing project,
+        syncs the peer branches and saves it in the database. The job is run by the `runjobs` management command
+        and its progress can be followed at jobs/<id>/.
 
         :param request: The HTTP request object.
-        :return: JSON response with success status and project details or error message.
+        :return: JSON response with success status and the queued job or error message.
         """
         gitlabaccesstoken = request.data.get("gitlabaccesstoken")
         new_project_name = request.data.get('new_project_name')
@@ -68,54 +201,25 @@ class ProjectViewSet(viewsets.ViewSet):
             return Response({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Authenticate with GitLab
-        try:
-            instance = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        instance = resolve_token(gitlabaccesstoken)
+        if instance is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
                 'data': errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Continue with your logic if the user is found
-        gl = gitauth(instance.gitlaburl,gitlabaccesstoken)
-        projects = [model_to_dict(project) for project in Project.objects.filter(gitlaburl=instance.gitlaburl)]
-        
-        if gl:
-            # Fork the project
-            new_project = fork_project(gl, projectid, new_project_name)
-            fork_project_usernames = get_forked_usernames(gl, projectid)
-            
-            if new_project[0] is True:
-                projects.append(new_project[1])
-                update_peertestingproject(instance.gitlaburl,projects, gl.user.username, fork_project_usernames)
-
-                data = new_project[1]
-                latest_commits = get_latest_commits(gl, new_project[1]['testingproject']['id'], new_project[1]['id'], 'main', gl.user.username + 'p0')
-                data['commits'] = [latest_commits]
-                data['gitlaburl']=instance.gitlaburl
-                serializer = ProjectSerializer(data=data)
-                
-                if serializer.is_valid():
-                    project = serializer.save()
-                    response_data = {
-                        'success': True,
-                        'message': f'Project forked successfully',
-                        'data': serializer.data
-                    }
-                    return Response(response_data, status=status.HTTP_201_CREATED)
-                else:
-                    errors = serializer.errors
-            else:
-                errors = new_project[1]
-        else:
-            errors = "Invalid gitlabaccesstoken"
-                
+        # Queue the fork and provisioning work
+        job = enqueue('provision_project', {
+            'user_id': str(instance.id),
+            'projectid': projectid,
+            'new_project_name': new_project_name,
+        })
         return Response({
-            'success': False,
-            'message': 'Failed to create Project',
-            'data': errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'success': True,
+            'message': 'Project creation queued',
+            'data': JobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
     
     #Retrieve a project
     def retrieve(self, request, pk=None):
@@ -138,9 +242,8 @@ class ProjectViewSet(viewsets.ViewSet):
             return Response({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Authenticate with GitLab
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -148,40 +251,45 @@ class ProjectViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Continue with your logic if the user is found
-        gl = gitauth(user.gitlaburl, gitlabaccesstoken)
-        
-        p = {}
-        
-        if gl:
-            try:
-                project = gl.projects.get(project_id)
-            except gitlab.exceptions.GitlabGetError as e:
-                print(f"Error retrieving project: {e}")
-                return Response({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
-            
-            try:
-                project2 = gl.projects.get(gl, int(project_id) + 1)
-                project.update({'testingproject': project2})
-                p = project
-            except gitlab.exceptions.GitlabGetError as e:
-                try:
-                    project2 = gl.projects.get(int(project_id) - 1)
-                    project2.update({'testingproject': project})
-                    p = project2
-                except gitlab.exceptions.GitlabGetError as e:
-                    print(f"Error retrieving testing project: {e}")
-                    return Response({'success': False, "message": "testing project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
-            
-            return Response({'success': True, "message": "project retrieved successfully", 'data': p}, status=status.HTTP_200_OK)
-        
-        return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            gl = gitauth(user.gitlaburl, gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The ID may be that of the forked project or of its testing project
+        try:
+            instance = Project.objects.filter(Q(pk=int(project_id)) | Q(testing_project_id=int(project_id))).first()
+        except ValueError:
+            instance = None
+        if instance is None or instance.testing_project_id is None:
+            return Response({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            project = gl.projects.get(instance.id)
+        except gitlab.exceptions.GitlabGetError as e:
+            print(f"Error retrieving project: {e}")
+            return Response({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            testing_project = gl.projects.get(instance.testing_project_id)
+        except gitlab.exceptions.GitlabGetError as e:
+            print(f"Error retrieving testing project: {e}")
+            return Response({'success': False, "message": "testing project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        p = project.attributes
+        p['testingproject'] = testing_project.attributes
+        p['testing_branch'] = instance.testing_branch
+        return Response({'success': True, "message": "project retrieved successfully", 'data': p}, status=status.HTTP_200_OK)
     
     #Update a project
     def update(self, request, *args, **kwargs):
         """
         Update a project.
 
-        This method commits changes to a specific branch of the project in GitLab.
+        This method commits changes to a specific branch of the project in GitLab. When the branch is the
+        one peer branches copy, only the peer branches of this project's testing project are synced, and
+        only with the changed file (see sync_commit), so the time an edit takes does not grow with the
+        size of the cohort.
 
         :param request: The HTTP request object.
         :param kwargs: Additional arguments.
@@ -228,9 +336,8 @@ class ProjectViewSet(viewsets.ViewSet):
                 return Response({'success': False, "message": f"{field_name} is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Authenticate with GitLab
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -238,8 +345,9 @@ class ProjectViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Continue with your logic if the user is found
-        gl = gitauth(user.gitlaburl,gitlabaccesstoken)
-        if not gl:
+        try:
+            gl = gitauth(user.gitlaburl,gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
             return Response({'success': False, "message": "Invalid GitLab token", 'data': None}, status=status.HTTP_401_UNAUTHORIZED)
         
         # Commit to branch
@@ -247,26 +355,26 @@ class ProjectViewSet(viewsets.ViewSet):
             project_commit_id = commit_to_branch(gl, project_id, branch_name, file_path, commit_message, content)
         except Exception as e:
             return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if project_commit_id is None:
+            return Response({'success': False, "message": f"Failed to commit {file_path}", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Get forked project usernames
         try:
-            fork_project_usernames = get_forked_usernames(gl, instance_dict['original_project_id'])
+            fork_project_usernames = get_cohort_usernames(gl, instance_dict)
         except Exception as e:
             return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update peer testing project
+        # Only the peer branches of this project's testing project receive the changed file
         try:
-            projects = [model_to_dict(project) for project in Project.objects.all()]
-            _, _, pcommits = update_peertestingproject(projects, gl.user.username, fork_project_usernames, content)
+            testing_commits = sync_commit(user.gitlaburl, instance_dict, fork_project_usernames, project_commit_id, {file_path: content})
         except Exception as e:
             return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Update commits in the instance
         try:
-            for p in pcommits.keys():
-                if p == project_id:
-                    instance.commits = {project_commit_id: pcommits[p]}
-                    instance.save()
+            instance.commits = {project_commit_id: testing_commits}
+            instance.save(update_fields=['commits'])
+            record_commit_mappings(instance.id, {project_commit_id: testing_commits})
         except Exception as e:
             return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -280,9 +388,11 @@ class ProjectViewSet(viewsets.ViewSet):
     #List the projects
     def list(self, request, *args, **kwargs):
         """
-        List all projects.
+        List the projects of the user.
 
-        This method retrieves a list of all projects associated with the provided GitLab username.
+        This method lists the projects forked by the user holding the GitLab access token from the database, a page
+        at a time (see ProjectCursorPagination). Data that lives in GitLab is only read when it is asked for with
+        ?expand=branches,tree,commits.
 
         :param request: The HTTP request object.
         :return: JSON response with success status and list of projects or error message.
@@ -292,11 +402,15 @@ class ProjectViewSet(viewsets.ViewSet):
         # Validate required fields
         if gitlabaccesstoken is None:
             return Response({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        expand = {part for part in request.query_params.get('expand', '').split(',') if part}
+        invalid = expand.difference(PROJECT_EXPANSIONS)
+        if invalid:
+            return Response({'success': False, "message": f"expand must be a subset of {', '.join(PROJECT_EXPANSIONS)}", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Authenticate with GitLab
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -304,16 +418,36 @@ class ProjectViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Continue with your logic if the user is found
-        gl = gitauth(user.gitlaburl, gitlabaccesstoken)
-        if gl:
-            # Retrieve only the IDs of all Project objects and Convert the QuerySet to a list
-            projects = Project.objects.filter()
+        try:
+            gl = gitauth(user.gitlaburl, gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the projects forked by the user are listed
+        projects = Project.objects.filter(gitlaburl=user.gitlaburl, namespace=gl.user.username)
+        paginator = ProjectCursorPagination()
+        page = paginator.paginate_queryset(projects, request, view=self)
+
+        data = ProjectListSerializer(page, many=True).data
+        if expand:
+            # Read the requested parts of the forked and testing projects from GitLab
+            for item in data:
+                try:
+                    _, expansions = expand_project(gl, item['id'], expand)
+                    item.update(expansions)
+                    if item.get('testingproject'):
+                        _, texpansions = expand_project(gl, item['testingproject']['id'], expand)
+                        item['testingproject'].update(texpansions)
+                except gitlab.exceptions.GitlabError as e:
+                    print(f"Error expanding project {item['id']}: {e}")
 
-            # Fetch all projects
-            projects = list_projects(gl, projects)
-            return Response({'success': True, "message": "project retrieved successfully", 'data': projects}, status=status.HTTP_200_OK)
-        
-        return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'success': True,
+            "message": "project retrieved successfully",
+            'data': data,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link()
+        }, status=status.HTTP_200_OK)
     
     #Destroy a project
     def destroy(self, request,*args, **kwargs):
@@ -336,9 +470,8 @@ class ProjectViewSet(viewsets.ViewSet):
             return Response({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         
         # Delete project in GitLab
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -360,6 +493,132 @@ class ProjectViewSet(viewsets.ViewSet):
         }
         return Response(response_data, status=status.HTTP_204_NO_CONTENT)
 
+    #Update many files of a project at once
+    @action(detail=True, methods=['post'])
+    def batch_update(self, request, pk=None, *args, **kwargs):
+        """
+        Commit many file changes to a project at once.
+
+        The changes are either a list of 'actions' (create, update, delete or move, as in the GitLab commits
+        API) or a zip or tar 'archive' uploaded as multipart form data, whose files are created or updated;
+        both may be sent together. Uploads are streamed into spooled temporary files (see
+        SpooledUploadHandler). The changes are committed to the forked project as one commit, unless they
+        exceed GITLAB_COMMIT_MAX_ACTIONS or GITLAB_COMMIT_MAX_BYTES, and reach the peer branches of its
+        testing project as one commit per branch (see sync_commit).
+
+        :param request: The HTTP request object.
+        :param pk: Primary key of the forked project.
+        :return: JSON response with success status and the commits made or error message.
+        """
+        # Must be set before the body is parsed
+        request._request.upload_handlers = [SpooledUploadHandler(request._request)]
+
+        gitlabaccesstoken = request.data.get('gitlabaccesstoken')
+        branch_name = request.data.get('branch_name')
+        commit_message = request.data.get('commit_message')
+        archive = request.FILES.get('archive')
+        actions = request.data.get('actions')
+
+        # Validate required fields
+        for field_name, field_value in [('gitlabaccesstoken', gitlabaccesstoken), ('branch_name', branch_name), ('commit_message', commit_message)]:
+            if field_value is None:
+                return Response({'success': False, "message": f"{field_name} is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if actions is None and archive is None:
+            return Response({'success': False, "message": "actions or an archive of at most UPLOAD_MAX_BYTES is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
+            return Response({
+                'success': False,
+                'message': 'User with the provided GitLab access token does not exist',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        instance = Project.objects.filter(pk=pk, gitlaburl=user.gitlaburl).first()
+        try:
+            gl = gitauth(user.gitlaburl, gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if instance is None or not can_access_project(gl, gitlabaccesstoken, instance.id):
+            return Response({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+        instance_dict = model_to_dict(instance)
+
+        # Collect the changes
+        try:
+            commit_actions, contents = [], {}
+            if archive is not None:
+                # One tree request tells which files of the archive already exist
+                existing_paths = {item['path'] for item in gl.projects.get(instance.id, lazy=True).repository_tree(ref=branch_name, recursive=True, get_all=True) if item['type'] == 'blob'}
+                with archive:
+                    commit_actions, contents = archive_actions(archive, existing_paths, int(request.data.get('strip_components') or 0))
+            if actions is not None:
+                extra_actions, extra_contents = validate_actions(json.loads(actions) if isinstance(actions, str) else actions)
+                commit_actions += extra_actions
+                contents.update(extra_contents)
+        except (UploadError, ValueError) as e:
+            return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        except gitlab.exceptions.GitlabError as e:
+            return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One commit to the forked project
+        project_commit_id, complete = commit_actions_to_branch(gl, instance.id, branch_name, commit_actions, commit_message + ' [ci skip]')
+        if project_commit_id is None or not complete:
+            return Response({'success': False, "message": "Failed to commit the changes", 'data': {'commit': project_commit_id}}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One commit to every peer branch of the project's testing project
+        try:
+            testing_commits = sync_commit(user.gitlaburl, instance_dict, get_cohort_usernames(gl, instance_dict), project_commit_id, contents)
+            instance.commits = {project_commit_id: testing_commits}
+            instance.save(update_fields=['commits'])
+            record_commit_mappings(instance.id, {project_commit_id: testing_commits})
+        except Exception as e:
+            return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = {'commit': project_commit_id, 'actions': len(commit_actions), 'testing_commits': testing_commits}
+        return Response({'success': True, "message": "Project updated successfully", 'data': data}, status=status.HTTP_200_OK)
+
+    #Dry run of a peer sync
+    @action(detail=True, methods=['get'])
+    def sync_plan(self, request, pk=None, *args, **kwargs):
+        """
+        Show what syncing the peer branches of a project would do, without doing it.
+
+        For every peer branch the plan lists whether it is created and the file actions that would be
+        committed, found by comparing blob SHAs, together with the GitLab requests running it would cost
+        (see plan_peer_sync).
+
+        :param request: The HTTP request object.
+        :param pk: Primary key of the forked project.
+        :return: JSON response with success status and the plan or error message.
+        """
+        gitlabaccesstoken = request.query_params.get("gitlabaccesstoken")
+        if gitlabaccesstoken is None:
+            return Response({'success': False, "message": "gitlabaccesstoken is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
+            return Response({
+                'success': False,
+                'message': 'User with the provided GitLab access token does not exist',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        instance = Project.objects.filter(pk=pk, gitlaburl=user.gitlaburl).exclude(testing_project_id=None).first()
+        try:
+            gl = gitauth(user.gitlaburl, gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if instance is None or not can_access_project(gl, gitlabaccesstoken, instance.id):
+            return Response({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        project = model_to_dict(instance)
+        try:
+            plans = dry_run(user.gitlaburl, [project], get_cohort_usernames(gl, project))
+        except gitlab.exceptions.GitlabError as e:
+            return Response({'success': False, "message": str(e), 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        data = plans[0].as_dict() if plans else None
+        return Response({'success': True, "message": "sync plan computed successfully", 'data': data}, status=status.HTTP_200_OK)
+
 class Comment(APIView):
     """
     API view to handle posting and retrieving comments on commits in testing projects.
@@ -392,26 +651,23 @@ class Comment(APIView):
         if not gitlabaccesstoken:
             return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
         try:
-            # Retrieve all projects and convert them to dictionaries
-            projects = [model_to_dict(project) for project in Project.objects.all()]
+            # Look up the project by its primary key
+            project = Project.objects.filter(pk=int(project_id)).first()
 
-            # Loop through projects to find the matching testing project
             res = (False,None)
-            
-            for project in projects:
-                if project['id'] == int(project_id):
-                    # Post the comment on the commit
-                    c = comment_on_commit(user.gitlaburl,project, commit_id, comment_text+' [ci skip]')
-                    res= c
+            if project is not None:
+                # Post the comment on the commit
+                res = comment_on_commit(user.gitlaburl,model_to_dict(project), commit_id, comment_text+' [ci skip]')
+                if res[0] is True:
+                    publish_project_event(project.id, 'comment', {'commit_id': commit_id, 'note': comment_text})
             # Return success response if comment is posted successfully
             return Response({'success': res[0], "message": res[1], 'data': None}, status=status.HTTP_200_OK)
 
@@ -440,26 +696,19 @@ class Comment(APIView):
         if not gitlabaccesstoken:
             return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
         try:
-            # Retrieve all projects and convert them to dictionaries
-            projects = [model_to_dict(project) for project in Project.objects.all()]
-
-            # Find the matching testing project and retrieve the access token
-            matching_project = next(
-                (project for project in projects if project['id'] == int(project_id)),
-                None
-            )
+            # Look up the project by its primary key and retrieve the access token
+            matching_project = Project.objects.filter(pk=int(project_id)).only('gitlabaccesstoken').first()
 
             if matching_project:
-                gitlabaccesstoken = matching_project['gitlabaccesstoken']
+                gitlabaccesstoken = matching_project.gitlabaccesstoken
                 
                 # Get comments on the specified commit
                 comments = get_comments_on_commit(user.gitlaburl, project_id, gitlabaccesstoken, commit_id)
@@ -517,26 +766,23 @@ class Review(APIView):
         # Prepend rating stars to the comment text
         comment_text = f"{'⭐' * rating} {comment_text}"
 
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
         try:
-            # Retrieve all projects and convert them to dictionaries
-            projects = [model_to_dict(project) for project in Project.objects.all()]
+            # Look up the project by its primary key
+            project = Project.objects.filter(pk=int(project_id)).first()
 
-            # Loop through projects to find the matching testing project
             res = (False,None)
-            
-            for project in projects:
-                if project['id'] == int(project_id):
-                    # Post the comment on the commit
-                    c = comment_on_commit(user.gitlaburl,project, commit_id, comment_text+' [ci skip]')
-                    res= c
+            if project is not None:
+                # Post the comment on the commit
+                res = comment_on_commit(user.gitlaburl,model_to_dict(project), commit_id, comment_text+' [ci skip]')
+                if res[0] is True:
+                    publish_project_event(project.id, 'review', {'commit_id': commit_id, 'note': comment_text})
             # Return success response if comment is posted successfully
             return Response({'success': res[0], "message": 'Review added successfully', 'data': None}, status=status.HTTP_200_OK)
 
@@ -565,26 +811,19 @@ class Review(APIView):
         if not gitlabaccesstoken:
             return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
         try:
-            # Retrieve all projects and convert them to dictionaries
-            projects = [model_to_dict(project) for project in Project.objects.all()]
-
-            # Find the matching testing project and retrieve the access token
-            matching_project = next(
-                (project for project in projects if project['id'] == int(project_id)),
-                None
-            )
+            # Look up the project by its primary key and retrieve the access token
+            matching_project = Project.objects.filter(pk=int(project_id)).only('gitlabaccesstoken').first()
 
             if matching_project:
-                gitlabaccesstoken = matching_project['gitlabaccesstoken']
+                gitlabaccesstoken = matching_project.gitlabaccesstoken
                 
                 # Get comments on the specified commit
                 reviews = get_comments_on_commit(user.gitlaburl, project_id, gitlabaccesstoken, commit_id)
@@ -617,7 +856,8 @@ class TestViewSet(viewsets.ModelViewSet):
         Create a new test instance.
 
         This method creates a new test instance for a specific branch in a testing project.
-        It checks the existence of the branch and runs the test on that branch.
+        It checks the existence of the branch and runs the test on that branch, in GitLab CI or, with
+        `runner` set to 'local', on this server (see localrunner.start_local_run).
 
         :param request: The HTTP request object.
         :return: JSON response with success status and test result or error message.
@@ -625,6 +865,7 @@ class TestViewSet(viewsets.ModelViewSet):
         testingproject_id = request.data.get("testingproject_id")
         branchname = request.data.get("branchname")
         gitlabaccesstoken =  request.data.get("gitlabaccesstoken")
+        runner = request.data.get("runner") or PipelineRun.GITLAB
 
         if not gitlabaccesstoken:
             return Response({'success':False, "message":'gitlabaccesstoken is required', 'data':None}, status=status.HTTP_400_BAD_REQUEST)
@@ -634,18 +875,20 @@ class TestViewSet(viewsets.ModelViewSet):
 
         if not branchname:
             return Response({'success': False, "message": "branchname is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
-        project = None
-        try:
-            for proj in Project.objects.all():
-                if proj.testingproject['id'] == testingproject_id:
-                    project = proj
 
-        except Project.DoesNotExist:
+        if runner not in (PipelineRun.GITLAB, PipelineRun.LOCAL):
+            return Response({'success': False, "message": "runner must be 'gitlab' or 'local'", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if runner == PipelineRun.LOCAL and not (getattr(settings, 'LOCAL_RUNNER_ENABLED', False) and getattr(settings, 'LOCAL_RUNNER_IMAGE', '')):
+            return Response({'success': False, "message": "the local runner is disabled", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            project = Project.objects.filter(testing_project_id=int(testingproject_id)).first()
+        except ValueError:
+            project = None
+        if project is None:
             return Response({'success': False, "message": "project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
         
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -653,16 +896,29 @@ class TestViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Continue with your logic if the user is found
-        gl = gitauth(user.gitlaburl,gitlabaccesstoken)
-        if gl is None:
-            return Response({'success': False, "message": "gitlabusertoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            gl = gitauth(user.gitlaburl,gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
 
         gitlab_project = gl.projects.get(testingproject_id)
-        branches = gitlab_project.branches.list()
-        if not any(branch.name == branchname for branch in branches):
-            return Response({'success': False, "message": f"branch '{branchname}' not found in project {project.name}", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+        branch = next((branch for branch in gitlab_project.branches.list() if branch.name == branchname), None)
+        if branch is None:
+            return Response({'success': False, "message": f"branch '{branchname}' not found in project {project.testing_project_id}", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        if runner == PipelineRun.LOCAL:
+            # The run is queued for the job worker; its progress is published as pipeline events
+            run = start_local_run(gitlab_project.id, branchname, branch.commit['id'])
+            return Response({'success': True, "message": "local test run queued", 'data': PipelineRunSerializer(run).data}, status=status.HTTP_202_ACCEPTED)
 
         t = add_pipefiles(user.gitlaburl, branchname, gitlabaccesstoken, gitlab_project.id)
+        if t is not None and not t['changed']:
+            # The pipeline files are already up to date, so no commit starts the pipeline; start it directly
+            try:
+                t['pipeline_id'] = gitlab_project.pipelines.create({'ref': branchname}).id
+            except gitlab.exceptions.GitlabCreateError as e:
+                print(f"Failed to start a pipeline on {branchname}: {e}")
+                t = None
         if t is not None: 
             return Response({'success': True, "message": "test executed successfully", 'data': t}, status=status.HTTP_200_OK)
 
@@ -673,26 +929,25 @@ class TestViewSet(viewsets.ModelViewSet):
         """
         List test instances.
 
-        This method lists all test instances for a specific branch in a testing project.
+        This method lists the pipelines of a testing project, newest first, from the PipelineRun table that
+        GitLab webhooks keep up to date. Results can be filtered by branch and status and are returned a
+        page at a time.
 
         :param request: The HTTP request object.
         :return: JSON response with success status and list of test instances or error message.
         """
         testingproject_id = request.query_params.get("testingproject_id")
         branchname = request.query_params.get("branchname")
+        pipeline_status = request.query_params.get("status")
         gitlabaccesstoken =request.query_params.get("gitlabaccesstoken")
 
         if not testingproject_id:
             return Response({'success': False, "message": "testingproject_id is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not branchname:
-            return Response({'success': False, "message": "branchname is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
         if not gitlabaccesstoken:
             return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -700,18 +955,36 @@ class TestViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Continue with your logic if the user is found
-        gl = gitauth(user.gitlaburl,gitlabaccesstoken)
-        gitlab_project = gl.projects.get(testingproject_id)
-        pipelines = [p.attributes for p in gitlab_project.pipelines.list(all=True)]
+        try:
+            gl = gitauth(user.gitlaburl,gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if not can_access_project(gl, gitlabaccesstoken, testingproject_id):
+            return Response({'success': False, "message": "testing project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        runs = PipelineRun.objects.filter(testing_project_id=testingproject_id)
+        if branchname:
+            runs = runs.filter(branch=branchname)
+        if pipeline_status:
+            runs = runs.filter(status=pipeline_status)
+        paginator = PipelineRunCursorPagination()
+        page = paginator.paginate_queryset(runs, request, view=self)
         
-        return Response({'success': True, "message": "tests retrieved successfully", 'data': pipelines}, status=status.HTTP_200_OK)
+        return Response({
+            'success': True,
+            "message": "tests retrieved successfully",
+            'data': PipelineRunSerializer(page, many=True).data,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link()
+        }, status=status.HTTP_200_OK)
     
     #Retrieve a Test
     def retrieve(self, request, pk=None, *args, **kwargs):
         """
         Retrieve a specific test instance.
 
-        This method retrieves details of a specific test instance based on its commit ID.
+        This method retrieves a pipeline from the PipelineRun table; a pipeline that has not been recorded
+        yet is read from GitLab once and recorded.
 
         :param request: The HTTP request object.
         :param pk: Primary key (commit ID) of the test instance to retrieve.
@@ -726,9 +999,8 @@ class TestViewSet(viewsets.ModelViewSet):
             return Response({"success":False,"message":'pipeline_id is required'},status=status.HTTP_400_BAD_REQUEST)
         if not gitlabaccesstoken:
             return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
-        try:
-            user = User.objects.get(gitlabusertoken=gitlabaccesstoken)
-        except User.DoesNotExist:
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
             return Response({
                 'success': False,
                 'message': 'User with the provided GitLab access token does not exist',
@@ -736,9 +1008,126 @@ class TestViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Continue with your logic if the user is found
-        gl = gitauth(user.gitlaburl,gitlabaccesstoken)
-        gitlab_project = gl.projects.get(testingproject_id)
-        pipeline = gitlab_project.pipelines.get(pipeline_id)
+        try:
+            gl = gitauth(user.gitlaburl,gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if not can_access_project(gl, gitlabaccesstoken, testingproject_id):
+            return Response({'success': False, "message": "testing project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        run = PipelineRun.objects.filter(testing_project_id=testingproject_id, pipeline_id=pipeline_id).first()
+        if run is None:
+            # The webhook for this pipeline has not arrived yet
+            try:
+                pipeline = gl.projects.get(testingproject_id, lazy=True).pipelines.get(pipeline_id)
+            except gitlab.exceptions.GitlabGetError:
+                return Response({'success': False, "message": "test not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+            run = record_pipeline(int(testingproject_id), pipeline.attributes, [job.attributes for job in pipeline.jobs.list(get_all=True)])
+
+        return Response({'success': True, "message": "test retrieved successfully", 'data': PipelineRunSerializer(run).data}, status=status.HTTP_200_OK)
+     
+    #Pass rate per peer branch
+    @action(detail=False, methods=['get'])
+    def stats(self, request, *args, **kwargs):
+        """
+        Summarise the test results of the peer branches of a testing project.
+
+        For every branch, the latest pipeline whose reports have been ingested is counted: the number of
+        test cases by status, the pass rate and the line coverage.
 
-        return Response({'success': True, "message": "test retrieved successfully", 'data': pipeline}, status=status.HTTP_200_OK)
-     
\ No newline at end of file
+        :param request: The HTTP request object.
+        :return: JSON response with success status and one summary per branch or error message.
+        """
+        testingproject_id = request.query_params.get("testingproject_id")
+        gitlabaccesstoken = request.query_params.get("gitlabaccesstoken")
+        if not testingproject_id:
+            return Response({'success': False, "message": "testingproject_id is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if not gitlabaccesstoken:
+            return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
+            return Response({
+                'success': False,
+                'message': 'User with the provided GitLab access token does not exist',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            gl = gitauth(user.gitlaburl,gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if not can_access_project(gl, gitlabaccesstoken, testingproject_id):
+            return Response({'success': False, "message": "testing project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        # The latest ingested pipeline of every branch
+        latest = PipelineRun.objects.filter(testing_project_id=testingproject_id, results_ingested_at__isnull=False).values('branch').annotate(run_id=Max('id'))
+        run_ids = {row['run_id']: row['branch'] for row in latest}
+
+        summaries = {run_id: {'branch': branch, 'run_id': run_id, 'total': 0, 'passed': 0, 'failed': 0, 'error': 0, 'skipped': 0, 'pass_rate': None, 'line_rate': None} for run_id, branch in run_ids.items()}
+        counts = TestCaseResult.objects.filter(run_id__in=run_ids).values('run_id', 'status').annotate(count=Count('id'))
+        for row in counts:
+            summaries[row['run_id']][row['status']] = row['count']
+            summaries[row['run_id']]['total'] += row['count']
+        for row in CoverageResult.objects.filter(run_id__in=run_ids).values('run_id').annotate(line_rate=Avg('line_rate')):
+            summaries[row['run_id']]['line_rate'] = row['line_rate']
+        for summary in summaries.values():
+            executed = summary['total'] - summary['skipped']
+            summary['pass_rate'] = summary['passed'] / executed if executed else None
+
+        data = sorted(summaries.values(), key=lambda summary: summary['branch'])
+        return Response({'success': True, "message": "test statistics retrieved successfully", 'data': data}, status=status.HTTP_200_OK)
+
+    #Slowest test cases
+    @action(detail=False, methods=['get'])
+    def slowest(self, request, *args, **kwargs):
+        """
+        List the slowest test cases of a testing project.
+
+        :param request: The HTTP request object, with optional `branchname`, `pipeline_id` and `limit` (default 20, between 1 and 100).
+        :return: JSON response with success status and the slowest test cases or error message.
+        """
+        testingproject_id = request.query_params.get("testingproject_id")
+        branchname = request.query_params.get("branchname")
+        pipeline_id = request.query_params.get("pipeline_id")
+        gitlabaccesstoken = request.query_params.get("gitlabaccesstoken")
+        if not testingproject_id:
+            return Response({'success': False, "message": "testingproject_id is required", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if not gitlabaccesstoken:
+            return Response({'success':False,'message':'gitlabaccesstoken is needed'},status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+        except ValueError:
+            return Response({'success': False, "message": "limit must be a number", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        user = resolve_token(gitlabaccesstoken)
+        if user is None:
+            return Response({
+                'success': False,
+                'message': 'User with the provided GitLab access token does not exist',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            gl = gitauth(user.gitlaburl,gitlabaccesstoken)
+        except gitlab.exceptions.GitlabAuthenticationError:
+            return Response({'success': False, "message": "gitlabaccesstoken is invalid", 'data': None}, status=status.HTTP_400_BAD_REQUEST)
+        if not can_access_project(gl, gitlabaccesstoken, testingproject_id):
+            return Response({'success': False, "message": "testing project not found", 'data': None}, status=status.HTTP_404_NOT_FOUND)
+
+        results = TestCaseResult.objects.filter(run__testing_project_id=testingproject_id, duration__isnull=False)
+        if branchname:
+            results = results.filter(run__branch=branchname)
+        if pipeline_id:
+            results = results.filter(run__pipeline_id=pipeline_id)
+        results = results.select_related('run').order_by('-duration')[:limit]
+
+        data = [{
+            'pipeline_id': result.run.pipeline_id,
+            'branch': result.run.branch,
+            'job_name': result.job_name,
+            'suite': result.suite,
+            'classname': result.classname,
+            'name': result.name,
+            'status': result.status,
+            'duration': result.duration,
+        } for result in results]
+        return Response({'success': True, "message": "slowest tests retrieved successfully", 'data': data}, status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 """
-ASGI config for peertestapp project.
+ASGI config for peertest project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
@@ -13,8 +13,8 @@ import os
 # Import Django's ASGI application handler
 from django.core.asgi import get_asgi_application
 
-# Set the default settings module for the 'peertestapp' project
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'peertestapp.settings')
+# Set the default settings module for the 'peertest' project
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'peertest.settings')
 
 # Get the ASGI application for the project
 application = get_asgi_application()
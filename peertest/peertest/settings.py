@@ -259,3 +259,105 @@ LOGGING = {
         },
     },
 }
+
+# GitLab client registry
+# Authenticated GitLab clients are pooled per (gitlaburl, token) and share one keep-alive session per host
+GITLAB_CLIENT_MAX_CLIENTS = int(os.getenv('GITLAB_CLIENT_MAX_CLIENTS', '256'))  # Least recently used clients are evicted above this size
+GITLAB_CLIENT_AUTH_TTL = int(os.getenv('GITLAB_CLIENT_AUTH_TTL', '300'))  # Seconds before a cached client repeats the /user auth check
+GITLAB_CLIENT_IDLE_TIMEOUT = int(os.getenv('GITLAB_CLIENT_IDLE_TIMEOUT', '900'))  # Seconds a client may stay unused before it is evicted
+GITLAB_CLIENT_POOL_SIZE = int(os.getenv('GITLAB_CLIENT_POOL_SIZE', '20'))  # Keep-alive connections kept per GitLab host
+
+# Batched commits
+# Files synced to a branch are sent as multi-action commits split by these limits
+GITLAB_COMMIT_MAX_ACTIONS = int(os.getenv('GITLAB_COMMIT_MAX_ACTIONS', '100'))  # Maximum number of file actions in one commit
+GITLAB_COMMIT_MAX_BYTES = int(os.getenv('GITLAB_COMMIT_MAX_BYTES', str(10 * 1024 * 1024)))  # Maximum total content size of one commit
+
+# Repository archives
+# Blobs missing from the blob cache are read from a streamed tar.gz archive; set to False to fetch them one by one
+GITLAB_USE_ARCHIVES = os.getenv('GITLAB_USE_ARCHIVES', 'True') == 'True'
+GITLAB_ARCHIVE_MIN_FILES = int(os.getenv('GITLAB_ARCHIVE_MIN_FILES', '10'))  # Fewer missing blobs than this are fetched one by one instead
+
+# Blob cache
+# Downloaded file contents are cached by git blob SHA; blobs never change, so entries are only evicted
+BLOB_CACHE_DIR = os.getenv('BLOB_CACHE_DIR', os.path.join(BASE_DIR, '.blobcache'))
+BLOB_CACHE_MAX_MEMORY_BYTES = int(os.getenv('BLOB_CACHE_MAX_MEMORY_BYTES', str(32 * 1024 * 1024)))  # Size of the in-memory LRU front
+BLOB_CACHE_MAX_DISK_BYTES = int(os.getenv('BLOB_CACHE_MAX_DISK_BYTES', str(1024 * 1024 * 1024)))  # Size of the on-disk cache
+
+# Peer branch sync
+# Independent peer branches are synced in parallel by a thread pool
+PEER_SYNC_WORKERS = int(os.getenv('PEER_SYNC_WORKERS', str(min(32, (os.cpu_count() or 1) + 4))))  # Number of branches synced at once
+PEER_SYNC_HOST_CONCURRENCY = int(os.getenv('PEER_SYNC_HOST_CONCURRENCY', '8'))  # Maximum concurrent branch syncs against one GitLab host
+
+# Background jobs
+# Jobs are stored in the database and processed by `python manage.py runjobs`
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))  # Attempts before a job is marked as failed
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))  # Seconds before the first retry, doubled after every failed attempt
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '3600'))  # Seconds after which a running job is assumed to belong to a dead worker
+
+# Cache
+# Shared by every worker process; used for data that is immutable or cheap to invalidate, such as folder trees per commit
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', os.path.join(BASE_DIR, '.djangocache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DJANGO_CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+
+# Token cache
+# GitLab access tokens are resolved to users once and then served from memory and the shared cache
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))  # Seconds a resolved token is kept in the shared cache
+AUTH_TOKEN_MEMORY_TTL = int(os.getenv('AUTH_TOKEN_MEMORY_TTL', '30'))  # Seconds a worker trusts its in-process copy; bounds staleness after an update in another worker
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', '10000'))  # Least recently used tokens are evicted above this size
+
+# GitLab webhooks
+# Push, merge request and note events are received at /api/v1/webhooks/gitlab/ and must carry this secret token
+GITLAB_WEBHOOK_SECRET = os.getenv('GITLAB_WEBHOOK_SECRET', '')  # Webhooks are rejected while this is empty
+REF_CACHE_TTL = int(os.getenv('REF_CACHE_TTL', '300'))  # Seconds cached branches, commits and comments are kept if no webhook drops them
+
+# Project event streams
+# Pipeline, comment and review updates are streamed at /api/v1/projects/<id>/events/; serve the app with an ASGI server
+EVENT_STREAM_HEARTBEAT = int(os.getenv('EVENT_STREAM_HEARTBEAT', '15'))  # Seconds without events before a heartbeat comment is sent
+EVENT_STREAM_POLL_INTERVAL = int(os.getenv('EVENT_STREAM_POLL_INTERVAL', '5'))  # Seconds between reads of events published by other processes
+EVENT_RETENTION = int(os.getenv('EVENT_RETENTION', '86400'))  # Seconds events are kept for clients that reconnect
+
+# Test result ingestion
+# JUnit and coverage reports in the artifacts of finished pipelines are read into the database by the job worker
+ARTIFACT_SPOOL_BYTES = int(os.getenv('ARTIFACT_SPOOL_BYTES', str(8 * 1024 * 1024)))  # Artifact archives larger than this are spooled to disk
+ARTIFACT_MAX_BYTES = int(os.getenv('ARTIFACT_MAX_BYTES', str(100 * 1024 * 1024)))  # Larger artifact archives are skipped
+RESULTS_BATCH_SIZE = int(os.getenv('RESULTS_BATCH_SIZE', '500'))  # Test cases written per database insert
+
+# Local test runner
+# Tests of a peer branch can run on this server instead of GitLab CI (runner=local). The job worker runs every test command in a
+# throwaway container without network, capabilities or access to anything but the checkout; the image must hold the test tools
+LOCAL_RUNNER_ENABLED = os.getenv('LOCAL_RUNNER_ENABLED', 'False') == 'True'
+LOCAL_RUNNER_IMAGE = os.getenv('LOCAL_RUNNER_IMAGE', '')  # Container image the tests run in; the runner stays disabled without one
+LOCAL_RUNNER_CONTAINER_RUNTIME = os.getenv('LOCAL_RUNNER_CONTAINER_RUNTIME', 'docker')  # docker, or podman
+LOCAL_RUNNER_TIMEOUT = int(os.getenv('LOCAL_RUNNER_TIMEOUT', '600'))  # Seconds of wall time before a test container is removed
+LOCAL_RUNNER_CPU_SECONDS = int(os.getenv('LOCAL_RUNNER_CPU_SECONDS', '300'))  # CPU seconds a test command may use
+LOCAL_RUNNER_CPUS = float(os.getenv('LOCAL_RUNNER_CPUS', '1'))  # Cores a test container may use at once
+LOCAL_RUNNER_MEMORY_BYTES = int(os.getenv('LOCAL_RUNNER_MEMORY_BYTES', str(1024 * 1024 * 1024)))  # Memory of a test container, swap included
+LOCAL_RUNNER_PIDS = int(os.getenv('LOCAL_RUNNER_PIDS', '256'))  # Processes a test container may start
+LOCAL_RUNNER_FILE_BYTES = int(os.getenv('LOCAL_RUNNER_FILE_BYTES', str(100 * 1024 * 1024)))  # Largest file a test command may write
+LOCAL_RUNNER_TRACE_BYTES = int(os.getenv('LOCAL_RUNNER_TRACE_BYTES', str(16 * 1024)))  # End of the output kept with each job
+
+# Peer assignment
+# Peers testing each forked project are assigned once per cohort: round_robin, balanced_random, group or all_pairs (every participant on every project)
+PEER_ASSIGNMENT_STRATEGY = os.getenv('PEER_ASSIGNMENT_STRATEGY', 'round_robin')
+PEER_REVIEWERS = int(os.getenv('PEER_REVIEWERS', '3'))  # Peers testing each project with round_robin and balanced_random
+PEER_GROUP_SIZE = int(os.getenv('PEER_GROUP_SIZE', '4'))  # Participants per group with group
+PEER_ASSIGNMENT_SEED = os.getenv('PEER_ASSIGNMENT_SEED', '')  # Seed of balanced_random and group, combined with the original project ID
+
+# Peer branch sync backend
+# 'rest' commits every peer branch through the GitLab API; 'git' composes the branches of a project in a local bare mirror and pushes them at once
+PEER_SYNC_BACKEND = os.getenv('PEER_SYNC_BACKEND', 'rest')
+GIT_MIRROR_DIR = os.getenv('GIT_MIRROR_DIR', os.path.join(BASE_DIR, '.gitmirrors'))  # One bare repository per testing project
+GIT_MIRROR_TIMEOUT = int(os.getenv('GIT_MIRROR_TIMEOUT', '600'))  # Seconds a git command may run
+
+# Batch updates
+# Archives uploaded to /api/v1/projects/<id>/batch_update/ are streamed into spooled temporary files
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(8 * 1024 * 1024)))  # Uploads larger than this are spooled to disk
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(100 * 1024 * 1024)))  # Largest upload, and largest archive content once extracted
+UPLOAD_MAX_FILES = int(os.getenv('UPLOAD_MAX_FILES', '1000'))  # Most files an archive may hold
@@ -1,5 +1,5 @@
 """
-WSGI config for peertestapp project.
+WSGI config for peertest project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
@@ -13,8 +13,8 @@ import os
 # Import Django's WSGI application handler
 from django.core.wsgi import get_wsgi_application
 
-# Set the default settings module for the 'peertestapp' project
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'peertestapp.settings')
+# Set the default settings module for the 'peertest' project
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'peertest.settings')
 
 # Get the WSGI application for the project
 application = get_wsgi_application()